@@ -182,6 +182,7 @@ CREATE TABLE IF NOT EXISTS knowledge (
     INDEX idx_category (category),
     INDEX idx_is_deleted (is_deleted),
     INDEX idx_created_at (created_at),
-    FULLTEXT INDEX ft_title_content (title, content) COMMENT '全文索引'
+    INDEX idx_user_updated (user, updated_at, id) COMMENT '增量同步按 (updated_at, id) 键集分页',
+    FULLTEXT INDEX ft_title_content (title, content) WITH PARSER ngram COMMENT '全文索引（ngram分词，支持中文）'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='知识库表';
 
@@ -1,55 +1,49 @@
 from typing import List, Optional, Dict, Any
 from typing import Union
+import asyncio
 import os
-import pymysql  # 提前导入，避免运行时错误
+import time
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
 try:
     # 优先按包导入（若已安装为 rag_service 包）
-    from rag_service.config import INDEX_PATH, META_PATH, MODEL_NAME, DB_CONFIG
-    from rag_service.services.embedder import Embedder
-    from rag_service.services.vector_store import VectorStore
-    from rag_service.services.db import like_search
-    from rag_service.services.hybrid_search import merge_results
+    from rag_service.config import INDEX_PATH, META_PATH, MODEL_NAME, EMBED_CACHE_CONFIG, EMBED_BATCH_CONFIG, HYBRID_CONFIG, BM25_CONFIG, INGEST_QUEUE_CONFIG, QUERY_CACHE_CONFIG, RERANK_CONFIG, EMBED_DIM_CONFIG, SEARCH_BATCH_CONFIG
+    from rag_service.services.embedder import create_embedder
+    from rag_service.services.batching_embedder import BatchingEmbedder
+    from rag_service.services.embedding_cache import EmbeddingCache, CachedEmbedder
+    from rag_service.services.vector_store import VectorStore, point_id
+    from rag_service.services.db import fulltext_search, fetch_by_ids, pool as db_pool
+    from rag_service.services.hybrid_search import merge_results, run_leg
+    from rag_service.services.fusion import STRATEGIES
+    from rag_service.services.reranker import Reranker
+    from rag_service.services.projection import PCAProjection, ProjectedEmbedder
+    from rag_service.services import streaming
+    from rag_service.services.bm25_index import BM25Index
+    from rag_service.services.db_sync import DBSync
+    from rag_service.services.ingest_queue import IngestQueue
+    from rag_service.services.chunker import chunk_text, iter_chunks
+    from rag_service.services.query_cache import QueryCache
 except ImportError:
     # 回退为本地相对导入（当前目录运行）
-    from config import INDEX_PATH, META_PATH, MODEL_NAME, DB_CONFIG
-    from services.embedder import Embedder
-    from services.vector_store import VectorStore
-    from services.db import like_search
-    from services.hybrid_search import merge_results
-
-
-# 数据库连接函数
-def get_db_connection():
-    return pymysql.connect(
-        host=DB_CONFIG['host'],
-        port=DB_CONFIG['port'],
-        user=DB_CONFIG['user'],
-        password=DB_CONFIG['password'],
-        database=DB_CONFIG['database'],
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    from config import INDEX_PATH, META_PATH, MODEL_NAME, EMBED_CACHE_CONFIG, EMBED_BATCH_CONFIG, HYBRID_CONFIG, BM25_CONFIG, INGEST_QUEUE_CONFIG, QUERY_CACHE_CONFIG, RERANK_CONFIG, EMBED_DIM_CONFIG, SEARCH_BATCH_CONFIG
+    from services.embedder import create_embedder
+    from services.batching_embedder import BatchingEmbedder
+    from services.embedding_cache import EmbeddingCache, CachedEmbedder
+    from services.vector_store import VectorStore, point_id
+    from services.db import fulltext_search, fetch_by_ids, pool as db_pool
+    from services.hybrid_search import merge_results, run_leg
+    from services.fusion import STRATEGIES
+    from services.reranker import Reranker
+    from services.projection import PCAProjection, ProjectedEmbedder
+    from services import streaming
+    from services.bm25_index import BM25Index
+    from services.db_sync import DBSync
+    from services.ingest_queue import IngestQueue
+    from services.chunker import chunk_text, iter_chunks
+    from services.query_cache import QueryCache
 
-# 工具函数移到顶部，避免干扰路由注册
-def chunk_text(text: str, size: int, overlap: int) -> List[str]:
-    # 对文本进行简单的按字符数分片（不考虑语义）
-    # 确保输入文本非空
-    text = (text or '').strip()
-    if not text:
-        return []
-    chunks = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(start + size, n)
-        chunks.append(text[start:end])
-        start = start + size - overlap
-        if start < 0:
-            break
-    return chunks
 
 # 初始化 FastAPI 实例
 app = FastAPI(title="RAG Service", version="0.1")
@@ -63,13 +57,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化嵌入模型
-embedder = Embedder(model_name=MODEL_NAME)
+# 初始化嵌入模型（RAG_EMBED_PROVIDER：dashscope 为异步 HTTP 调用，local 为本机线程池推理，请求路径均不阻塞事件循环）
+embedder = create_embedder(dimensions=EMBED_DIM_CONFIG['dimensions'])
+# 大批量按上限拆分并发请求，并发的单条查询在短窗口内合并调用
+if EMBED_BATCH_CONFIG['enabled']:
+    embedder = BatchingEmbedder(embedder)
+# 在远端 embedding 调用前加一层缓存，重复入库/重复查询不再走网络
+if EMBED_CACHE_CONFIG['enabled']:
+    embedder = CachedEmbedder(embedder, EmbeddingCache())
+# 可选的 PCA 降维放在缓存外侧：缓存保存原始向量，入库与查询使用同一投影
+if EMBED_DIM_CONFIG['projection_path']:
+    embedder = ProjectedEmbedder(embedder, PCAProjection.load(EMBED_DIM_CONFIG['projection_path']))
+    print(f"[APP] 已启用 PCA 降维: {embedder.projection.input_dim} -> {embedder.dimension()}")
 
 # 创建一个全局共享的VectorStore实例，所有用户共用同一个知识库
 vector_store = VectorStore(embedder=embedder)
 print(f"[APP] 已初始化全局共享向量存储")
 
+# 可选的进程内 BM25 关键词索引：启动时从向量库加载，随入库/删除增量更新
+bm25_index = None
+if BM25_CONFIG['enabled']:
+    bm25_index = BM25Index()
+    vector_store.add_listener(bm25_index)
+
+# 检索结果缓存：随入库/删除按 (user, category) 失效
+query_cache = None
+if QUERY_CACHE_CONFIG['enabled']:
+    query_cache = QueryCache()
+    vector_store.add_listener(query_cache)
+
+# 混合检索融合后的重排阶段（RAG_RERANK=none 时不启用）
+reranker = Reranker()
+
+# 数据库到向量库的后台增量同步（按默认 token 上限语义切分，逐个产出 chunk）
+db_sync = DBSync(vector_store, chunker=iter_chunks)
+
+@app.on_event("startup")
+async def startup() -> None:
+    try:
+        await vector_store.init()
+    except Exception as e:
+        # Qdrant 暂不可用时不阻塞启动，首次请求时会再次初始化
+        print(f"[APP] 向量库初始化失败: {e}")
+    if bm25_index is not None:
+        try:
+            await bm25_index.rebuild(vector_store)
+        except Exception as e:
+            print(f"[APP] BM25索引加载失败: {e}")
+    await ingest_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    # 停止后台同步（已完成的页已记录水位），再释放连接池与客户端
+    await db_sync.close()
+    await ingest_queue.close()
+    await db_pool.close()
+    await vector_store.close()
+    reranker.close()
+
+
 # Pydantic 模型定义（集中放在一起，便于维护）
 class IngestRaw(BaseModel):
     source: str = Field('raw', description="来源：raw 或 db")
@@ -77,9 +124,10 @@ class IngestRaw(BaseModel):
     category: str = Field(..., description="类别")
     text: str = Field(..., description="文本内容")
     keywords: Optional[str] = None
-    chunkSize: int = 500
-    chunkOverlap: int = 50
+    chunkSize: int = Field(500, description="chunk 上限（模型 token 数）")
+    chunkOverlap: int = Field(50, description="相邻 chunk 重叠的 token 数（不超过 chunkSize 的一半）")
     user: str = Field(..., description="用户标识")
+    doc_id: Optional[str] = Field(None, description="文档标识；给出时以新内容替换该文档之前入库的 chunk，不给则只追加")
 
 class IngestDB(BaseModel):
     source: str = Field('db', description="来源：raw 或 db")
@@ -92,19 +140,46 @@ class HybridSearchReq(BaseModel):
     category: Optional[str] = None
     alpha: float = 0.7
     beta: float = 0.3
+    fusion: str = Field('minmax', description="融合策略：minmax / zscore / rrf")
+    rerank: bool = Field(True, description="是否对融合结果重排（仅在服务端启用重排时生效）")
     user: str = Field(..., description="用户标识")
+    fields: Optional[List[str]] = Field(None, description="只返回这些字段，如 [\"id\", \"title\", \"score\"]")
+    stream: Optional[str] = Field(None, description="流式返回：ndjson / sse，默认一次返回完整 JSON")
 
 class SearchReq(BaseModel):
     q: str = Field(..., description="查询文本") 
     topK: int = Field(5, description="返回的结果数量")
     category: Optional[str] = None
     user: str = Field(..., description="用户标识")
+    fields: Optional[List[str]] = Field(None, description="只返回这些字段，如 [\"id\", \"title\", \"score_vec\"]")
+    stream: Optional[str] = Field(None, description="流式返回：ndjson / sse，默认一次返回完整 JSON")
+
+class BatchQuery(BaseModel):
+    q: str = Field(..., description="查询文本")
+    topK: Optional[int] = Field(None, description="返回的结果数量，默认使用请求级 topK")
+    category: Optional[str] = Field(None, description="分类过滤，默认使用请求级 category")
+
+class SearchBatchReq(BaseModel):
+    queries: List[BatchQuery] = Field(..., description="查询列表")
+    topK: int = Field(5, description="返回的结果数量")
+    category: Optional[str] = None
+    user: str = Field(..., description="用户标识")
+
+class HybridSearchBatchReq(SearchBatchReq):
+    alpha: float = 0.7
+    beta: float = 0.3
+    fusion: str = Field('minmax', description="融合策略：minmax / zscore / rrf")
+    rerank: bool = Field(True, description="是否对融合结果重排（仅在服务端启用重排时生效）")
 
 class SyncDBReq(BaseModel):
     category: Optional[str] = None
-    limit: int = 1000
+    limit: int = Field(0, description="本次最多读取的行数，0 表示不限；未读完的部分下次从水位继续")
+    full: bool = Field(False, description="忽略水位从头扫描（内容未变化的记录仍会跳过）")
     user: str = Field(..., description="用户标识")
 
+class JobStatusReq(BaseModel):
+    job_id: str = Field(..., description="任务ID")
+
 class HealthReq(BaseModel):
     user: str = Field(..., description="用户标识")
 
@@ -122,41 +197,56 @@ class CountReq(BaseModel):
 
 # 接口定义（按功能分类，装饰器紧贴函数）
 @app.post("/rag/health", response_model=Dict[str, Any])
-def health(req: HealthReq) -> Dict[str, Any]:
+async def health(req: HealthReq) -> Dict[str, Any]:
     """健康检查接口"""
     if req.user == '':
         return {"code": 0, "message": "OK", "data": {"model": MODEL_NAME}}
     # 补充完整的返回逻辑，避免语法风险
     return {"code": 0, "message": "OK", "user": req.user, "data": {"model": MODEL_NAME}}
 
+@app.post("/rag/metrics", response_model=Dict[str, Any])
+async def metrics() -> Dict[str, Any]:
+    """运行指标（embedding 缓存命中、批处理等）"""
+    data = {}
+    # 沿包装链逐层收集统计
+    layer = embedder
+    while layer is not None:
+        if isinstance(layer, CachedEmbedder):
+            data['embedding_cache'] = layer.stats()
+        elif isinstance(layer, BatchingEmbedder):
+            data['embedding_batch'] = layer.stats()
+        layer = getattr(layer, 'embedder', None)
+    data['db_pool'] = db_pool.stats()
+    data['counts'] = vector_store.counts.stats()
+    data['ingest_queue'] = ingest_queue.stats()
+    if bm25_index is not None:
+        data['bm25_index'] = bm25_index.stats()
+    if query_cache is not None:
+        data['query_cache'] = query_cache.stats()
+    if reranker.enabled:
+        data['rerank'] = reranker.stats()
+    return {"code": 0, "message": "OK", "data": data}
+
 @app.post("/rag/count", response_model=Dict[str, Any])
-def count_vector(req: CountReq) -> Dict[str, Any]:
+async def count_vector(req: CountReq) -> Dict[str, Any]:
     """获取用户向量库中的数据条数"""
     try:
         # 使用全局共享的向量存储实例
         user_store = vector_store
         # 获取用户数据条数，支持category过滤
-        count = user_store.count(user=req.user, category=req.category)
+        count = await user_store.count(user=req.user, category=req.category)
         return {"code": 0, "message": "OK", "user": req.user, "data": {"count": count}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取数据条数失败: {e}")
 
-@app.post("/rag/ingest", response_model=Dict[str, Any])
-def ingest( req: Union[IngestRaw, IngestDB]):
-    """数据入库接口（支持raw文本/数据库ID）"""
-    # 从payload中获取user
-    user = req.user
-    if not user:
-        raise HTTPException(status_code=400, detail="参数 user 不能为空")
-    # 使用全局共享的向量存储实例
-    user_store = vector_store
-    if isinstance(req, IngestRaw):
-        # 处理 Raw 模式
-        if req.source != 'raw': 
-            # 这是一个防御性检查，因为 Pydantic 可能已经根据字段匹配了
-            pass 
-            
+async def run_ingest_job(kind: str, request: Dict[str, Any], progress) -> Dict[str, Any]:
+    """后台执行入库任务（raw文本/数据库ID），按批写入并上报 chunk 进度"""
+    user = request['user']
+    batch = INGEST_QUEUE_CONFIG['batch_chunks']
+    if kind == 'raw':
+        req = IngestRaw(**request)
         chunks = chunk_text(req.text, req.chunkSize, req.chunkOverlap)
+        texts = chunks
         metas = [{
             'title': req.title,
             'category': req.category,
@@ -164,99 +254,315 @@ def ingest( req: Union[IngestRaw, IngestDB]):
             'content': c,
             'user': user
         } for c in chunks]
-        
-        try:
-            user_store.add_texts(chunks, metas)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"向量入库失败: {e}")
-        return {"code": 0, "message": "OK", "data": {"ingested": len(chunks)}}
+        if req.doc_id:
+            for meta in metas:
+                meta['doc_id'] = req.doc_id
+
+        total = len(texts)
+        written = 0
+        await progress(0, total)
+        # 同一文档的并发任务（多个 worker）整体串行，后执行的任务看到的是前一任务写完并清理后的状态
+        async with vector_store.lock_documents(user, doc_ids=[req.doc_id] if req.doc_id else ()):
+            for i in range(0, total, batch):
+                written += await vector_store.add_texts(texts[i:i + batch], metas[i:i + batch])
+                await progress(min(i + batch, total), total)
+            # 同一 doc_id 重新入库（文档被编辑）时，清理新版本中已不存在的旧 chunk；同名的其他文档不受影响
+            removed = await vector_store.delete_stale([point_id(m, t) for t, m in zip(texts, metas)], user=user, doc_id=req.doc_id)
+        return {'ingested': total, 'written': written, 'removed': removed}
+
+    # 按 ID 批量读取（每批一次 IN 查询），边读边切分写入；总 chunk 数按已读记录的平均 chunk 数估算
+    req = IngestDB(**request)
+    n_ids = len(set(req.ids))
+    done = written = rows = removed = 0
+    texts, metas, source_ids = [], [], []
+
+    async def flush() -> None:
+        nonlocal done, written, removed, texts, metas, source_ids
+        # 与数据库同步或其他任务写入同一记录时按记录串行
+        async with vector_store.lock_documents(user, source_ids=source_ids):
+            written += await vector_store.add_texts(texts, metas)
+            # 记录内容变更后重新入库时，清理这些记录已不存在的旧 chunk
+            removed += await vector_store.delete_stale([point_id(m, t) for t, m in zip(texts, metas)], user=user, source_ids=source_ids)
+        done += len(texts)
+        texts, metas, source_ids = [], [], []
+        await progress(done, max(done, done * n_ids // max(rows, 1)))
+
+    await progress(0, 0)
+    async for page in fetch_by_ids(req.ids, user):
+        for r in page:
+            rows += 1
+            source_ids.append(r['id'])
+            # 与数据库同步相同的切分与 payload，同一记录的 chunk 在同一次写入中，点 ID 与同步一致
+            for c in iter_chunks(r.get('content') or ''):
+                texts.append(c)
+                metas.append({
+                    'id': r['id'],
+                    'title': r.get('title'),
+                    'category': r.get('category'),
+                    'keywords': r.get('keywords'),
+                    'source': r.get('source'),
+                    'content': c,
+                    'user': user  # 保留用户信息到元数据中，便于追踪和权限管理
+                })
+            if len(texts) >= batch:
+                await flush()
+    if source_ids:
+        await flush()
+    await progress(done, done)
+    return {'ingested': done, 'written': written, 'removed': removed, 'rows': rows, 'missing': n_ids - rows}
 
+# 后台入库任务队列：请求只负责落库任务，切分/embedding/写入由 worker 执行
+ingest_queue = IngestQueue(run_ingest_job)
+
+@app.post("/rag/ingest", response_model=Dict[str, Any])
+async def ingest( req: Union[IngestRaw, IngestDB]):
+    """数据入库接口（支持raw文本/数据库ID），提交后台任务并立即返回 job_id"""
+    # 从payload中获取user
+    user = req.user
+    if not user:
+        raise HTTPException(status_code=400, detail="参数 user 不能为空")
+    if isinstance(req, IngestRaw):
+        job = await ingest_queue.submit('raw', req.model_dump())
     elif isinstance(req, IngestDB):
-        # 处理 DB 模式
-        # ... (这里放入你原来的 DB 处理逻辑) ...
-        texts, metas = [], []
-        # 简化：逐个 id 做单条 LIKE 检索的近似（真实应按 id 精确查询）
-        for kid in req.ids:
-            kw = like_search(str(kid), None, 1, user)
-            if not kw:
-                continue
-            item = kw[0]
-            text = item.get('content') or ''
-            texts.append(text)
-            metas.append({
-                'id': item.get('id'),
-                'title': item.get('title'),
-                'category': item.get('category'),
-                'keywords': item.get('keywords'),
-                'source': item.get('source'),
-                'content': text,
-                'user': user  # 保留用户信息到元数据中，便于追踪和权限管理
-            })
-        if not texts:
-            return {"code": 0, "message": "OK", "data": {"ingested": 0}}
-        user_store.add_texts(texts, metas)
-        return {"code": 0, "message": "OK", "data": {"ingested": len(texts)}}
+        job = await ingest_queue.submit('db', req.model_dump())
     else:
         # 理论上 FastAPI 验证通过后不会走到这里
         raise HTTPException(status_code=400, detail="无效的请求参数")
+    return {"code": 0, "message": "OK", "data": job}
+
+@app.post("/rag/ingest-status", response_model=Dict[str, Any])
+async def ingest_status(req: JobStatusReq):
+    """查询入库任务状态与 chunk 进度"""
+    job = await ingest_queue.get(req.job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"入库任务不存在: {req.job_id}")
+    return {"code": 0, "message": "OK", "data": job}
 
 
+def check_output(req) -> None:
+    if req.stream and req.stream not in streaming.FORMATS:
+        raise HTTPException(status_code=400, detail=f"参数 stream 仅支持: {', '.join(streaming.FORMATS)}")
+
+def search_output(req: SearchReq, res: List[Dict]):
+    # 字段裁剪在缓存之后进行，缓存中始终保存完整结果
+    res = streaming.project(res, req.fields)
+    if req.stream:
+        return streaming.stream_response(res, {'user': req.user, 'count': len(res)}, req.stream)
+    return {"code": 0, "message": "OK", "user": req.user, "data": res}
+
 @app.post("/rag/search", response_model=Dict[str, Any])
-def search(req: SearchReq):
-    """纯向量检索接口"""
+async def search(req: SearchReq):
+    """纯向量检索接口（支持字段裁剪与 NDJSON/SSE 流式返回）"""
     if not req.q:
         raise HTTPException(status_code=400, detail="参数 q 不能为空")
+    check_output(req)
+    if query_cache is not None:
+        key = QueryCache.key('search', req.user, req.category, req.q, req.topK)
+        cached = query_cache.get(key)
+        if cached is not None:
+            return search_output(req, cached)
+        token = query_cache.token(req.user, req.category)
     # 使用全局共享的向量存储实例
     user_store = vector_store
+    t0 = time.perf_counter()
     try:
-        res = user_store.search(req.q, topK=req.topK, category=req.category, user=req.user)
+        res = await user_store.search(req.q, topK=req.topK, category=req.category, user=req.user)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"向量检索失败: {e}")
-    return {"code": 0, "message": "OK", "user": req.user, "data": res}
+    if query_cache is not None:
+        query_cache.put(key, res, token, time.perf_counter() - t0)
+    return search_output(req, res)
+
+def keyword_search(q: str, category: Optional[str], topK: int, user: str):
+    # 启用进程内 BM25 时关键词一路不访问 MySQL
+    if bm25_index is not None:
+        return bm25_index.asearch(q, topK, category=category, user=user)
+    return fulltext_search(q, category, topK=topK, user=user)
+
+def batch_items(req: SearchBatchReq) -> List[tuple]:
+    """展开批量请求为 [(q, topK, category), ...]，单条未指定的参数使用请求级默认值"""
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="参数 queries 不能为空")
+    if len(req.queries) > SEARCH_BATCH_CONFIG['max_queries']:
+        raise HTTPException(status_code=400, detail=f"单次最多 {SEARCH_BATCH_CONFIG['max_queries']} 条查询")
+    items = []
+    for item in req.queries:
+        if not item.q:
+            raise HTTPException(status_code=400, detail="查询文本 q 不能为空")
+        items.append((item.q, item.topK or req.topK, item.category if item.category is not None else req.category))
+    return items
+
+@app.post("/rag/search-batch", response_model=Dict[str, Any])
+async def search_batch(req: SearchBatchReq):
+    """批量向量检索：多条查询一次 embedding、一次批量向量查询，按输入顺序返回每条查询的结果"""
+    items = batch_items(req)
+    results: List[Optional[List[Dict]]] = [None] * len(items)
+    pending, keys, tokens = [], {}, {}
+    for i, (q, k, category) in enumerate(items):
+        if query_cache is not None:
+            # 与 /rag/search 共用缓存项
+            keys[i] = QueryCache.key('search', req.user, category, q, k)
+            results[i] = query_cache.get(keys[i])
+            if results[i] is not None:
+                continue
+            tokens[i] = query_cache.token(req.user, category)
+        pending.append(i)
+    if pending:
+        t0 = time.perf_counter()
+        try:
+            res = await vector_store.search_batch([items[i] for i in pending], user=req.user)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"向量检索失败: {e}")
+        cost = (time.perf_counter() - t0) / len(pending)
+        for i, r in zip(pending, res):
+            results[i] = r
+            if query_cache is not None:
+                query_cache.put(keys[i], r, tokens[i], cost)
+    data = [{"q": q, "data": r} for (q, _, _), r in zip(items, results)]
+    return {"code": 0, "message": "OK", "user": req.user, "data": data,
+            "meta": {"queries": len(items), "cached": len(items) - len(pending)}}
+
+def hybrid_fetch_k(topK: int, rerank: bool) -> int:
+    # 多取一些候选，避免两路各自去重后导致信息缺失；启用重排时由重排阶段提升精度，每路少取一些候选
+    return max(int(topK * (RERANK_CONFIG['fetch_factor'] if rerank else 2)), topK)
+
+async def fuse_legs(q: str, topK: int, req, rerank: bool, vec, kw) -> tuple:
+    """融合两路结果并（可选）重排，返回 (结果, 元信息, 是否降级)"""
+    (vec_res, vec_meta), (kw_res, kw_meta) = vec, kw
+    merged = merge_results(vec_res, kw_res, alpha=req.alpha, beta=req.beta, strategy=req.fusion,
+                           limit=max(topK, reranker.max_candidates) if rerank else topK)
+    meta = {
+        'partial': vec_meta['status'] != 'ok' or kw_meta['status'] != 'ok',
+        'cached': False,
+        'legs': {'vector': vec_meta, 'keyword': kw_meta},
+    }
+    # 向量一路只取了轻量字段：只为融合后的候选（重排需要内容）一次批量补全 content
+    try:
+        await vector_store.hydrate(merged, req.user)
+    except Exception as e:
+        print(f"[API] 补全检索结果内容失败: {e}")
+        meta['partial'] = True
+    if rerank:
+        merged, meta['rerank'] = await reranker.rerank(q, merged, topK)
+    # 降级（部分结果、重排模型忙/超时/失败）不缓存
+    degraded = meta['partial'] or meta.get('rerank', {}).get('status') in ('timeout', 'error', 'busy')
+    return merged[:topK], meta, degraded
+
+def hybrid_output(req: HybridSearchReq, data: List[Dict], meta: Dict[str, Any]):
+    data = streaming.project(data, req.fields)
+    if req.stream:
+        return streaming.stream_response(data, meta, req.stream)
+    return {"code": 0, "message": "OK", "data": data, "meta": meta}
 
 @app.post("/rag/hybrid-search", response_model=Dict[str, Any])
-def hybrid_search(req: HybridSearchReq):
-    """混合检索接口（向量+关键词）"""
+async def hybrid_search(req: HybridSearchReq):
+    """混合检索接口（向量+关键词，支持字段裁剪与 NDJSON/SSE 流式返回）"""
     if not req.q:
         raise HTTPException(status_code=400, detail="参数 q 不能为空")
+    check_output(req)
+    if req.fusion not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"参数 fusion 仅支持: {', '.join(STRATEGIES)}")
+    rerank = req.rerank and reranker.enabled
+    if query_cache is not None:
+        key = QueryCache.key('hybrid', req.user, req.category, req.q, req.topK, req.alpha, req.beta, req.fusion, rerank)
+        cached = query_cache.get(key)
+        if cached is not None:
+            return hybrid_output(req, cached[0], dict(cached[1], cached=True))
+        token = query_cache.token(req.user, req.category)
     # 使用全局共享的向量存储实例
     user_store = vector_store
-    # 多取一些候选，避免两路各自去重后导致信息缺失，同时传递user参数
-    vec_res = user_store.search(req.q, topK=max(req.topK * 2, req.topK), category=req.category, user=req.user)
-    try:
-        kw_res = like_search(req.q, req.category, topK=max(req.topK * 2, req.topK), user=req.user)
-    except Exception as e:
-        # 当数据库不可用时，关键词检索回退为空集合，保证接口仍可用
-        kw_res = []
-    merged = merge_results(vec_res, kw_res, alpha=req.alpha, beta=req.beta)
-    return {"code": 0, "message": "OK", "data": merged[:req.topK]}
+    t0 = time.perf_counter()
+    fetch_k = hybrid_fetch_k(req.topK, rerank)
+    # 向量与关键词两路并发执行，各自有截止时间；某一路超时/失败时只用另一路的结果融合
+    vec, kw = await asyncio.gather(
+        run_leg('vector', user_store.search(req.q, topK=fetch_k, category=req.category, user=req.user, lazy=True),
+                HYBRID_CONFIG['vector_timeout_ms']),
+        run_leg('keyword', keyword_search(req.q, req.category, topK=fetch_k, user=req.user),
+                HYBRID_CONFIG['keyword_timeout_ms']),
+    )
+    if vec[1]['status'] != 'ok' and kw[1]['status'] != 'ok':
+        raise HTTPException(status_code=500, detail=f"混合检索失败: vector={vec[1]['status']}, keyword={kw[1]['status']}")
+    data, meta, degraded = await fuse_legs(req.q, req.topK, req, rerank, vec, kw)
+    if query_cache is not None and not degraded:
+        query_cache.put(key, (data, meta), token, time.perf_counter() - t0)
+    return hybrid_output(req, data, meta)
+
+@app.post("/rag/hybrid-search-batch", response_model=Dict[str, Any])
+async def hybrid_search_batch(req: HybridSearchBatchReq):
+    """
+    批量混合检索：向量一路所有查询一次 embedding、一次批量向量查询，关键词一路各查询并发执行，
+    再逐条融合/重排；某条查询两路都失败时该条返回空结果并在 meta 中标记，不影响其他查询
+    """
+    items = batch_items(req)
+    if req.fusion not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"参数 fusion 仅支持: {', '.join(STRATEGIES)}")
+    rerank = req.rerank and reranker.enabled
+    results: List[Optional[tuple]] = [None] * len(items)
+    pending, keys, tokens = [], {}, {}
+    for i, (q, k, category) in enumerate(items):
+        if query_cache is not None:
+            # 与 /rag/hybrid-search 共用缓存项
+            keys[i] = QueryCache.key('hybrid', req.user, category, q, k, req.alpha, req.beta, req.fusion, rerank)
+            cached = query_cache.get(keys[i])
+            if cached is not None:
+                results[i] = (cached[0], dict(cached[1], cached=True))
+                continue
+            tokens[i] = query_cache.token(req.user, category)
+        pending.append(i)
+
+    if pending:
+        t0 = time.perf_counter()
+        fetch = [(items[i][0], hybrid_fetch_k(items[i][1], rerank), items[i][2]) for i in pending]
+        (vec_all, vec_meta), *kw_legs = await asyncio.gather(
+            run_leg('vector', vector_store.search_batch(fetch, user=req.user, lazy=True), HYBRID_CONFIG['vector_timeout_ms']),
+            *[run_leg('keyword', keyword_search(q, category, topK=k, user=req.user), HYBRID_CONFIG['keyword_timeout_ms'])
+              for q, k, category in fetch],
+        )
+        cost = (time.perf_counter() - t0) / len(pending)
+        if vec_meta['status'] != 'ok':
+            vec_all = [[] for _ in pending]
+
+        async def finish(n: int, i: int) -> None:
+            q, k, _ = items[i]
+            vec = (vec_all[n], dict(vec_meta, hits=len(vec_all[n])))
+            if vec_meta['status'] != 'ok' and kw_legs[n][1]['status'] != 'ok':
+                results[i] = ([], {'partial': True, 'cached': False, 'error': True,
+                                   'legs': {'vector': vec[1], 'keyword': kw_legs[n][1]}})
+                return
+            data, meta, degraded = await fuse_legs(q, k, req, rerank, vec, kw_legs[n])
+            results[i] = (data, meta)
+            if query_cache is not None and not degraded:
+                query_cache.put(keys[i], (data, meta), tokens[i], cost)
+
+        await asyncio.gather(*[finish(n, i) for n, i in enumerate(pending)])
+
+    data = [{"q": q, "data": r[0], "meta": r[1]} for (q, _, _), r in zip(items, results)]
+    return {"code": 0, "message": "OK", "data": data,
+            "meta": {"queries": len(items), "cached": len(items) - len(pending)}}
 
 @app.post("/rag/sync-db", response_model=Dict[str, Any])
-def sync_db(req: SyncDBReq):
-    """批量同步数据库内容到向量库"""
-    # 使用全局共享的向量存储实例
-    user_store = vector_store
-    # 从 DB 批量读取构建索引（简单示例：按 LIKE 拉取全部）
-    kw_res = like_search('', req.category, topK=req.limit, user=req.user)  # 空查询返回全部（实现上可能不支持，实际请改为全量 select）
-    texts = [i.get('content', '') for i in kw_res]
-    metas = [{
-        'title': i.get('title'), 'category': i.get('category'),
-        'keywords': i.get('keywords'), 'content': i.get('content', ''),
-        'user': req.user  # 添加用户信息到元数据
-    } for i in kw_res]
-    if not texts:
-        return {"code": 0, "message": "OK", "data": {"ingested": 0}}
-    user_store.add_texts(texts, metas)
-    return {"code": 0, "message": "OK", "data": {"ingested": len(texts)}}
+async def sync_db(req: SyncDBReq):
+    """批量同步数据库内容到向量库（后台任务，立即返回 job_id）"""
+    # 按 (updated_at, id) 流式分页读取，只对内容变化的记录重新 embedding
+    job = db_sync.start(req.user, category=req.category, limit=req.limit, full=req.full)
+    return {"code": 0, "message": "OK", "data": job.to_dict()}
+
+@app.post("/rag/sync-status", response_model=Dict[str, Any])
+async def sync_status(req: JobStatusReq):
+    """查询同步任务进度"""
+    job = db_sync.get(req.job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"同步任务不存在: {req.job_id}")
+    return {"code": 0, "message": "OK", "data": job.to_dict()}
 
 @app.post("/rag/delete-by-title", response_model=Dict[str, Any])
-def delete_by_title(req: DeleteByTitleReq):
+async def delete_by_title(req: DeleteByTitleReq):
     """根据标题删除用户向量库中的内容"""
     print(f"[API] 收到删除请求，用户: {req.user}，标题: {req.title}")
     try:
         user_store = vector_store
         print(f"[API] 获取用户存储成功")
-        deleted_count = user_store.delete_by_title(req.title, user=req.user)
+        deleted_count = await user_store.delete_by_title(req.title, user=req.user)
         print(f"[API] 删除操作完成，删除数量: {deleted_count}")
         return {"code": 0, "message": "OK", "data": {"deleted": deleted_count}}
     except Exception as e:
@@ -264,13 +570,13 @@ def delete_by_title(req: DeleteByTitleReq):
         raise HTTPException(status_code=500, detail=f"删除失败: {e}")
 
 @app.post("/rag/delete-by-category", response_model=Dict[str, Any])
-def delete_by_category(req: DeleteByCategoryReq):
+async def delete_by_category(req: DeleteByCategoryReq):
     """根据类别删除用户向量库中的内容"""
     print(f"[API] 收到删除请求，用户: {req.user}，类别: {req.category}")
     try:
         user_store = vector_store
         print(f"[API] 获取用户存储成功")
-        deleted_count = user_store.delete_by_category(req.category, user=req.user)
+        deleted_count = await user_store.delete_by_category(req.category, user=req.user)
         print(f"[API] 删除操作完成，删除数量: {deleted_count}")
         return {"code": 0, "message": "OK", "data": {"deleted": deleted_count}}
     except Exception as e:
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+切分方式对比：原按字符切分的 chunk_text 与按句子/token 的语义切分
+
+指标：
+- chunk 数、平均 token 数、完整保留在某个 chunk 中的句子比例
+- 检索效果：从语料中抽取句子作为查询，用 BM25 检索 chunk，
+  命中 = 前 k 个结果中有 chunk 完整包含该句子（被切断的句子无法完整召回）
+
+不依赖 DashScope 与 Qdrant，默认使用仓库内的 Markdown 文档作为语料。
+
+用法: python bench_chunker.py [--size 200] [--overlap 20] [--queries 300] [files ...]
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.bm25_index import BM25Index
+from services.chunker import iter_chunks, split_sentences, token_counter
+
+
+def legacy_chunk_text(text: str, size: int, overlap: int):
+    # 改造前 app.py 中的实现：按字符数切分（不考虑语义）
+    text = (text or '').strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    n = len(text)
+    while start < n:
+        end = min(start + size, n)
+        chunks.append(text[start:end])
+        start = start + size - overlap
+        if start < 0:
+            break
+    return chunks
+
+
+def evaluate(name, docs, splitter, queries, count):
+    t0 = time.perf_counter()
+    index = BM25Index()
+    chunks = []
+    for text in docs:
+        for c in splitter(text):
+            chunks.append(c)
+            index.on_add([(len(chunks) - 1, {'user': 'bench', 'title': '', 'content': c})])
+    elapsed = time.perf_counter() - t0
+
+    intact = sum(1 for q in queries if any(q in c for c in chunks)) / max(1, len(queries))
+    avg_tokens = sum(count(c) for c in chunks) / max(1, len(chunks))
+
+    hits = {1: 0, 3: 0}
+    for q in queries:
+        res = index.search(q, 3, user='bench')
+        for k in hits:
+            if any(q in r['content'] for r in res[:k]):
+                hits[k] += 1
+    n = max(1, len(queries))
+    print(f"{name:<10} {len(chunks):>7} {avg_tokens:>8.1f} {intact:>9.1%} "
+          f"{hits[1] / n:>8.1%} {hits[3] / n:>8.1%} {elapsed * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='chunk 切分方式对比')
+    parser.add_argument('files', nargs='*', help='语料文件，默认使用仓库内的 Markdown 文档')
+    parser.add_argument('--size', type=int, default=200, help='chunk 上限（旧实现为字符数，新实现为 token 数）')
+    parser.add_argument('--overlap', type=int, default=20, help='重叠大小')
+    parser.add_argument('--queries', type=int, default=300, help='抽样查询句数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        files = [f for f in glob.glob(os.path.join(root, '**', '*.md'), recursive=True) if 'node_modules' not in f]
+    docs = []
+    for f in files:
+        with open(f, 'r', encoding='utf-8', errors='ignore') as fh:
+            docs.append(fh.read())
+
+    count = token_counter()
+    sentences = [s.strip() for d in docs for s in split_sentences(d) if 10 <= count(s.strip()) <= args.size // 2]
+    random.seed(args.seed)
+    queries = random.sample(sentences, min(args.queries, len(sentences)))
+
+    print(f"语料: {len(docs)} 个文件，{sum(len(d) for d in docs)} 字符；查询: {len(queries)} 句")
+    print(f"{'splitter':<10} {'chunks':>7} {'avg_tok':>8} {'intact':>9} {'hit@1':>8} {'hit@3':>8} {'split_ms':>9}")
+    evaluate('legacy', docs, lambda t: legacy_chunk_text(t, args.size, args.overlap), queries, count)
+    evaluate('semantic', docs, lambda t: iter_chunks(t, args.size, args.overlap, count), queries, count)
+
+
+if __name__ == "__main__":
+    main()
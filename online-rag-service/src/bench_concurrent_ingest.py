@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发入库压测：多个用户同时调用 VectorStore.add_texts，观察吞吐随并发用户数的变化
+
+不依赖 DashScope 与 Qdrant 服务：embedding 与向量库写入用固定延迟模拟网络耗时，
+向量库使用 Qdrant 本地内存模式。对比两种加锁方式：
+- tenant：按用户加锁（当前实现）
+- global：所有请求共用同一把锁（改造前的行为，用同一个锁键模拟）
+
+用法: python bench_concurrent_ingest.py [--users 1,2,4,8,16] [--docs 8] [--chunks 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_store import VectorStore
+from services.vector_backends import QdrantBackend
+
+
+class SimulatedEmbedder:
+    """固定延迟的随机向量 embedder，模拟远端 embedding 调用"""
+
+    model_name = 'simulated'
+
+    def __init__(self, dim: int = 256, latency_ms: float = 30.0):
+        self.dim = dim
+        self.latency = latency_ms / 1000.0
+
+    def dimension(self) -> int:
+        return self.dim
+
+    async def aencode(self, texts):
+        await asyncio.sleep(self.latency)
+        return np.random.rand(len(texts), self.dim).astype('float32')
+
+
+class SlowQdrantBackend(QdrantBackend):
+    """写入前增加固定延迟，模拟与远端 Qdrant 的往返耗时"""
+
+    def __init__(self, latency_ms: float = 20.0):
+        super().__init__(client=AsyncQdrantClient(":memory:"))
+        self.latency = latency_ms / 1000.0
+
+    async def upsert(self, ids, vectors, payloads) -> None:
+        await asyncio.sleep(self.latency)
+        await super().upsert(ids, vectors, payloads)
+
+
+async def run(mode: str, n_users: int, docs: int, chunks: int) -> float:
+    store = VectorStore(SimulatedEmbedder(), backend=SlowQdrantBackend())
+    await store.init()
+    if mode == 'global':
+        # 所有用户映射到同一个锁键，等价于全局锁
+        hold = store.locks.hold
+        store.locks.hold = lambda users: hold([''])
+
+    async def ingest(user: str):
+        for d in range(docs):
+            texts = [f"{user} 文档{d} 片段{i}" for i in range(chunks)]
+            metas = [{'user': user, 'title': f"doc{d}", 'category': 'bench', 'content': t} for t in texts]
+            await store.add_texts(texts, metas)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[ingest(f"user{u}") for u in range(n_users)])
+    elapsed = time.perf_counter() - t0
+    await store.close()
+    return n_users * docs * chunks / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='VectorStore 并发入库压测')
+    parser.add_argument('--users', default='1,2,4,8,16', help='并发用户数列表，逗号分隔')
+    parser.add_argument('--docs', type=int, default=8, help='每个用户入库的文档数')
+    parser.add_argument('--chunks', type=int, default=20, help='每个文档的 chunk 数')
+    args = parser.parse_args()
+
+    # 压测时屏蔽 VectorStore 的逐条日志
+    import builtins
+    real_print = builtins.print
+    builtins.print = lambda *a, **k: None
+
+    rows = []
+    for n in [int(x) for x in args.users.split(',')]:
+        rows.append((n, await run('global', n, args.docs, args.chunks), await run('tenant', n, args.docs, args.chunks)))
+
+    builtins.print = real_print
+    print(f"{'users':>6} {'global(chunks/s)':>18} {'tenant(chunks/s)':>18} {'speedup':>8}")
+    for n, g, t in rows:
+        print(f"{n:>6} {g:>18.1f} {t:>18.1f} {t / g:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+混合检索融合耗时对比：改造前逐条循环的 merge_results 与 NumPy 向量化的 fusion.fuse
+
+构造两路各 N 条候选（部分重叠、部分只有 content 没有 id），分别计时：
+- legacy：原实现（逐条归一化、dict 合并、全量排序）
+- fuse：minmax / zscore / rrf 三种策略，只为前 topK 条构造结果
+
+不依赖 DashScope、Qdrant 与 MySQL。
+
+用法: python bench_fusion.py [--n 10000] [--overlap 0.3] [--topk 10] [--rounds 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.fusion import STRATEGIES, fuse
+
+
+def legacy_normalize_scores(items, key):
+    vals = [float(i.get(key, 0.0)) for i in items]
+    if not vals:
+        return
+    mn, mx = min(vals), max(vals)
+    if mx == mn:
+        for i in items:
+            i["_norm_" + key] = 1.0 if mx > 0 else 0.0
+        return
+    rng = mx - mn
+    for i in items:
+        i["_norm_" + key] = (float(i.get(key, 0.0)) - mn) / rng
+
+
+def legacy_merge_results(vec_items, kw_items, alpha=0.7, beta=0.3):
+    # 改造前 services/hybrid_search.py 中的实现
+    legacy_normalize_scores(vec_items, 'score_vec')
+    for k in kw_items:
+        if 'score_kw' not in k:
+            k['score_kw'] = 1.0
+    legacy_normalize_scores(kw_items, 'score_kw')
+
+    by_id = {}
+    def key_of(item):
+        return item.get('id') or hash(item.get('content', ''))
+
+    for v in vec_items:
+        by_id[key_of(v)] = dict(v)
+    for w in kw_items:
+        k = key_of(w)
+        if k in by_id:
+            merged = by_id[k]
+            for kk, vv in w.items():
+                if kk not in merged or not merged.get(kk):
+                    merged[kk] = vv
+        else:
+            by_id[k] = dict(w)
+
+    res = []
+    for item in by_id.values():
+        sv = float(item.get('_norm_score_vec', 0.5))
+        sk = float(item.get('_norm_score_kw', 0.0))
+        item['score'] = float(alpha * sv + beta * sk)
+        res.append(item)
+    res.sort(key=lambda x: x.get('score', 0.0), reverse=True)
+    return res
+
+
+def make_legs(n, overlap, seed):
+    random.seed(seed)
+    docs = [{'id': i if i % 5 else None, 'title': f'doc-{i}', 'content': f'content {i} ' * 20}
+            for i in range(int(n * (2 - overlap)))]
+    vec = [dict(d, score_vec=random.random()) for d in docs[:n]]
+    kw = [dict(d, score_kw=random.random() * 20, title='') for d in docs[-n:]]
+    random.shuffle(kw)
+    return vec, kw
+
+
+def timed(fn, vec, kw, rounds):
+    best = float('inf')
+    res = None
+    for _ in range(rounds):
+        # 每轮使用新副本，避免上一轮写入的归一化字段影响计时
+        v, k = [dict(i) for i in vec], [dict(i) for i in kw]
+        t0 = time.perf_counter()
+        res = fn(v, k)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='混合检索融合耗时对比')
+    parser.add_argument('--n', type=int, default=10000, help='每一路的候选数')
+    parser.add_argument('--overlap', type=float, default=0.3, help='两路重叠比例')
+    parser.add_argument('--topk', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    vec, kw = make_legs(args.n, args.overlap, 42)
+    print(f"每路候选: {args.n}，重叠: {args.overlap:.0%}，topK: {args.topk}，取 {args.rounds} 轮最快")
+    print(f"{'method':<16} {'ms':>9} {'speedup':>8} {'top@k 一致':>10}")
+
+    base, legacy = timed(lambda v, k: legacy_merge_results(v, k)[:args.topk], vec, kw, args.rounds)
+    expect = [(r.get('id'), r['title']) for r in legacy]
+    print(f"{'legacy':<16} {base * 1000:>9.2f} {1.0:>7.1f}x {'-':>10}")
+    for strategy in STRATEGIES:
+        cost, res = timed(lambda v, k: fuse(v, k, strategy=strategy, limit=args.topk), vec, kw, args.rounds)
+        same = '是' if [(r.get('id'), r['title']) for r in res] == expect else '否'
+        print(f"{'fuse/' + strategy:<16} {cost * 1000:>9.2f} {base / cost:>7.1f}x "
+              f"{same if strategy == 'minmax' else '-':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟补全对比：混合检索向量一路取完整 payload，与只取轻量字段、融合后为 topK 按 ID 补全 content 的传输量
+
+向量库使用 Qdrant 本地内存模式（无网络），因此只统计从向量库取回的 payload 字节数（JSON 序列化后），
+不比较耗时；远端 Qdrant 上传输与反序列化开销大致与字节数成正比。
+- full：检索 fetch_k 条，每条带完整 content
+- lazy：检索 fetch_k 条不带 content，再一次 retrieve 取回 topK 条的 content
+
+用法: python bench_lazy_payload.py [--points 2000] [--chunk-chars 800] [--topk 5] [--fetch-factor 2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_backends import QdrantBackend
+
+
+def payload_bytes(payloads) -> int:
+    return sum(len(json.dumps(p, ensure_ascii=False).encode('utf-8')) for p in payloads)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='延迟补全传输量对比')
+    parser.add_argument('--points', type=int, default=2000)
+    parser.add_argument('--chunk-chars', type=int, default=800, help='每个 chunk 的字符数（切分默认 800）')
+    parser.add_argument('--topk', type=int, default=5)
+    parser.add_argument('--fetch-factor', type=float, default=2.0, help='每路取 topK 的倍数（不重排时为 2）')
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--dim', type=int, default=128)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    backend = QdrantBackend(client=AsyncQdrantClient(":memory:"))
+    await backend.ensure(args.dim)
+    vecs = rng.standard_normal((args.points, args.dim)).astype('float32')
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(args.points)]
+    payloads = [{'user': 'bench', 'id': i, 'title': f'文档 {i // 4}', 'category': 'c', 'keywords': '',
+                 'source': 'bench', 'content': '知识库内容' * (args.chunk_chars // 5)} for i in range(args.points)]
+    for start in range(0, args.points, 500):
+        await backend.upsert(ids[start:start + 500], vecs[start:start + 500], payloads[start:start + 500])
+
+    fetch_k = int(args.topk * args.fetch_factor)
+    full = lazy = 0
+    for q in rng.standard_normal((args.queries, args.dim)).astype('float32'):
+        hits = await backend.query(q, {'user': 'bench'}, fetch_k)
+        full += payload_bytes(p for _, _, p in hits)
+        hits = await backend.query(q, {'user': 'bench'}, fetch_k, exclude=['content'])
+        lazy += payload_bytes(p for _, _, p in hits)
+        hydrated = await backend.retrieve([pid for pid, _, _ in hits[:args.topk]], {'user': 'bench'}, fields=['content'])
+        lazy += payload_bytes(hydrated.values())
+
+    print(f"\n点数: {args.points}，chunk 字符数: {args.chunk_chars}，topK: {args.topk}，每路取: {fetch_k}")
+    print(f"{'mode':<6} {'bytes/query':>12} {'round_trips':>12}")
+    print(f"{'full':<6} {full // args.queries:>12} {1:>12}")
+    print(f"{'lazy':<6} {lazy // args.queries:>12} {2:>12}")
+    print(f"传输量减少: {1 - lazy / full:.0%}")
+    await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 embedding 模型吞吐压测：不同每批条数 / 并发推理线程数下的 texts/s，以及按长度排序分批（动态 padding）
+相对按输入顺序分批时的 padding 比例
+
+需要安装 onnxruntime 与 tokenizers，并准备模型目录或 Hugging Face 仓库名（见 README「本地 embedding 模型」）。
+文本为长度不一的合成中文文本（模拟切分后的 chunk 与短查询混合）。
+
+用法: python bench_local_embedder.py --model <目录或仓库名> [--texts 512] [--batches 8,32] [--workers 1,2,4]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.local_embedder import LocalEmbedder
+
+
+def make_texts(n, seed):
+    rng = np.random.default_rng(seed)
+    words = ['知识库', '向量检索', '混合检索', '用户', '文档', '模型', '缓存', '分片', '查询', '结果']
+    return [''.join(rng.choice(words, size=int(rng.integers(2, 200)))) for _ in range(n)]
+
+
+def padding_ratio(lengths, batch_size):
+    """填充 token 占总计算 token 的比例"""
+    padded = sum(max(lengths[i:i + batch_size]) * len(lengths[i:i + batch_size]) for i in range(0, len(lengths), batch_size))
+    return 1 - sum(lengths) / padded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 embedding 吞吐压测')
+    parser.add_argument('--model', required=True, help='模型目录或 Hugging Face 仓库名')
+    parser.add_argument('--texts', type=int, default=512)
+    parser.add_argument('--batches', default='8,32', help='逗号分隔的每批条数')
+    parser.add_argument('--workers', default='1,2,4', help='逗号分隔的并发推理线程数')
+    parser.add_argument('--threads', type=int, default=0, help='单次推理的算子线程数，0 为默认')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.seed)
+    print(f"\n文本数: {args.texts}")
+    print(f"{'batch':>5} {'workers':>7} {'texts/s':>9} {'pad(sorted)':>12} {'pad(input)':>11}")
+    for batch in (int(x) for x in args.batches.split(',')):
+        for workers in (int(x) for x in args.workers.split(',')):
+            embedder = LocalEmbedder(args.model, batch_size=batch, workers=workers, intra_threads=args.threads)
+            embedder.encode(texts[:batch])  # 预热
+            lengths = [len(e.ids) for e in embedder.tokenizer.encode_batch(texts)]
+            t0 = time.perf_counter()
+            embedder.encode(texts)
+            rate = len(texts) / (time.perf_counter() - t0)
+            print(f"{batch:>5} {workers:>7} {rate:>9.1f} {padding_ratio(sorted(lengths), batch):>12.0%} "
+                  f"{padding_ratio(lengths, batch):>11.0%}")
+            embedder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+降维对比：原始维度与 PCA 投影 / 前缀截断（Matryoshka 方式）到不同维度
+
+指标：recall@k（以原始维度精确检索为基准）、单次查询耗时（NumPy 精确检索）、每条向量字节数。
+数据为方差按幂律衰减的合成向量（模拟 embedding 的谱分布，--decay 越大信息越集中在少数主成分）；
+PCA 在一部分样本上拟合，在其余样本上评估。真实语料的投影质量请用 fit_projection.py 评估。
+前缀截断只对按 Matryoshka 方式训练的模型（如 text-embedding-v3 的短维度输出）有意义，这里作为对照。
+
+用法: python bench_projection.py [--n 20000] [--dim 1536] [--dims 768,512,256,128] [--decay 0.8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.projection import PCAProjection
+
+
+def make_data(n, dim, decay, seed):
+    rng = np.random.default_rng(seed)
+    scales = (np.arange(1, dim + 1) ** -decay).astype('float32')
+    rotation, _ = np.linalg.qr(rng.standard_normal((dim, dim)).astype('float32'))
+    x = (rng.standard_normal((n, dim)).astype('float32') * scales) @ rotation.T
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def normalize(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def evaluate(name, base, queries, truth, k):
+    t0 = time.perf_counter()
+    found = [np.argpartition(-(base @ q), k - 1)[:k] for q in queries]
+    ms = (time.perf_counter() - t0) * 1000 / len(queries)
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    print(f"{name:<14} {base.shape[1]:>5} {recall:>9.3f} {ms:>9.2f} {base.shape[1] * 4:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='降维召回率/耗时对比')
+    parser.add_argument('--n', type=int, default=20000, help='向量条数')
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--dims', default='768,512,256,128', help='逗号分隔的目标维度')
+    parser.add_argument('--fit', type=int, default=5000, help='拟合 PCA 的样本数')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--decay', type=float, default=0.8, help='方差衰减指数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    data = make_data(args.n + args.fit + args.queries, args.dim, args.decay, args.seed)
+    fit, base, queries = data[:args.fit], data[args.fit:args.fit + args.n], data[args.fit + args.n:]
+    truth = [np.argpartition(-(base @ q), args.k - 1)[:args.k] for q in queries]
+
+    print(f"向量: {args.n} x {args.dim}，拟合样本: {args.fit}，查询: {args.queries}，k={args.k}，decay={args.decay}")
+    print(f"{'method':<14} {'dim':>5} {'recall@k':>9} {'ms/query':>9} {'bytes/vec':>10}")
+    evaluate('full', base, queries, truth, args.k)
+    for d in (int(x) for x in args.dims.split(',')):
+        projection = PCAProjection.fit(fit, d)
+        evaluate(f'pca({projection.explained.sum():.0%})', projection.transform(base), projection.transform(queries), truth, args.k)
+        evaluate('truncate', normalize(base[:, :d]), normalize(queries[:, :d]), truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量量化对比：float32 原始向量与 scalar（int8）/ binary（1 bit）量化 + oversampling + rescore
+
+指标：召回率 recall@k（以 float32 精确检索为基准）、单次查询耗时、向量常驻内存估算。
+数据为模拟 embedding 分布的低秩向量（默认 1536 维，与 DashScope text-embedding 一致）。
+离线模拟的耗时是 NumPy 的计算开销，仅供参考；服务端耗时以 --qdrant 的结果为准。
+
+两种运行方式：
+- 默认：离线用 NumPy 模拟量化检索（与 Qdrant 的做法一致：量化向量上取 k*oversampling 个候选，
+  再用原始向量重新打分），不依赖任何服务
+- --qdrant host:port：在真实 Qdrant 服务上为每种量化方式建临时集合，测量服务端检索耗时与召回率
+
+用法: python bench_quantization.py [--n 20000] [--dim 1536] [--queries 200] [--k 10] [--oversampling 1,2,4]
+      python bench_quantization.py --qdrant localhost:6333
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_backends import QUANTIZATIONS
+
+
+def make_data(n, dim, queries, seed, rank=64):
+    # 真实 embedding 的内在维度远低于向量维度：低秩潜变量投影到高维后加少量噪声
+    rng = np.random.default_rng(seed)
+    proj = rng.standard_normal((rank, dim)).astype('float32')
+    base = rng.standard_normal((n, rank)).astype('float32') @ proj
+    q = rng.standard_normal((queries, rank)).astype('float32') @ proj
+    base += 0.1 * np.sqrt(rank) * rng.standard_normal((n, dim)).astype('float32')
+    q += 0.1 * np.sqrt(rank) * rng.standard_normal((queries, dim)).astype('float32')
+    base /= np.linalg.norm(base, axis=1, keepdims=True)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return base, q
+
+
+def memory_mb(method, n, dim):
+    # 常驻内存的向量数据（不含 HNSW 图与 payload）；量化时原始向量放在磁盘
+    per = {'none': dim * 4, 'scalar': dim, 'binary': dim / 8}[method]
+    return n * per / 1024 / 1024
+
+
+def recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+class Simulated:
+    """NumPy 模拟的量化检索"""
+
+    def __init__(self, method, base):
+        self.method = method
+        self.base = base
+        if method == 'scalar':
+            lo, hi = np.quantile(base, [0.005, 0.995])
+            self.lo, self.scale = lo, (hi - lo) / 255.0
+            self.codes = np.clip(np.round((base - lo) / self.scale), 0, 255).astype(np.uint8)
+        elif method == 'binary':
+            self.codes = np.packbits(base > 0, axis=1)
+
+    def search(self, q, k, oversampling):
+        if self.method == 'none':
+            scores = self.base @ q
+            return np.argpartition(-scores, k - 1)[:k]
+        limit = int(k * oversampling)
+        if self.method == 'scalar':
+            approx = self.codes.astype(np.float32) @ q
+        else:
+            # 汉明距离越小越相似
+            bits = np.packbits(q > 0)
+            approx = -np.unpackbits(np.bitwise_xor(self.codes, bits), axis=1).sum(axis=1, dtype=np.int32)
+        cand = np.argpartition(-approx, limit - 1)[:limit]
+        # 用原始向量重新打分
+        scores = self.base[cand] @ q
+        return cand[np.argpartition(-scores, k - 1)[:k]]
+
+
+def run_simulated(base, queries, truth, args, oversamplings):
+    for method in QUANTIZATIONS:
+        index = Simulated(method, base)
+        for os_ in (oversamplings if method != 'none' else [1.0]):
+            t0 = time.perf_counter()
+            found = [index.search(q, args.k, os_) for q in queries]
+            ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            print(f"{method:<8} {os_:>6.1f} {recall(found, truth):>9.3f} {ms:>9.2f} {memory_mb(method, len(base), base.shape[1]):>10.1f}")
+
+
+async def run_qdrant(base, queries, truth, args, oversamplings):
+    from qdrant_client import AsyncQdrantClient
+    from qdrant_client.http.models import PointStruct, VectorParams, Distance, SearchParams, QuantizationSearchParams
+    from services.vector_backends import quantization_config
+
+    host, _, port = args.qdrant.partition(':')
+    client = AsyncQdrantClient(host=host, port=int(port or 6333))
+    try:
+        for method in QUANTIZATIONS:
+            name = f"bench_quantization_{method}"
+            if await client.collection_exists(name):
+                await client.delete_collection(name)
+            await client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=base.shape[1], distance=Distance.COSINE, on_disk=method != 'none'),
+                quantization_config=quantization_config(method)
+            )
+            for start in range(0, len(base), 500):
+                await client.upsert(collection_name=name, wait=True, points=[
+                    PointStruct(id=i, vector=base[i].tolist()) for i in range(start, min(start + 500, len(base)))
+                ])
+            for os_ in (oversamplings if method != 'none' else [1.0]):
+                params = None
+                if method != 'none':
+                    params = SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=os_))
+                found = []
+                t0 = time.perf_counter()
+                for q in queries:
+                    res = await client.query_points(collection_name=name, query=q.tolist(), limit=args.k, search_params=params)
+                    found.append([p.id for p in res.points])
+                ms = (time.perf_counter() - t0) * 1000 / len(queries)
+                print(f"{method:<8} {os_:>6.1f} {recall(found, truth):>9.3f} {ms:>9.2f} {memory_mb(method, len(base), base.shape[1]):>10.1f}")
+            await client.delete_collection(name)
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量量化召回率/耗时/内存对比')
+    parser.add_argument('--n', type=int, default=20000, help='向量条数')
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--oversampling', default='1,2,4', help='逗号分隔的 oversampling 倍数')
+    parser.add_argument('--qdrant', default='', help='Qdrant 地址 host:port，留空使用离线模拟')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    oversamplings = [float(x) for x in args.oversampling.split(',')]
+    base, queries = make_data(args.n, args.dim, args.queries, args.seed)
+    truth = [np.argpartition(-(base @ q), args.k - 1)[:args.k] for q in queries]
+
+    print(f"向量: {args.n} x {args.dim}，查询: {args.queries}，k={args.k}，{'Qdrant ' + args.qdrant if args.qdrant else '离线模拟'}")
+    print(f"{'method':<8} {'oversm':>6} {'recall@k':>9} {'ms/query':>9} {'vec_mem_MB':>10}")
+    if args.qdrant:
+        asyncio.run(run_qdrant(base, queries, truth, args, oversamplings))
+    else:
+        run_simulated(base, queries, truth, args, oversamplings)
+
+
+if __name__ == "__main__":
+    main()
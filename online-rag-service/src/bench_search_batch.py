@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量检索压测：N 条查询逐条调用 VectorStore.search、并发调用、与一次 search_batch 的耗时对比
+
+不依赖 DashScope 与 Qdrant 服务：embedding 调用与向量库往返用固定延迟模拟网络耗时，
+向量库使用 Qdrant 本地内存模式（本地模式为 Python 暴力检索，点数多时计算耗时会掩盖网络开销，默认只写入少量点）。
+- sequential：逐条检索（改造前 agent 每个子问题一次 /rag/search 的情况）
+- concurrent：单条检索并发执行（每条仍各自一次 embedding 调用与一次查询往返）
+- batch：一次 embedding 调用 + 一次 query_batch_points 往返
+
+用法: python bench_search_batch.py [--queries 1,4,8,16] [--points 500] [--embed-ms 40] [--rtt-ms 5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_store import VectorStore
+from services.vector_backends import QdrantBackend
+
+
+class SimulatedEmbedder:
+    """每次调用固定延迟的随机向量 embedder，模拟远端 embedding 调用"""
+
+    model_name = 'simulated'
+
+    def __init__(self, dim: int = 256, latency_ms: float = 40.0):
+        self.dim = dim
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+
+    def dimension(self) -> int:
+        return self.dim
+
+    async def aencode(self, texts):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return np.random.rand(len(texts), self.dim).astype('float32')
+
+
+class SlowQdrantBackend(QdrantBackend):
+    """每次查询往返增加固定延迟，模拟与远端 Qdrant 的网络耗时"""
+
+    def __init__(self, rtt_ms: float = 5.0):
+        super().__init__(client=AsyncQdrantClient(":memory:"))
+        self.rtt = rtt_ms / 1000.0
+        self.round_trips = 0
+
+    async def query(self, vector, filters, limit, exclude=None):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+        return await super().query(vector, filters, limit, exclude)
+
+    async def query_batch(self, vectors, filters, limits, exclude=None):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+        return await super().query_batch(vectors, filters, limits, exclude)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='批量检索压测')
+    parser.add_argument('--queries', default='1,4,8,16', help='逗号分隔的每批查询数')
+    parser.add_argument('--points', type=int, default=500)
+    parser.add_argument('--embed-ms', type=float, default=40.0)
+    parser.add_argument('--rtt-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    embedder = SimulatedEmbedder(latency_ms=args.embed_ms)
+    backend = SlowQdrantBackend(args.rtt_ms)
+    store = VectorStore(embedder, backend=backend)
+    await store.init()
+    vecs = np.random.rand(args.points, embedder.dim).astype('float32')
+    for start in range(0, args.points, 1000):
+        n = min(1000, args.points - start)
+        await backend.upsert([i for i in range(start, start + n)], vecs[start:start + n],
+                             [{'user': 'bench', 'content': f'doc {i}'} for i in range(start, start + n)])
+
+    print(f"\n点数: {args.points}，embedding 延迟: {args.embed_ms}ms，查询往返: {args.rtt_ms}ms")
+    print(f"{'queries':>7} {'mode':<11} {'total_ms':>9} {'ms/query':>9} {'embed':>6} {'rtt':>5}")
+    for n in (int(x) for x in args.queries.split(',')):
+        qs = [f'query {i}' for i in range(n)]
+        modes = {
+            'sequential': lambda: _sequential(store, qs),
+            'concurrent': lambda: asyncio.gather(*[store.search(q, 10, user='bench') for q in qs]),
+            'batch': lambda: store.search_batch([(q, 10, None) for q in qs], user='bench'),
+        }
+        for mode, fn in modes.items():
+            embedder.calls = backend.round_trips = 0
+            t0 = time.perf_counter()
+            await fn()
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"{n:>7} {mode:<11} {ms:>9.1f} {ms / n:>9.1f} {embedder.calls:>6} {backend.round_trips:>5}")
+
+
+async def _sequential(store, qs):
+    for q in qs:
+        await store.search(q, 10, user='bench')
+
+
+if __name__ == "__main__":
+    # 关闭 VectorStore 的逐条日志，避免干扰输出
+    import builtins
+    _print = builtins.print
+    builtins.print = lambda *a, **k: None if a and str(a[0]).startswith('[VectorStore]') else _print(*a, **k)
+    asyncio.run(main())
@@ -12,15 +12,53 @@ BASE_DIR = osp.dirname(__file__)
 # 数据配置 - 使用当前文件夹下的data/kb
 DATA_DIR = os.getenv('RAG_DATA_DIR', osp.join(BASE_DIR, 'data', 'kb'))
 INDEX_PATH = os.getenv('RAG_INDEX_PATH', osp.join(DATA_DIR, 'index.faiss'))
-META_PATH = os.getenv('RAG_META_PATH', osp.join(DATA_DIR, 'meta.json'))
+META_PATH = os.getenv('RAG_META_PATH', osp.join(DATA_DIR, 'meta.sqlite3'))
 
 # 确保数据目录存在
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # 配置项
-MODEL_NAME = os.getenv('RAG_MODEL_NAME', r'.\model')
+# Embedding 服务：dashscope（远端 API）或 local（本机 ONNX Runtime CPU 推理）
+EMBED_PROVIDER = os.getenv('RAG_EMBED_PROVIDER', 'dashscope').lower()
+# dashscope 为模型名；local 为模型目录（含 tokenizer.json 与 ONNX 模型）或 Hugging Face 仓库名
+MODEL_NAME = os.getenv('RAG_MODEL_NAME', osp.join(BASE_DIR, 'model') if EMBED_PROVIDER == 'local' else 'text-embedding-v1')
 DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY')
 
+# Embedding缓存配置（内存LRU + DATA_DIR下的磁盘缓存）
+EMBED_CACHE_CONFIG = {
+    'enabled': os.getenv('RAG_EMBED_CACHE', 'Y').upper() == 'Y',
+    'memory_size': int(os.getenv('RAG_EMBED_CACHE_SIZE', '10000')),
+    'disk_path': os.getenv('RAG_EMBED_CACHE_PATH', osp.join(DATA_DIR, 'embedding_cache.sqlite3')),
+    # 磁盘层条数上限，超过后删除最久未访问的记录，0 表示不限
+    'disk_max_rows': int(os.getenv('RAG_EMBED_CACHE_DISK_MAX', '500000'))
+}
+
+# Embedding批处理配置：单次调用上限（DashScope text-embedding-v1/v2 为25条）、并发数、单条查询合并窗口
+EMBED_BATCH_CONFIG = {
+    'enabled': os.getenv('RAG_EMBED_BATCH', 'Y').upper() == 'Y',
+    'max_batch': int(os.getenv('RAG_EMBED_MAX_BATCH', '25')),
+    'max_concurrency': int(os.getenv('RAG_EMBED_CONCURRENCY', '4')),
+    'window_ms': float(os.getenv('RAG_EMBED_WINDOW_MS', '5'))
+}
+
+# 向量降维：服务端输出维度（DashScope text-embedding-v3 及以上支持，0 为模型默认维度）、
+# 离线拟合的 PCA 投影文件（fit_projection.py 生成，留空不启用）
+EMBED_DIM_CONFIG = {
+    'dimensions': int(os.getenv('RAG_EMBED_DIMENSIONS', '0')),
+    'projection_path': os.getenv('RAG_PROJECTION_PATH', '')
+}
+
+# 本地 embedding 模型（RAG_EMBED_PROVIDER=local）：每批条数、最大 token 数、并发推理线程数、
+# 单次推理的算子线程数（0 为 onnxruntime 默认）、池化方式（mean / cls）、模型目录内的 ONNX 文件（留空自动查找）
+LOCAL_EMBED_CONFIG = {
+    'batch_size': int(os.getenv('RAG_LOCAL_EMBED_BATCH', '32')),
+    'max_length': int(os.getenv('RAG_LOCAL_EMBED_MAX_LENGTH', '512')),
+    'workers': int(os.getenv('RAG_LOCAL_EMBED_WORKERS', '2')),
+    'intra_threads': int(os.getenv('RAG_LOCAL_EMBED_THREADS', '0')),
+    'pooling': os.getenv('RAG_LOCAL_EMBED_POOLING', 'mean').lower(),
+    'onnx_file': os.getenv('RAG_LOCAL_EMBED_ONNX', '')
+}
+
 DB_CONFIG = {
     'host': os.getenv('RAG_DB_HOST', 'localhost'),
     'port': int(os.getenv('RAG_DB_PORT', '3306')),
@@ -29,15 +67,124 @@ DB_CONFIG = {
     'database': os.getenv('RAG_DB_NAME', 'demo_db')
 }
 
+# 进程内BM25关键词索引（可选，启用后混合检索的关键词一路不再访问MySQL）
+BM25_CONFIG = {
+    'enabled': os.getenv('RAG_BM25', 'N').upper() == 'Y',
+    'k1': float(os.getenv('RAG_BM25_K1', '1.2')),
+    'b': float(os.getenv('RAG_BM25_B', '0.75'))
+}
+
+# 混合检索配置：两路检索各自的截止时间（毫秒）
+HYBRID_CONFIG = {
+    'vector_timeout_ms': float(os.getenv('RAG_HYBRID_VECTOR_TIMEOUT_MS', '3000')),
+    'keyword_timeout_ms': float(os.getenv('RAG_HYBRID_KEYWORD_TIMEOUT_MS', '1000'))
+}
+
+# 混合检索重排：后端（none / lexical / cross）、本地交叉编码器模型路径、批大小、最大输入长度、
+# 参与重排的候选上限、截止时间（毫秒）、重排分数权重、启用重排时每路取 topK 的倍数
+RERANK_CONFIG = {
+    'backend': os.getenv('RAG_RERANK', 'none').lower(),
+    'model': os.getenv('RAG_RERANK_MODEL', ''),
+    'batch_size': int(os.getenv('RAG_RERANK_BATCH', '16')),
+    'max_length': int(os.getenv('RAG_RERANK_MAX_LENGTH', '512')),
+    'max_candidates': int(os.getenv('RAG_RERANK_CANDIDATES', '30')),
+    'timeout_ms': float(os.getenv('RAG_RERANK_TIMEOUT_MS', '300')),
+    'weight': float(os.getenv('RAG_RERANK_WEIGHT', '0.5')),
+    'fetch_factor': float(os.getenv('RAG_RERANK_FETCH_FACTOR', '1.5'))
+}
+
+# 批量检索：单次请求的查询条数上限
+SEARCH_BATCH_CONFIG = {
+    'max_queries': int(os.getenv('RAG_SEARCH_BATCH_MAX', '32'))
+}
+
+# 混合检索延迟补全：向量一路检索时不返回这些 payload 字段（默认 content），融合后只为最终结果按 ID 一次批量补全
+LAZY_PAYLOAD_CONFIG = {
+    'enabled': os.getenv('RAG_LAZY_PAYLOAD', 'Y').upper() == 'Y',
+    'fields': [f.strip() for f in os.getenv('RAG_LAZY_PAYLOAD_FIELDS', 'content').split(',') if f.strip()]
+}
+
+# MySQL连接池配置：最小/最大连接数、连接最大存活秒数、借出等待超时秒数
+DB_POOL_CONFIG = {
+    'minsize': int(os.getenv('RAG_DB_POOL_MIN', '1')),
+    'maxsize': int(os.getenv('RAG_DB_POOL_MAX', '10')),
+    'max_age': float(os.getenv('RAG_DB_POOL_MAX_AGE', '3600')),
+    'acquire_timeout': float(os.getenv('RAG_DB_POOL_TIMEOUT', '5'))
+}
+
+# 数据库同步配置：每页读取行数、读取与写入之间最多缓冲的页数、水位与行哈希的存储路径、续跑时回看的秒数
+SYNC_CONFIG = {
+    'page_size': int(os.getenv('RAG_SYNC_PAGE_SIZE', '200')),
+    'queue_pages': int(os.getenv('RAG_SYNC_QUEUE_PAGES', '2')),
+    'state_path': os.getenv('RAG_SYNC_STATE_PATH', osp.join(DATA_DIR, 'sync_state.sqlite3')),
+    'overlap_seconds': int(os.getenv('RAG_SYNC_OVERLAP_SECONDS', '1'))
+}
+
+# 后台入库任务队列：任务持久化路径、worker 数、每批写入的 chunk 数、最大尝试次数、已结束任务保留天数
+INGEST_QUEUE_CONFIG = {
+    'path': os.getenv('RAG_INGEST_QUEUE_PATH', osp.join(DATA_DIR, 'ingest_jobs.sqlite3')),
+    'workers': int(os.getenv('RAG_INGEST_WORKERS', '2')),
+    'batch_chunks': int(os.getenv('RAG_INGEST_BATCH_CHUNKS', '100')),
+    'max_attempts': int(os.getenv('RAG_INGEST_MAX_ATTEMPTS', '3')),
+    'keep_days': float(os.getenv('RAG_INGEST_KEEP_DAYS', '7'))
+}
+
+# 文本切分配置：默认 chunk 上限与重叠（以模型 token 计）、新内容过少时并入相邻 chunk 的下限，
+# 计数所用的 DashScope 分词器（需安装 tiktoken，留空或不可用时按字符估算）
+CHUNK_CONFIG = {
+    'max_tokens': int(os.getenv('RAG_CHUNK_MAX_TOKENS', '500')),
+    'overlap_tokens': int(os.getenv('RAG_CHUNK_OVERLAP_TOKENS', '50')),
+    'min_tokens': int(os.getenv('RAG_CHUNK_MIN_TOKENS', '20')),
+    'tokenizer': os.getenv('RAG_CHUNK_TOKENIZER', 'qwen-turbo')
+}
+
+# 检索结果缓存：最大条数与过期秒数（入库/删除会按 (user, category) 立即失效，TTL 兜底 MySQL 侧的直接修改）
+QUERY_CACHE_CONFIG = {
+    'enabled': os.getenv('RAG_QUERY_CACHE', 'Y').upper() == 'Y',
+    'max_items': int(os.getenv('RAG_QUERY_CACHE_SIZE', '2000')),
+    'ttl_seconds': float(os.getenv('RAG_QUERY_CACHE_TTL', '300'))
+}
+
 SERVICE_CONFIG = {
     'host': '0.0.0.0',
     'port': 8000,
     'log_level': 'info'
 }
 
+# 向量存储后端：qdrant（远端Qdrant）或 local（本地内存映射文件 + 可选faiss HNSW，使用 INDEX_PATH/META_PATH）
+VECTOR_BACKEND = os.getenv('RAG_VECTOR_BACKEND', 'qdrant')
+
+# 本地后端：HNSW 索引与向量文件落盘的最小间隔（秒，关闭时总会落盘）；
+# 已删除槽位达到总槽位的 compact_ratio 且不少于 compact_min 时压缩向量文件
+LOCAL_BACKEND_CONFIG = {
+    'save_interval': float(os.getenv('RAG_LOCAL_SAVE_SECONDS', '60')),
+    'compact_ratio': float(os.getenv('RAG_LOCAL_COMPACT_RATIO', '0.3')),
+    'compact_min': int(os.getenv('RAG_LOCAL_COMPACT_MIN', '1024'))
+}
+
+# 计数配置：缓存计数与向量库重新对账的间隔（秒），对账时是否精确计数
+COUNT_CONFIG = {
+    'reconcile_seconds': float(os.getenv('RAG_COUNT_RECONCILE_SECONDS', '300')),
+    'exact': os.getenv('RAG_COUNT_EXACT', 'Y').upper() == 'Y'
+}
+
 # Qdrant向量数据库配置
 QDRANT_CONFIG = {
     'host': os.getenv('QDRANT_HOST', 'localhost'),
     'port': int(os.getenv('QDRANT_PORT', '6333')),
-    'collection_name': os.getenv('QDRANT_COLLECTION_NAME', 'knowledge_base')
+    'collection_name': os.getenv('QDRANT_COLLECTION_NAME', 'knowledge_base'),
+    # 启动时为 user/category/title 建立 keyword payload 索引（user 作为租户字段）
+    'payload_indexes': os.getenv('QDRANT_PAYLOAD_INDEX', 'Y').upper() == 'Y',
+    # 按用户分组分片：none 不分片；shard_key 使用 Qdrant 自定义分片键（需集群模式）；collection 每组一个集合
+    'shard_mode': os.getenv('QDRANT_SHARD_MODE', 'none').lower(),
+    'shard_groups': int(os.getenv('QDRANT_SHARD_GROUPS', '16')),
+    # collection 模式下重新列出分组集合的最小间隔（秒），发现其他实例新建的集合
+    'collection_refresh_seconds': float(os.getenv('QDRANT_COLLECTION_REFRESH_SECONDS', '10')),
+    # 集合级向量量化：none / scalar（int8）/ binary（1 bit）；量化向量常驻内存，原始向量默认放到磁盘，
+    # 检索时按 oversampling 倍数取量化候选，再用原始向量重新打分（rescore）
+    'quantization': os.getenv('QDRANT_QUANTIZATION', 'none').lower(),
+    'quantization_always_ram': os.getenv('QDRANT_QUANTIZATION_RAM', 'Y').upper() == 'Y',
+    'vectors_on_disk': os.getenv('QDRANT_VECTORS_ON_DISK', '').upper() == 'Y' if os.getenv('QDRANT_VECTORS_ON_DISK') else None,
+    'oversampling': float(os.getenv('QDRANT_OVERSAMPLING', '2.0')),
+    'rescore': os.getenv('QDRANT_RESCORE', 'Y').upper() == 'Y'
 }
\ No newline at end of file
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线拟合 PCA 降维投影
+
+从 MySQL knowledge 表读取（指定用户的）语料，按入库相同的方式切分后调用 embedding，
+在样本上拟合 PCA 并保存为 .npz；同时用留出样本估计降维后的 recall@k。
+生成的文件通过 RAG_PROJECTION_PATH 启用；投影改变了向量空间，启用后需使用新的集合名
+（QDRANT_COLLECTION_NAME）或本地索引路径并重新入库（/rag/sync-db full=true）。
+
+用法: python fit_projection.py --dim 256 [--user u] [--category c] [--sample 5000] [--out path.npz]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import DATA_DIR, EMBED_DIM_CONFIG, EMBED_CACHE_CONFIG
+from services.chunker import iter_chunks
+from services.db import fetch_knowledge_page, pool
+from services.db_sync import EPOCH
+from services.embedder import create_embedder
+from services.batching_embedder import BatchingEmbedder
+from services.embedding_cache import EmbeddingCache, CachedEmbedder
+from services.projection import PCAProjection
+
+
+async def load_chunks(user, category, sample):
+    chunks = []
+    after = (EPOCH, 0)
+    while len(chunks) < sample * 2:
+        rows = await fetch_knowledge_page(user, category, after, 500)
+        if not rows:
+            break
+        after = (rows[-1]['updated_at'], rows[-1]['id'])
+        for r in rows:
+            if not r['is_deleted']:
+                chunks.extend(iter_chunks(r['content'] or ''))
+    return chunks
+
+
+def estimate_recall(full: np.ndarray, projected: np.ndarray, k: int, queries: int, seed: int) -> float:
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(full), size=min(queries, len(full)), replace=False)
+    hits = 0
+    for i in idx:
+        truth = set(np.argsort(-(full @ full[i]))[1:k + 1])
+        found = set(np.argsort(-(projected @ projected[i]))[1:k + 1])
+        hits += len(truth & found)
+    return hits / (len(idx) * k)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='离线拟合 PCA 降维投影')
+    parser.add_argument('--dim', type=int, required=True, help='目标维度')
+    parser.add_argument('--user', default=None, help='只使用该用户的语料')
+    parser.add_argument('--category', default=None)
+    parser.add_argument('--sample', type=int, default=5000, help='拟合使用的 chunk 数上限')
+    parser.add_argument('--holdout', type=float, default=0.2, help='留出用于估计召回率的比例')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--out', default=None, help='输出路径，默认 DATA_DIR/projection_<dim>.npz')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # 与服务相同的 embedding 链路（不含投影），命中缓存的文本不再请求远端
+    embedder = BatchingEmbedder(create_embedder(dimensions=EMBED_DIM_CONFIG['dimensions']))
+    if EMBED_CACHE_CONFIG['enabled']:
+        embedder = CachedEmbedder(embedder, EmbeddingCache())
+    try:
+        chunks = await load_chunks(args.user, args.category, args.sample)
+    finally:
+        await pool.close()
+    rng = np.random.default_rng(args.seed)
+    if len(chunks) > args.sample:
+        chunks = [chunks[i] for i in rng.choice(len(chunks), size=args.sample, replace=False)]
+    if len(chunks) <= args.dim:
+        print(f"[FitProjection] 样本数 {len(chunks)} 不足，需多于目标维度 {args.dim}")
+        return
+    print(f"[FitProjection] 样本: {len(chunks)} 个 chunk，embedding 中...")
+    vectors = np.asarray(await embedder.aencode(chunks), dtype='float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    n_fit = int(len(vectors) * (1 - args.holdout))
+    order = rng.permutation(len(vectors))
+    fit, held = vectors[order[:n_fit]], vectors[order[n_fit:]]
+    projection = PCAProjection.fit(fit, args.dim)
+    print(f"[FitProjection] {projection.input_dim} -> {projection.dim}，保留方差 {projection.explained.sum():.1%}")
+    if len(held) > args.k:
+        recall = estimate_recall(held, projection.transform(held), args.k, 200, args.seed)
+        print(f"[FitProjection] 留出样本 recall@{args.k}: {recall:.3f}")
+
+    out = args.out or os.path.join(DATA_DIR, f"projection_{args.dim}.npz")
+    projection.save(out)
+    print(f"[FitProjection] 已保存: {out}（指纹 {projection.fingerprint()}），设置 RAG_PROJECTION_PATH={out} 启用")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
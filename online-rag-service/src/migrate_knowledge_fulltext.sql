@@ -0,0 +1,9 @@
+-- 将knowledge表的全文索引重建为ngram分词（支持中文），供关键词检索的 MATCH ... AGAINST 使用
+-- 适用于已按旧脚本建表的库；新建库的建表脚本已包含 WITH PARSER ngram
+USE demo_db;
+
+ALTER TABLE knowledge DROP INDEX ft_title_content;
+
+ALTER TABLE knowledge ADD FULLTEXT INDEX ft_title_content (title, content) WITH PARSER ngram COMMENT '全文索引（ngram分词，支持中文）';
+
+SELECT 'knowledge表全文索引已重建为ngram分词' AS result;
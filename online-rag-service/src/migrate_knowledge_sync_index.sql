@@ -0,0 +1,7 @@
+-- 为增量同步增加 (user, updated_at, id) 复合索引，/rag/sync-db 按 (updated_at, id) 键集分页读取
+-- 适用于已按旧脚本建表的库；新建库的建表脚本已包含该索引
+USE demo_db;
+
+ALTER TABLE knowledge ADD INDEX idx_user_updated (user, updated_at, id) COMMENT '增量同步按 (updated_at, id) 键集分页';
+
+SELECT 'knowledge表增量同步索引已创建' AS result;
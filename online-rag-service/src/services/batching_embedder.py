@@ -0,0 +1,180 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+try:
+    from rag_service.config import EMBED_BATCH_CONFIG
+except ImportError:
+    from config import EMBED_BATCH_CONFIG
+
+
+class BatchingEmbedder:
+    """
+    批处理 Embedder 包装层：
+    - 大批量输入按服务商单次上限拆分，并发请求（并发数有上限）
+    - 并发请求中的单条查询在一个很短的时间窗口内合并为一次调用
+    结果始终按输入顺序返回
+    """
+
+    def __init__(self, embedder, max_batch: int = None, max_concurrency: int = None, window_ms: float = None):
+        self.embedder = embedder
+        self.model_name = embedder.model_name
+        self.dimensions = getattr(embedder, 'dimensions', None)
+        self.max_batch = max_batch or EMBED_BATCH_CONFIG['max_batch']
+        self.max_concurrency = max_concurrency or EMBED_BATCH_CONFIG['max_concurrency']
+        window_ms = EMBED_BATCH_CONFIG['window_ms'] if window_ms is None else window_ms
+        self.window = window_ms / 1000.0
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='embed')
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._collector = None
+        self._collector_lock = threading.Lock()
+
+        # 异步路径：事件循环内的并发上限与待合并的单条查询
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle = None
+        self._tasks = set()
+
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.coalesced_calls = 0
+        self.coalesced_texts = 0
+
+    def dimension(self) -> int:
+        return self.embedder.dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype='float32')
+        if len(texts) == 1 and self.window > 0:
+            return self._encode_coalesced(texts[0])
+        return self._encode_split(texts)
+
+    def _call(self, texts: List[str]) -> np.ndarray:
+        vecs = np.asarray(self.embedder.encode(texts), dtype='float32')
+        with self._stats_lock:
+            self.calls += 1
+            self.texts += len(texts)
+        return vecs
+
+    def _encode_split(self, texts: List[str]) -> np.ndarray:
+        parts = [texts[i:i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+        if len(parts) == 1:
+            return self._call(parts[0])
+        # 按拆分顺序收集结果，保证与输入顺序一致
+        futures = [self._pool.submit(self._call, p) for p in parts]
+        return np.concatenate([f.result() for f in futures], axis=0)
+
+    def _encode_coalesced(self, text: str) -> np.ndarray:
+        self._ensure_collector()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut.result()[None, :]
+
+    def _ensure_collector(self) -> None:
+        if self._collector is not None:
+            return
+        with self._collector_lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect_loop, name='embed-coalescer', daemon=True)
+                self._collector.start()
+
+    def _collect_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._run_coalesced, batch)
+
+    def _run_coalesced(self, batch: List[Tuple[str, Future]]) -> None:
+        try:
+            vecs = self._call([t for t, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        with self._stats_lock:
+            self.coalesced_calls += 1
+            self.coalesced_texts += len(batch)
+        for i, (_, fut) in enumerate(batch):
+            fut.set_result(vecs[i])
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype='float32')
+        if len(texts) == 1 and self.window > 0:
+            return await self._aencode_coalesced(texts[0])
+        parts = [texts[i:i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+        # gather 按参数顺序返回结果，拼接后与输入顺序一致
+        results = await asyncio.gather(*(self._acall(p) for p in parts))
+        return np.concatenate(results, axis=0)
+
+    async def _acall(self, texts: List[str]) -> np.ndarray:
+        async with self._semaphore:
+            vecs = np.asarray(await self.embedder.aencode(texts), dtype='float32')
+        with self._stats_lock:
+            self.calls += 1
+            self.texts += len(texts)
+        return vecs
+
+    async def _aencode_coalesced(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush_pending)
+        return (await fut)[None, :]
+
+    def _flush_pending(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # 持有任务引用，避免执行中被回收
+            task = asyncio.ensure_future(self._arun_coalesced(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _arun_coalesced(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            vecs = await self._acall([t for t, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        with self._stats_lock:
+            self.coalesced_calls += 1
+            self.coalesced_texts += len(batch)
+        for i, (_, fut) in enumerate(batch):
+            # 调用方可能已被取消
+            if not fut.done():
+                fut.set_result(vecs[i])
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return {
+                'calls': self.calls,
+                'texts': self.texts,
+                'coalesced_calls': self.coalesced_calls,
+                'avg_coalesced_size': round(self.coalesced_texts / self.coalesced_calls, 2) if self.coalesced_calls else 0.0,
+                'max_batch': self.max_batch,
+                'max_concurrency': self.max_concurrency,
+            }
@@ -0,0 +1,226 @@
+import math
+import re
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from rag_service.config import BM25_CONFIG
+except ImportError:
+    from config import BM25_CONFIG
+
+
+# CJK 统一表意文字、假名、谚文按字切分；其余按字母数字连续串切分
+_TOKEN_RE = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[a-z0-9_]+')
+_CJK_RE = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+def tokenize(text: str) -> List[str]:
+    """CJK 文本切为字二元组（单字片段保留单字），拉丁文本按单词切分"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = []
+    for run in _TOKEN_RE.findall(text):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class _Partition:
+    """单个用户的倒排索引；倒排表使用紧凑数组存储，删除采用墓碑标记 + 定期压缩"""
+
+    def __init__(self):
+        self.keys: List[Any] = []              # 内部文档号 -> 外部主键（向量库 point id）
+        self.payloads: List[Optional[Dict]] = []
+        self.lengths = array('I')
+        self.categories = array('I')           # 类别编码，用于向量化过滤
+        self.alive = bytearray()
+        self.by_key: Dict[Any, int] = {}
+        self.postings: Dict[str, Tuple[array, array]] = {}  # term -> (文档号, 词频)
+        self.category_codes: Dict[Optional[str], int] = {}
+        self.n_alive = 0
+        self.total_len = 0
+        self.n_dead = 0
+
+    def _category_code(self, category: Optional[str]) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_codes) + 1
+            self.category_codes[category] = code
+        return code
+
+    def add(self, key: Any, payload: Dict[str, Any]) -> None:
+        if key in self.by_key:
+            self.remove_doc(self.by_key[key])
+        doc = len(self.keys)
+        tokens = tokenize(f"{payload.get('title') or ''} {payload.get('content') or ''}")
+        tf: Dict[str, int] = {}
+        for t in tokens:
+            tf[t] = tf.get(t, 0) + 1
+        for t, c in tf.items():
+            plist = self.postings.get(t)
+            if plist is None:
+                plist = (array('I'), array('H'))
+                self.postings[t] = plist
+            plist[0].append(doc)
+            plist[1].append(min(c, 65535))
+        self.keys.append(key)
+        self.payloads.append(payload)
+        self.lengths.append(len(tokens))
+        self.categories.append(self._category_code(payload.get('category')))
+        self.alive.append(1)
+        self.by_key[key] = doc
+        self.n_alive += 1
+        self.total_len += len(tokens)
+
+    def remove_doc(self, doc: int) -> None:
+        if not self.alive[doc]:
+            return
+        self.alive[doc] = 0
+        self.by_key.pop(self.keys[doc], None)
+        self.payloads[doc] = None
+        self.n_alive -= 1
+        self.n_dead += 1
+        self.total_len -= self.lengths[doc]
+
+    def remove_where(self, title: Optional[str] = None, category: Optional[str] = None, source_ids=None) -> int:
+        removed = 0
+        for doc, payload in enumerate(self.payloads):
+            if payload is None:
+                continue
+            if title is not None and payload.get('title') != title:
+                continue
+            if category is not None and payload.get('category') != category:
+                continue
+            if source_ids is not None and payload.get('id') not in source_ids:
+                continue
+            self.remove_doc(doc)
+            removed += 1
+        if self.n_dead > max(1024, self.n_alive):
+            self.compact()
+        return removed
+
+    def remove_keys(self, keys: Iterable[Any]) -> int:
+        removed = 0
+        for key in keys:
+            doc = self.by_key.get(key)
+            if doc is not None:
+                self.remove_doc(doc)
+                removed += 1
+        if self.n_dead > max(1024, self.n_alive):
+            self.compact()
+        return removed
+
+    def compact(self) -> None:
+        """重建分区，清理已删除文档占用的倒排项"""
+        items = [(k, p) for k, p in zip(self.keys, self.payloads) if p is not None]
+        self.__init__()
+        for k, p in items:
+            self.add(k, p)
+
+    def search(self, terms: List[str], topK: int, category: Optional[str], k1: float, b: float) -> List[Tuple[float, int]]:
+        n_docs = len(self.keys)
+        if not n_docs or not self.n_alive:
+            return []
+        avgdl = self.total_len / self.n_alive or 1.0
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32).astype(np.float32)
+        norm = k1 * (1.0 - b + b * lengths / avgdl)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for t in set(terms):
+            plist = self.postings.get(t)
+            if plist is None:
+                continue
+            docs = np.frombuffer(plist[0], dtype=np.uint32)
+            tfs = np.frombuffer(plist[1], dtype=np.uint16).astype(np.float32)
+            # 文档频率中包含尚未压缩的墓碑文档，按存活文档数截断
+            df = min(len(docs), self.n_alive)
+            idf = math.log(1.0 + (self.n_alive - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (k1 + 1.0) / (tfs + norm[docs])
+        mask = np.frombuffer(self.alive, dtype=np.uint8) == 0
+        if category:
+            code = self.category_codes.get(category)
+            if code is None:
+                return []
+            mask |= np.frombuffer(self.categories, dtype=np.uint32) != code
+        scores[mask] = 0.0
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return []
+        if len(hits) > topK:
+            hits = hits[np.argpartition(-scores[hits], topK - 1)[:topK]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return [(float(scores[d]), int(d)) for d in hits]
+
+
+class BM25Index:
+    """进程内 BM25 关键词索引，按 user 分区，随入库/删除增量更新"""
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = k1 if k1 is not None else BM25_CONFIG['k1']
+        self.b = b if b is not None else BM25_CONFIG['b']
+        self._parts: Dict[str, _Partition] = {}
+
+    def _part(self, user: Optional[str]) -> _Partition:
+        key = user or ''
+        part = self._parts.get(key)
+        if part is None:
+            part = _Partition()
+            self._parts[key] = part
+        return part
+
+    # VectorStore 监听接口
+    def on_add(self, points: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        for key, payload in points:
+            self._part(payload.get('user')).add(key, payload)
+
+    def on_delete(self, user: Optional[str], title: Optional[str] = None, category: Optional[str] = None,
+                  source_ids: Optional[Iterable[Any]] = None, point_ids: Optional[Iterable[Any]] = None) -> None:
+        parts = [self._parts.get(user or '')] if user else list(self._parts.values())
+        source_ids = set(source_ids) if source_ids is not None else None
+        for part in parts:
+            if part is None:
+                continue
+            if point_ids is not None:
+                part.remove_keys(point_ids)
+            else:
+                part.remove_where(title=title, category=category, source_ids=source_ids)
+
+    async def rebuild(self, vector_store) -> int:
+        """从向量库全量加载 chunk 重建索引，返回加载条数"""
+        self._parts = {}
+        total = 0
+        async for batch in vector_store.iter_points():
+            self.on_add(batch)
+            total += len(batch)
+        print(f"[BM25Index] 已从向量库加载 {total} 条 chunk")
+        return total
+
+    def search(self, q: str, topK: int, category: Optional[str] = None, user: str = None) -> List[Dict]:
+        part = self._parts.get(user or '')
+        if part is None:
+            return []
+        res = []
+        for score, doc in part.search(tokenize(q), topK, category, self.k1, self.b):
+            item = dict(part.payloads[doc])
+            item['score_kw'] = score
+            # 与向量一路相同的点 ID，融合时据此去重没有数据库 id 的 chunk
+            item['_point_id'] = part.keys[doc]
+            res.append(item)
+        return res
+
+    async def asearch(self, q: str, topK: int, category: Optional[str] = None, user: str = None) -> List[Dict]:
+        # 纯内存计算，包装为协程以便与其他检索路并发编排
+        return self.search(q, topK, category=category, user=user)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'users': len(self._parts),
+            'docs': sum(p.n_alive for p in self._parts.values()),
+            'terms': sum(len(p.postings) for p in self._parts.values()),
+        }
@@ -0,0 +1,197 @@
+import math
+import re
+from typing import Callable, Iterator, List, Optional, Tuple
+
+try:
+    from rag_service.config import CHUNK_CONFIG
+except ImportError:
+    from config import CHUNK_CONFIG
+
+
+# 段落：空行分隔
+_PARA_RE = re.compile(r'\n\s*\n')
+# 句子：中文句末标点（含省略号）、英文句号后跟空白或换行结束，句末的引号/括号归入本句
+_SENT_RE = re.compile(r'.*?(?:[。！？；!?;]+|…+|\.(?=\s)|\n|$)[”’"\'）)》」』]*')
+# 句内次级切分点：逗号、顿号、冒号
+_CLAUSE_RE = re.compile(r'[^，,、：:]*[，,、：:]*')
+_CJK_RE = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+_WORD_RE = re.compile(r'[A-Za-z0-9_]+|[^\sA-Za-z0-9_]')
+
+
+def estimate_tokens(text: str) -> int:
+    """无分词器时的 token 估算：CJK 每字约 1 个 token，拉丁单词按每 4 个字符 1 个 token"""
+    n = 0
+    for w in _WORD_RE.findall(text):
+        if len(w) == 1 or _CJK_RE.match(w):
+            n += 1
+        else:
+            n += math.ceil(len(w) / 4)
+    return n
+
+
+_counter: Optional[Callable[[str], int]] = None
+
+
+def token_counter() -> Callable[[str], int]:
+    """优先使用 DashScope 的 Qwen 分词器（需安装 tiktoken），不可用时退回估算"""
+    global _counter
+    if _counter is None:
+        _counter = estimate_tokens
+        if CHUNK_CONFIG['tokenizer']:
+            try:
+                from dashscope import get_tokenizer
+                tokenizer = get_tokenizer(CHUNK_CONFIG['tokenizer'])
+                _counter = lambda text: len(tokenizer.encode(text))
+            except Exception as e:
+                print(f"[Chunker] 分词器 {CHUNK_CONFIG['tokenizer']} 不可用，使用估算: {e}")
+    return _counter
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """按段落、句子切分，段落末尾的句子以换行结尾以便拼接时保留段落结构"""
+    for para in _PARA_RE.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        # 去掉句首空白，保留句末换行（段内换行）
+        sents = [s for s in (m.group(0).lstrip(' \t\u3000').rstrip(' \t\u3000') for m in _SENT_RE.finditer(para)) if s.strip()]
+        for i, s in enumerate(sents):
+            yield s + '\n' if i == len(sents) - 1 and not s.endswith('\n') else s
+
+
+def _hard_split(text: str, max_tokens: int, min_tokens: int, count: Callable[[str], int]) -> Iterator[str]:
+    """
+    没有切分点的超长片段按 token 上限截断。每次只对当前位置之后的有限窗口计数（倍增后二分），
+    不会对剩余全文反复计数；拉丁文本尽量在空白处截断，过短的尾段（如句末标点）并入最后一段
+    """
+    pos, n = 0, len(text)
+    step = max(1, max_tokens)
+    while pos < n:
+        rest = n - pos
+        lo, hi = 0, min(step, rest)
+        # 倍增找到超过上限的长度 hi（或到达末尾），lo 为已知不超过上限的长度
+        while count(text[pos:pos + hi]) <= max_tokens:
+            lo = hi
+            if hi == rest:
+                break
+            hi = min(hi * 2, rest)
+        if lo < rest:
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if count(text[pos:pos + mid]) <= max_tokens:
+                    lo = mid
+                else:
+                    hi = mid
+        cut = max(lo, 1)
+        if cut < rest and text[pos + cut - 1].isalnum() and text[pos + cut].isalnum():
+            space = max(text.rfind(' ', pos, pos + cut), text.rfind('\n', pos, pos + cut))
+            if space > pos + cut // 2:
+                cut = space + 1 - pos
+        if 0 < rest - cut <= cut and count(text[pos + cut:]) < min_tokens:
+            cut = rest
+        yield text[pos:pos + cut]
+        pos += cut
+        step = cut
+
+
+def _split_long(sent: str, max_tokens: int, min_tokens: int, count: Callable[[str], int]) -> Iterator[str]:
+    """超长句先按逗号等切分，仍超长的片段按 token 上限截断"""
+    buf = ''
+    for clause in (m.group(0) for m in _CLAUSE_RE.finditer(sent)):
+        if not clause:
+            continue
+        if count(buf + clause) <= max_tokens:
+            buf += clause
+            continue
+        if buf:
+            yield buf
+        buf = clause
+        if count(clause) > max_tokens:
+            parts = list(_hard_split(clause, max_tokens, min_tokens, count))
+            yield from parts[:-1]
+            # 最后一段可以与后面的子句拼接
+            buf = parts[-1]
+    if buf:
+        yield buf
+
+
+def _join(pieces: List[str]) -> str:
+    # 拉丁文本的句子之间补回空格，CJK 文本直接拼接
+    out = ''
+    for p in pieces:
+        if out and out[-1].isascii() and not out[-1].isspace() and p[:1].isascii() and p[:1].isalnum():
+            out += ' '
+        out += p
+    return out.strip()
+
+
+def iter_chunks(text: str, max_tokens: int = None, overlap_tokens: int = None,
+                count: Callable[[str], int] = None, min_tokens: int = None) -> Iterator[str]:
+    """
+    语义切分：按段落/句子边界聚合到 max_tokens 以内，逐个产出 chunk（生成器）。
+    相邻 chunk 之间重叠不超过 overlap_tokens 的整句；overlap 会被限制在 max_tokens 的一半以内，
+    保证每个 chunk 都有新内容、总数有界。新内容不足 min_tokens 的片段（如单独的标点、分隔线）
+    并入相邻 chunk，此时 chunk 最多超出上限 min_tokens（min_tokens 限制在 max_tokens 的四分之一以内）
+    """
+    max_tokens = max(1, max_tokens or CHUNK_CONFIG['max_tokens'])
+    overlap_tokens = overlap_tokens if overlap_tokens is not None else CHUNK_CONFIG['overlap_tokens']
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    min_tokens = min_tokens if min_tokens is not None else CHUNK_CONFIG['min_tokens']
+    min_tokens = max(0, min(min_tokens, max_tokens // 4))
+    count = count or token_counter()
+
+    window: List[str] = []
+    sizes: List[int] = []
+    total = 0
+    n_old = 0  # 窗口开头属于重叠部分（已在上一个 chunk 中产出）的句子数
+    # 上一个 chunk 延迟一步产出，以便并入过小的新内容
+    pending: Optional[Tuple[List[str], List[int]]] = None
+
+    def flush() -> Optional[str]:
+        # 窗口中的新内容成为一个 chunk（过小时并入上一个 chunk），返回可以产出的上一个 chunk
+        nonlocal window, sizes, total, n_old, pending
+        fresh = sum(sizes[n_old:])
+        out = None
+        if pending is not None and fresh < min_tokens and sum(pending[1]) + fresh <= max_tokens + min_tokens:
+            pending = (pending[0] + window[n_old:], pending[1] + sizes[n_old:])
+        else:
+            out = _join(pending[0]) if pending is not None else None
+            pending = (window, sizes)
+        # 保留末尾若干整句作为下一个 chunk 的重叠部分
+        pieces, piece_sizes = pending
+        keep, kept = 0, 0
+        while keep < len(pieces) and kept + piece_sizes[-1 - keep] <= overlap_tokens:
+            kept += piece_sizes[-1 - keep]
+            keep += 1
+        window, sizes = (pieces[-keep:], piece_sizes[-keep:]) if keep else ([], [])
+        total = kept
+        n_old = keep
+        return out
+
+    for sent in split_sentences((text or '').strip()):
+        n = count(sent)
+        pieces = [(sent, n)] if n <= max_tokens else [(p, count(p)) for p in _split_long(sent, max_tokens, min_tokens, count)]
+        for piece, n in pieces:
+            # 第一个 chunk 的新内容过小时不切断，与后面的内容合并
+            if total + n > max_tokens and n_old < len(window) and (pending is not None or total >= min_tokens):
+                out = flush()
+                if out is not None:
+                    yield out
+            while n_old and total + n > max_tokens:
+                total -= sizes.pop(0)
+                window.pop(0)
+                n_old -= 1
+            window.append(piece)
+            sizes.append(n)
+            total += n
+    if n_old < len(window):
+        out = flush()
+        if out is not None:
+            yield out
+    if pending is not None:
+        yield _join(pending[0])
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[str]:
+    """按 token 数切分文本（size/overlap 以 token 计），返回 chunk 列表"""
+    return list(iter_chunks(text, size, overlap))
@@ -0,0 +1,82 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from rag_service.config import COUNT_CONFIG
+except ImportError:
+    from config import COUNT_CONFIG
+
+
+Scope = Tuple[Optional[str], Optional[str]]  # (user, category)，None 表示不限
+
+
+class CountIndex:
+    """
+    按 (user, category) 维护的点数计数：
+    - 首次读取时向向量库做一次带过滤的精确 count，此后随入库增量累加
+    - 删除时将受影响的范围置零或失效，下次读取重新对账
+    - 缓存超过 reconcile_seconds 的计数在读取时与向量库重新对账
+    作为 VectorStore 的监听器使用（on_add / on_delete）
+    """
+
+    def __init__(self, reconcile_seconds: float = None):
+        self.reconcile_seconds = reconcile_seconds if reconcile_seconds is not None else COUNT_CONFIG['reconcile_seconds']
+        self._counts: Dict[Scope, Tuple[int, float]] = {}
+        # 每次写入都递增；加载期间发生写入时不缓存加载结果，避免覆盖增量
+        self._generation = 0
+        self.hits = 0
+        self.loads = 0
+
+    async def get(self, user: Optional[str], category: Optional[str], loader: Callable[[], Awaitable[int]]) -> int:
+        scope = (user or None, category or None)
+        cached = self._counts.get(scope)
+        if cached is not None and time.monotonic() - cached[1] < self.reconcile_seconds:
+            self.hits += 1
+            return cached[0]
+        generation = self._generation
+        value = await loader()
+        self.loads += 1
+        if generation == self._generation:
+            self._counts[scope] = (value, time.monotonic())
+        return value
+
+    def on_add(self, points: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        added: Dict[Scope, int] = {}
+        for _, payload in points:
+            user, category = payload.get('user') or None, payload.get('category') or None
+            for scope in ((user, category), (user, None), (None, category), (None, None)):
+                added[scope] = added.get(scope, 0) + 1
+        self._generation += 1
+        for scope, n in added.items():
+            cached = self._counts.get(scope)
+            if cached is not None:
+                self._counts[scope] = (cached[0] + n, cached[1])
+
+    def on_update(self, points: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        # 已有点的 payload 变更（如类别变化）无法增量修正，失效相关用户的范围
+        users = {payload.get('user') or None for _, payload in points}
+        self._generation += 1
+        for scope in list(self._counts):
+            if scope[0] is None or scope[0] in users:
+                self._counts.pop(scope, None)
+
+    def on_delete(self, user: Optional[str], title: Optional[str] = None, category: Optional[str] = None,
+                  source_ids: Optional[Iterable[Any]] = None, point_ids: Optional[Iterable[Any]] = None) -> None:
+        self._generation += 1
+        user = user or None
+        # 按标题/来源记录/点 ID 删除时无法确定影响的类别，失效该用户的全部范围
+        by_category = title is None and source_ids is None and point_ids is None
+        for scope in list(self._counts):
+            s_user, s_category = scope
+            if user is not None and s_user is not None and s_user != user:
+                continue
+            if by_category and category is not None and s_category is not None and s_category != category:
+                continue
+            if by_category and scope == (user, category):
+                # 按类别删除后该范围必然为空
+                self._counts[scope] = (0, time.monotonic())
+            else:
+                self._counts.pop(scope, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {'scopes': len(self._counts), 'hits': self.hits, 'loads': self.loads}
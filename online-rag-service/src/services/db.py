@@ -1,35 +1,159 @@
-from typing import List, Dict, Optional
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, List, Dict, Optional, Tuple
 
-import pymysql
+import aiomysql
 
 try:
-    from rag_service.config import DB_CONFIG
+    from rag_service.config import DB_CONFIG, DB_POOL_CONFIG
 except ImportError:
-    from config import DB_CONFIG
+    from config import DB_CONFIG, DB_POOL_CONFIG
 
 
-def get_conn():
-    try:
-        # 打印当前使用的数据库配置信息用于调试
-        print(f"[DB Search Test] 使用数据库配置: 主机={DB_CONFIG['host']}, 端口={DB_CONFIG['port']}, 用户名={DB_CONFIG['user']}, 数据库={DB_CONFIG['database']}")
-        
-        conn = pymysql.connect(
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            database=DB_CONFIG['database'],
-            charset='utf8mb4',
-            autocommit=True
-        )
-        print(f"[DB Search Test] 数据库连接成功: {DB_CONFIG['host']}:{DB_CONFIG['port']}")
-        return conn
-    except Exception as e:
-        print(f"[DB Search Test] 数据库连接异常: {e}")
-        return None
+# 连接的创建时间记录在连接对象上（不按 id(conn) 记录，连接对象回收后 id 可能被复用）
+BORN_ATTR = '_rag_pool_born'
+
+
+class DBPool:
+    """
+    服务共享的 MySQL 连接池：
+    - 有界（maxsize），借出等待有超时
+    - 借出时 ping 做健康检查，断开的连接自动重连；仍然失败的连接关闭后换一个连接重试
+    - 连接存活超过 max_age 秒后关闭重建
+    - 借出过程中超时或被取消时，已取到的连接总会归还
+    - 统计借出等待耗时等指标
+    """
+
+    def __init__(self, minsize: int = None, maxsize: int = None, max_age: float = None, acquire_timeout: float = None):
+        self.minsize = minsize if minsize is not None else DB_POOL_CONFIG['minsize']
+        self.maxsize = maxsize if maxsize is not None else DB_POOL_CONFIG['maxsize']
+        self.max_age = max_age if max_age is not None else DB_POOL_CONFIG['max_age']
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else DB_POOL_CONFIG['acquire_timeout']
+        self._pool = None
+        self._init_lock = asyncio.Lock()
+
+        self.acquires = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.health_failures = 0
+        self.recycled = 0
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._init_lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        minsize=self.minsize,
+                        maxsize=self.maxsize,
+                        host=DB_CONFIG['host'],
+                        port=DB_CONFIG['port'],
+                        user=DB_CONFIG['user'],
+                        password=DB_CONFIG['password'],
+                        db=DB_CONFIG['database'],
+                        charset='utf8mb4',
+                        autocommit=True
+                    )
+                    print(f"[DBPool] 连接池已创建: {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']} (max={self.maxsize})")
+        return self._pool
+
+    def _expired(self, conn) -> bool:
+        born = getattr(conn, BORN_ATTR, None)
+        if born is None:
+            setattr(conn, BORN_ATTR, time.monotonic())
+            return False
+        return self.max_age > 0 and time.monotonic() - born > self.max_age
+
+    async def _checkout(self):
+        pool = await self._get_pool()
+        error = None
+        # 池中连接可能全部失效，最多换 maxsize + 1 次（最后一次为新建的连接）
+        for _ in range(self.maxsize + 1):
+            conn = await pool.acquire()
+            ok = False
+            try:
+                if self._expired(conn):
+                    # 超龄连接直接关闭，池会在下次借出时补充新连接
+                    conn.close()
+                    self.recycled += 1
+                    continue
+                try:
+                    await conn.ping(reconnect=True)
+                except Exception as e:
+                    self.health_failures += 1
+                    print(f"[DBPool] 连接健康检查失败，换连接重试: {e}")
+                    conn.close()
+                    error = e
+                    continue
+                ok = True
+                return conn
+            except BaseException:
+                # ping 期间被取消：连接上可能留有未读完的响应，关闭后不再复用
+                conn.close()
+                raise
+            finally:
+                # 未成功借出的连接归还连接池，已关闭的连接由池丢弃
+                if not ok:
+                    pool.release(conn)
+        raise error or RuntimeError("无法获取可用的数据库连接")
+
+    def _release_orphan(self, task: asyncio.Task) -> None:
+        # 调用方已超时或被取消，借出任务仍拿到了连接时归还
+        if not task.cancelled() and task.exception() is None:
+            self._pool.release(task.result())
+
+    @asynccontextmanager
+    async def acquire(self):
+        t0 = time.perf_counter()
+        # 借出在独立任务中进行，超时或调用方被取消时不会丢失已取到的连接
+        task = asyncio.ensure_future(self._checkout())
+        try:
+            done, _ = await asyncio.wait({task}, timeout=self.acquire_timeout)
+        except BaseException:
+            task.cancel()
+            task.add_done_callback(self._release_orphan)
+            raise
+        if not done:
+            self.timeouts += 1
+            task.cancel()
+            task.add_done_callback(self._release_orphan)
+            raise asyncio.TimeoutError()
+        conn = task.result()
+        wait = time.perf_counter() - t0
+        self.acquires += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        try:
+            yield conn
+        finally:
+            self._pool.release(conn)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size': self._pool.size if self._pool else 0,
+            'free': self._pool.freesize if self._pool else 0,
+            'maxsize': self.maxsize,
+            'acquires': self.acquires,
+            'avg_wait_ms': round(self.wait_total / self.acquires * 1000, 3) if self.acquires else 0.0,
+            'max_wait_ms': round(self.wait_max * 1000, 3),
+            'timeouts': self.timeouts,
+            'health_failures': self.health_failures,
+            'recycled': self.recycled,
+        }
+
 
+# 全局共享连接池
+pool = DBPool()
 
-def like_search(question: str, category: Optional[str], topK: int, user: str = None) -> List[Dict]:
+
+async def like_search(question: str, category: Optional[str], topK: int, user: str = None) -> List[Dict]:
     sql = (
         "SELECT id, title, content, category, keywords, source, created_at "
         "FROM knowledge "
@@ -51,10 +175,10 @@ def like_search(question: str, category: Optional[str], topK: int, user: str = N
     print(f"[DB Search Test] 参数: {params}")
     
     try:
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute(sql, params)
-                rows = cur.fetchall()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
                 
                 # 打印查询结果数量
                 print(f"[DB Search Test] 查询到 {len(rows)} 条记录")
@@ -80,4 +204,118 @@ def like_search(question: str, category: Optional[str], topK: int, user: str = N
     
     # 打印最终返回的数据条数
     print(f"[DB Search Test] 返回 {len(res)} 条格式化数据")
-    return res
\ No newline at end of file
+    return res
+
+
+# ngram 分词的最小词元长度（MySQL 默认 ngram_token_size=2），更短的查询无法命中全文索引
+NGRAM_TOKEN_SIZE = 2
+
+
+async def fulltext_search(question: str, category: Optional[str], topK: int, user: str = None) -> List[Dict]:
+    """
+    基于 FULLTEXT(title, content) WITH PARSER ngram 的关键词检索，
+    走全文索引并返回 MATCH ... AGAINST 的相关度作为 score_kw
+    """
+    question = (question or '').strip()
+    if len(question) < NGRAM_TOKEN_SIZE:
+        return await like_search(question, category, topK, user)
+
+    sql = (
+        "SELECT id, title, content, category, keywords, source, created_at, "
+        "MATCH(title, content) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score "
+        "FROM knowledge "
+        "WHERE is_deleted=0 AND MATCH(title, content) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+        + (" AND category=%s" if category else "") +
+        (" AND user=%s" if user else "") +
+        " ORDER BY score DESC LIMIT %s"
+    )
+    params = [question, question]
+    if category:
+        params.append(category)
+    if user:
+        params.append(user)
+    params.append(topK)
+
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
+    except Exception as e:
+        # 未建立 ngram 全文索引或数据库异常时回退到 LIKE 检索
+        print(f"[DB FullText] 全文检索失败，回退到 LIKE: {e}")
+        return await like_search(question, category, topK, user)
+
+    res = []
+    for r in rows:
+        res.append({
+            'id': r[0], 'title': r[1], 'content': r[2], 'category': r[3],
+            'keywords': r[4], 'source': r[5], 'created_at': r[6],
+            'score_kw': float(r[7])
+        })
+    print(f"[DB FullText] 查询: '{question}'，返回 {len(res)} 条结果")
+    return res
+
+
+async def fetch_knowledge_page(user: Optional[str], category: Optional[str], after: Tuple[Any, int], limit: int) -> List[Dict]:
+    """
+    按 (updated_at, id) 键集分页读取 knowledge，返回 after 之后的一页（含已软删除的记录，
+    便于同步时移除对应向量）。after 为上一页最后一行的 (updated_at, id)
+    """
+    after_updated, after_id = after
+    sql = (
+        "SELECT id, title, content, category, keywords, source, updated_at, is_deleted "
+        "FROM knowledge "
+        "WHERE (updated_at > %s OR (updated_at = %s AND id > %s))"
+        + (" AND category=%s" if category else "") +
+        (" AND user=%s" if user else "") +
+        " ORDER BY updated_at, id LIMIT %s"
+    )
+    params = [after_updated, after_updated, after_id]
+    if category:
+        params.append(category)
+    if user:
+        params.append(user)
+    params.append(limit)
+
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+
+    return [{
+        'id': r[0], 'title': r[1], 'content': r[2], 'category': r[3],
+        'keywords': r[4], 'source': r[5], 'updated_at': r[6], 'is_deleted': bool(r[7])
+    } for r in rows]
+
+
+# 单次 IN 查询的主键数上限，避免 SQL 过长与单个结果集过大
+FETCH_IDS_CHUNK = 500
+
+
+async def fetch_by_ids(ids: Iterable[int], user: Optional[str] = None, chunk_size: int = FETCH_IDS_CHUNK) -> AsyncIterator[List[Dict]]:
+    """
+    按主键批量读取未删除的 knowledge 记录：ID 去重排序后每 chunk_size 个一次 WHERE id IN (...) 查询，
+    逐批产出，调用方可边读边切分/写入；不存在、已删除或不属于 user 的 ID 不返回
+    """
+    unique = sorted({int(i) for i in ids})
+    for start in range(0, len(unique), chunk_size):
+        part = unique[start:start + chunk_size]
+        sql = (
+            "SELECT id, title, content, category, keywords, source, updated_at "
+            "FROM knowledge "
+            f"WHERE id IN ({', '.join(['%s'] * len(part))}) AND is_deleted=0"
+            + (" AND user=%s" if user else "") +
+            " ORDER BY id"
+        )
+        params: List[Any] = list(part)
+        if user:
+            params.append(user)
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
+        yield [{
+            'id': r[0], 'title': r[1], 'content': r[2], 'category': r[3],
+            'keywords': r[4], 'source': r[5], 'updated_at': r[6]
+        } for r in rows]
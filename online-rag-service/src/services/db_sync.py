@@ -0,0 +1,375 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from rag_service.config import SYNC_CONFIG
+    from rag_service.services.db import fetch_knowledge_page
+    from rag_service.services.vector_store import point_id
+except ImportError:
+    from config import SYNC_CONFIG
+    from services.db import fetch_knowledge_page
+    from services.vector_store import point_id
+
+
+# 水位起点：早于任何记录的 updated_at
+EPOCH = '1970-01-01 00:00:00'
+
+
+def row_hash(row: Dict[str, Any]) -> str:
+    """入库相关字段的内容哈希，未变化的记录不再重新 embedding"""
+    fields = [row.get('title'), row.get('category'), row.get('keywords'), row.get('source'), row.get('content')]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _fmt_time(value: Any) -> str:
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+class SyncState:
+    """
+    同步状态（sqlite）：每个同步范围的水位 + 每条已同步记录的内容哈希。
+    状态按 space（向量空间与存储位置的指纹）隔离：更换集合、模型或投影后从头同步，不会因哈希未变而跳过
+    """
+
+    def __init__(self, path: str = None, space: str = ''):
+        self.path = path or SYNC_CONFIG['state_path']
+        self.space = space
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        columns = {r[1] for r in self._db.execute("PRAGMA table_info(sync_rows)")}
+        if columns and 'space' not in columns:
+            # 旧版本的状态没有按向量空间区分，无法确定对应哪份向量数据，丢弃后下次同步会完整比对一遍
+            print(f"[DBSync] 同步状态格式已更新，丢弃旧状态: {self.path}")
+            self._db.execute("DROP TABLE sync_rows")
+            self._db.execute("DROP TABLE IF EXISTS sync_watermark")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_watermark ("
+            "space TEXT NOT NULL, scope TEXT NOT NULL, user TEXT NOT NULL, updated_at TEXT NOT NULL, "
+            "last_id INTEGER NOT NULL, PRIMARY KEY (space, scope))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_rows ("
+            "space TEXT NOT NULL, user TEXT NOT NULL, id INTEGER NOT NULL, hash TEXT NOT NULL, "
+            "title TEXT, category TEXT, PRIMARY KEY (space, user, id))"
+        )
+        self._db.commit()
+
+    def watermark(self, scope: str) -> Tuple[str, int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT updated_at, last_id FROM sync_watermark WHERE space=? AND scope=?", (self.space, scope)
+            ).fetchone()
+        return (row[0], row[1]) if row else (EPOCH, 0)
+
+    def reset(self, scope: str, user: str) -> None:
+        """完整重新同步：清除该范围的水位，并清除该用户的行哈希（无法按类别区分的记录一并重新比对）"""
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM sync_watermark WHERE space=? AND scope=?", (self.space, scope))
+                self._db.execute("DELETE FROM sync_rows WHERE space=? AND user=?", (self.space, user))
+
+    def forget(self, user: Optional[str], title: Optional[str] = None, category: Optional[str] = None,
+               source_ids: Optional[Iterable[Any]] = None) -> None:
+        """
+        向量被删除后清除对应记录的哈希，下次同步重新写入；按标题/类别删除的记录可能早于水位，
+        同时清除该用户各范围的水位。user 为空时作用于全部用户
+        """
+        where, args = ["space=?"], [self.space]
+        if user:
+            where.append("user=?")
+            args.append(user)
+        with self._lock:
+            with self._db:
+                if source_ids is not None:
+                    ids = list(source_ids)
+                    for i in range(0, len(ids), 500):
+                        part = ids[i:i + 500]
+                        self._db.execute(
+                            f"DELETE FROM sync_rows WHERE {' AND '.join(where)} AND id IN ({','.join('?' * len(part))})",
+                            [*args, *part]
+                        )
+                    return
+                if title is not None:
+                    self._db.execute(f"DELETE FROM sync_rows WHERE {' AND '.join(where)} AND title=?", [*args, title])
+                if category is not None:
+                    self._db.execute(f"DELETE FROM sync_rows WHERE {' AND '.join(where)} AND category=?", [*args, category])
+                self._db.execute(f"DELETE FROM sync_watermark WHERE {' AND '.join(where)}", args)
+
+    def hashes(self, user: str, ids: List[int]) -> Dict[int, str]:
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, hash FROM sync_rows WHERE space=? AND user=? AND id IN ({','.join('?' * len(ids))})",
+                [self.space, user, *ids]
+            ).fetchall()
+        return dict(rows)
+
+    def commit_page(self, scope: str, user: str, watermark: Tuple[str, int],
+                    upserted: Dict[int, Tuple[str, Optional[str], Optional[str]]], deleted: List[int]) -> None:
+        """一页写入向量库后，在同一事务中推进水位并记录行哈希；upserted 为 id -> (哈希, 标题, 类别)"""
+        with self._lock:
+            with self._db:
+                if upserted:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO sync_rows (space, user, id, hash, title, category) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(self.space, user, kid, h, title, category) for kid, (h, title, category) in upserted.items()]
+                    )
+                if deleted:
+                    self._db.executemany(
+                        "DELETE FROM sync_rows WHERE space=? AND user=? AND id=?",
+                        [(self.space, user, kid) for kid in deleted]
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_watermark (space, scope, user, updated_at, last_id) VALUES (?, ?, ?, ?, ?)",
+                    (self.space, scope, user, watermark[0], watermark[1])
+                )
+
+
+class SyncJob:
+    """一次后台同步任务的参数与进度"""
+
+    def __init__(self, user: str, category: Optional[str], limit: int, full: bool):
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.category = category
+        self.limit = limit
+        self.full = full
+        self.status = 'pending'
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.pages = 0
+        self.rows_read = 0
+        self.rows_skipped = 0
+        self.rows_upserted = 0
+        self.rows_deleted = 0
+        self.chunks_written = 0
+        self.chunks_deleted = 0
+        self.has_more = False
+        self.watermark: Tuple[str, int] = (EPOCH, 0)
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def scope(self) -> str:
+        return f"{self.user}\x00{self.category or ''}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            'job_id': self.id,
+            'user': self.user,
+            'category': self.category,
+            'status': self.status,
+            'error': self.error,
+            'pages': self.pages,
+            'rows_read': self.rows_read,
+            'rows_skipped': self.rows_skipped,
+            'rows_upserted': self.rows_upserted,
+            'rows_deleted': self.rows_deleted,
+            'chunks_written': self.chunks_written,
+            'chunks_deleted': self.chunks_deleted,
+            'has_more': self.has_more,
+            'watermark': {'updated_at': self.watermark[0], 'id': self.watermark[1]},
+            'elapsed_s': round(end - self.started_at, 3),
+        }
+
+
+class DBSync:
+    """
+    MySQL knowledge 表到向量库的流式增量同步：
+    - 按 (updated_at, id) 键集分页读取，读取协程与写入协程之间用有界队列做背压
+    - 每页切分、embedding、写入后推进水位（sqlite 持久化），中断后从水位继续
+    - 内容哈希未变化的记录跳过；变化或软删除的记录先删除旧 chunk 再写入
+    - 作为 VectorStore 的监听器：向量被删除（按标题/类别/来源记录）时清除对应哈希，重新同步时恢复
+    - 作为后台任务运行，通过 job_id 查询进度
+    """
+
+    def __init__(self, vector_store, chunker: Callable[[str], Iterable[str]], state: SyncState = None,
+                 page_size: int = None, queue_pages: int = None, max_jobs: int = 100):
+        self.vector_store = vector_store
+        self.chunker = chunker
+        self.state = state or SyncState(space=vector_store.space_key())
+        vector_store.add_listener(self)
+        self.page_size = page_size or SYNC_CONFIG['page_size']
+        self.queue_pages = queue_pages or SYNC_CONFIG['queue_pages']
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+        # 删除回调中提交到线程执行、尚未完成的 forget
+        self._forgets: Set[asyncio.Task] = set()
+
+    def start(self, user: str, category: Optional[str] = None, limit: int = 0, full: bool = False) -> SyncJob:
+        """启动后台同步；同一 (user, category) 已有运行中的任务时直接返回该任务"""
+        for job in self.jobs.values():
+            if job.status in ('pending', 'running') and job.user == user and job.category == category:
+                return job
+        job = SyncJob(user, category, limit, full)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status in ('pending', 'running'):
+                break
+            self.jobs.popitem(last=False)
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        return self.jobs.get(job_id)
+
+    def on_add(self, points) -> None:
+        pass
+
+    def on_delete(self, user: Optional[str], title: Optional[str] = None, category: Optional[str] = None,
+                  source_ids: Optional[Iterable[Any]] = None, point_ids: Optional[Iterable[Any]] = None) -> None:
+        # 同步自身替换已变更记录时也会触发，随后的 commit_page 会写回新哈希；
+        # 按点 ID 清理旧 chunk 时记录本身仍在，同步状态不变
+        if point_ids is not None:
+            return
+        # 监听回调是同步的：sqlite 写入放到线程中执行，读取水位与哈希前等待完成
+        source_ids = list(source_ids) if source_ids is not None else None
+        task = asyncio.create_task(asyncio.to_thread(
+            self.state.forget, user or None, title=title, category=category, source_ids=source_ids
+        ))
+        self._forgets.add(task)
+        task.add_done_callback(self._forget_done)
+
+    def _forget_done(self, task: asyncio.Task) -> None:
+        self._forgets.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[DBSync] 清除同步状态失败: {task.exception()}")
+
+    async def _wait_forgets(self) -> None:
+        if self._forgets:
+            await asyncio.gather(*list(self._forgets), return_exceptions=True)
+
+    async def close(self) -> None:
+        # 取消运行中的任务，已写入的页已推进水位，下次从水位继续
+        tasks = [j.task for j in self.jobs.values() if j.task is not None and not j.task.done()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._wait_forgets()
+
+    async def _run(self, job: SyncJob) -> None:
+        job.status = 'running'
+        print(f"[DBSync] 开始同步: job={job.id}, 用户: {job.user}, 类别: {job.category}")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_pages)
+        reader = asyncio.create_task(self._read(job, queue))
+        try:
+            await self._write(job, queue)
+            await reader
+            job.status = 'done'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+            raise
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"[DBSync] 同步失败: job={job.id}, {e}")
+        finally:
+            reader.cancel()
+            job.finished_at = time.time()
+            print(f"[DBSync] 同步结束: {json.dumps(job.to_dict(), ensure_ascii=False)}")
+
+    async def _read(self, job: SyncJob, queue: asyncio.Queue) -> None:
+        """按键集分页读取，队列满时阻塞等待写入方消费"""
+        try:
+            await self._wait_forgets()
+            if job.full:
+                await asyncio.to_thread(self.state.reset, job.scope, job.user)
+            updated_at, last_id = await asyncio.to_thread(self.state.watermark, job.scope)
+            job.watermark = (updated_at, last_id)
+            if updated_at != EPOCH:
+                # 同一秒内更新的记录可能排在水位之前，续跑时回看一小段，哈希未变的记录会被跳过
+                t = datetime.datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S')
+                updated_at, last_id = _fmt_time(t - datetime.timedelta(seconds=SYNC_CONFIG['overlap_seconds'])), 0
+            after: Tuple[Any, int] = (updated_at, last_id)
+            read = 0
+            while True:
+                size = self.page_size if not job.limit else min(self.page_size, job.limit - read)
+                if size <= 0:
+                    job.has_more = True
+                    break
+                rows = await fetch_knowledge_page(job.user, job.category, after, size)
+                if not rows:
+                    break
+                read += len(rows)
+                after = (rows[-1]['updated_at'], rows[-1]['id'])
+                await queue.put(rows)
+                if len(rows) < size:
+                    break
+        except Exception:
+            # 读取失败时也要通知写入方结束，错误由 _run 等待读取任务时抛出
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    async def _write(self, job: SyncJob, queue: asyncio.Queue) -> None:
+        while True:
+            rows = await queue.get()
+            if rows is None:
+                return
+            await self._write_page(job, rows)
+
+    async def _write_page(self, job: SyncJob, rows: List[Dict[str, Any]]) -> None:
+        user = job.user
+        await self._wait_forgets()
+        known = await asyncio.to_thread(self.state.hashes, user, [r['id'] for r in rows])
+        upserted: Dict[int, Tuple[str, Optional[str], Optional[str]]] = {}
+        deleted: List[int] = []
+        texts, metas = [], []
+        for r in rows:
+            if r['is_deleted']:
+                # 不论同步状态中是否有记录（如按 ID 入库写入、或状态已被清除），都删除其向量
+                deleted.append(r['id'])
+                continue
+            h = row_hash(r)
+            if known.get(r['id']) == h:
+                job.rows_skipped += 1
+                continue
+            upserted[r['id']] = (h, r.get('title'), r.get('category'))
+            for c in self.chunker(r.get('content') or ''):
+                texts.append(c)
+                metas.append({
+                    'id': r['id'],
+                    'title': r.get('title'),
+                    'category': r.get('category'),
+                    'keywords': r.get('keywords'),
+                    'source': r.get('source'),
+                    'content': c,
+                    'user': user
+                })
+
+        # 变化的记录先写入新 chunk（内容未变的 chunk 点 ID 不变，跳过 embedding），再清理不再出现的旧 chunk
+        # （也清理按 ID 入库时写入的同一记录）；已删除的记录整体删除
+        # （与按 ID 入库任务写入同一记录时按记录串行）
+        async with self.vector_store.lock_documents(user, source_ids=[*upserted, *deleted]):
+            removed = 0
+            if texts:
+                await self.vector_store.add_texts(texts, metas)
+            if upserted:
+                removed += await self.vector_store.delete_stale([point_id(m, t) for t, m in zip(texts, metas)],
+                                                                user=user, source_ids=list(upserted))
+            if deleted:
+                removed += await self.vector_store.delete_by_source_ids(deleted, user=user)
+
+        watermark = (_fmt_time(rows[-1]['updated_at']), rows[-1]['id'])
+        await asyncio.to_thread(self.state.commit_page, job.scope, user, watermark, upserted, deleted)
+        job.pages += 1
+        job.rows_read += len(rows)
+        job.rows_upserted += len(upserted)
+        job.rows_deleted += len(deleted)
+        job.chunks_written += len(texts)
+        job.chunks_deleted += removed
+        job.watermark = watermark
@@ -1,29 +1,124 @@
-from typing import List
+import asyncio
+from typing import List, Optional
+import httpx
 import numpy as np
 import dashscope
-from config import DASHSCOPE_API_KEY
+from config import DASHSCOPE_API_KEY, EMBED_PROVIDER, MODEL_NAME
 
 
-class Embedder:
-    def __init__(self, model_name: str = "text-embedding-v1"):
+# 可选的 embedding 服务
+PROVIDERS = ('dashscope', 'local')
+
+
+class EmbeddingProvider:
+    """
+    Embedding 服务接口：encode/aencode 返回 (len(texts), dimension()) 的 float32 数组，顺序与输入一致。
+    model_name 与 dimensions（服务端输出维度，可为 None）标识向量空间，用于缓存键与集合配置
+    """
+
+    model_name: str = ''
+    dimensions: Optional[int] = None
+
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        # 默认在线程中执行同步 encode，不阻塞事件循环
+        return await asyncio.to_thread(self.encode, texts)
+
+
+class Embedder(EmbeddingProvider):
+    """DashScope 远端 embedding（同步调用，用于脚本）"""
+
+    def __init__(self, model_name: str = "text-embedding-v1", dimensions: int = None):
         self.model_name = model_name
+        # 服务端输出维度（text-embedding-v3 及以上支持 1024/768/512 等），None 使用模型默认维度
+        self.dimensions = dimensions or None
         # 设置DashScope API密钥
         dashscope.api_key = DASHSCOPE_API_KEY
         if not dashscope.api_key:
             raise RuntimeError("DASHSCOPE_API_KEY 未设置")
-    
+
     def dimension(self) -> int:
         # DashScope text-embedding-v1 模型的维度是1536
-        return 1536
+        return self.dimensions or 1536
+
+    def _parameters(self) -> dict:
+        return {'dimension': self.dimensions} if self.dimensions else {}
 
     def encode(self, texts: List[str]) -> np.ndarray:
         # 使用DashScope API获取embedding
         response = dashscope.TextEmbedding.call(
             model=self.model_name,
-            input=texts
+            input=texts,
+            **self._parameters()
         )
         if response.status_code == 200:
             embeddings = [item['embedding'] for item in response.output['embeddings']]
             return np.array(embeddings, dtype='float32')
         else:
-            raise Exception(f"Embedding failed: {response.code} - {response.message}")
\ No newline at end of file
+            raise Exception(f"Embedding failed: {response.code} - {response.message}")
+
+
+class AsyncEmbedder(Embedder):
+    """
+    Embedder 的异步版本：通过 httpx 直接调用 DashScope HTTP 接口，
+    不占用线程池，同步的 encode 仍可用于脚本
+    """
+
+    def __init__(self, model_name: str = "text-embedding-v1", timeout: float = 30.0, dimensions: int = None):
+        super().__init__(model_name, dimensions)
+        self.timeout = timeout
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=dashscope.base_http_api_url,
+                timeout=self.timeout,
+                headers={'Authorization': f'Bearer {dashscope.api_key}'}
+            )
+        return self._client
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        response = await self._get_client().post(
+            '/services/embeddings/text-embedding/text-embedding',
+            json={'model': self.model_name, 'input': {'texts': texts}, 'parameters': self._parameters()}
+        )
+        if response.status_code == 200:
+            # 按 text_index 排序，保证与输入顺序一致
+            items = sorted(response.json()['output']['embeddings'], key=lambda x: x['text_index'])
+            return np.array([item['embedding'] for item in items], dtype='float32')
+        # 网关错误（502/504 等）的响应体可能不是 JSON，此时带上原始响应文本
+        try:
+            body = response.json()
+            detail = f"{body.get('code')} - {body.get('message')}"
+        except (ValueError, AttributeError):
+            detail = response.text[:500]
+        raise Exception(f"Embedding failed: HTTP {response.status_code} - {detail}")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_embedder(provider: str = None, model_name: str = None, dimensions: int = None) -> EmbeddingProvider:
+    """按配置创建最内层的 embedding 实现：dashscope 使用异步 HTTP 调用，local 在本机 CPU 上推理"""
+    provider = (provider or EMBED_PROVIDER).lower()
+    model_name = model_name or MODEL_NAME
+    if provider == 'dashscope':
+        return AsyncEmbedder(model_name=model_name, dimensions=dimensions)
+    if provider == 'local':
+        if dimensions:
+            raise ValueError("本地模型不支持 RAG_EMBED_DIMENSIONS，降维请使用 RAG_PROJECTION_PATH")
+        # 延迟导入：只有使用本地模型时才加载 onnxruntime
+        try:
+            from rag_service.services.local_embedder import LocalEmbedder
+        except ImportError:
+            from services.local_embedder import LocalEmbedder
+        return LocalEmbedder(model_name)
+    raise ValueError(f"不支持的 embedding 服务: {provider}，可选: {', '.join(PROVIDERS)}")
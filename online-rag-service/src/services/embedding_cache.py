@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from rag_service.config import EMBED_CACHE_CONFIG
+except ImportError:
+    from config import EMBED_CACHE_CONFIG
+
+
+def normalize_text(text: str) -> str:
+    # 统一全半角、去掉首尾空白并合并连续空白，保证等价文本命中同一个缓存键
+    text = unicodedata.normalize('NFKC', text or '')
+    return ' '.join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    h = hashlib.sha256()
+    h.update(model_name.encode('utf-8'))
+    h.update(b'\x00')
+    h.update(normalize_text(text).encode('utf-8'))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    两级 embedding 缓存：进程内 LRU + DATA_DIR 下的 sqlite 磁盘缓存。
+    磁盘层记录最近访问时间，条数超过 disk_max_rows 时删除最久未访问的记录（降到上限的 90%）
+    """
+
+    def __init__(self, memory_size: int = None, disk_path: Optional[str] = None, disk_max_rows: int = None):
+        self.memory_size = memory_size if memory_size is not None else EMBED_CACHE_CONFIG['memory_size']
+        self.disk_path = disk_path if disk_path is not None else EMBED_CACHE_CONFIG['disk_path']
+        self.disk_max_rows = disk_max_rows if disk_max_rows is not None else EMBED_CACHE_CONFIG['disk_max_rows']
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # 内存层与磁盘层分别加锁：磁盘查询在线程中进行时，事件循环上的内存查询不被阻塞
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._disk_rows = 0
+        self.pruned = 0
+        if self.disk_path:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL, "
+                "accessed REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(embedding_cache)")}
+            if 'accessed' not in columns:
+                # 旧版本的缓存表没有访问时间，视为最久未访问
+                self._db.execute("ALTER TABLE embedding_cache ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embedding_cache_accessed ON embedding_cache (accessed)")
+            self._db.commit()
+            self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            print(f"[EmbeddingCache] 磁盘缓存: {self.disk_path}，已有 {self._disk_rows} 条")
+            self._prune()
+
+    def _mem_put(self, key: str, vec: np.ndarray) -> None:
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_size:
+            self._mem.popitem(last=False)
+
+    def get_memory(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """只查内存层（不做 IO，可在事件循环中调用）"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for k in keys:
+                vec = self._mem.get(k)
+                if vec is not None:
+                    self._mem.move_to_end(k)
+                    found[k] = vec
+        return found
+
+    def get_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """查询磁盘层并刷新命中记录的访问时间，命中回填到内存层（有磁盘 IO，异步调用方应放到线程中）"""
+        found: Dict[str, np.ndarray] = {}
+        if self._db is None or not keys:
+            return found
+        with self._db_lock:
+            # sqlite 单条语句的参数个数有限，分批查询
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embedding_cache WHERE key IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                for k, blob in rows:
+                    found[k] = np.frombuffer(blob, dtype='float32')
+            if found:
+                now = time.time()
+                self._db.executemany("UPDATE embedding_cache SET accessed = ? WHERE key = ?", [(now, k) for k in found])
+                self._db.commit()
+        with self._lock:
+            for k, vec in found.items():
+                self._mem_put(k, vec)
+        return found
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """批量查询，返回命中的 key -> 向量（磁盘命中会回填到内存层）"""
+        found = self.get_memory(keys)
+        found.update(self.get_disk([k for k in keys if k not in found]))
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            for k, vec in items.items():
+                self._mem_put(k, vec)
+        if self._db is not None:
+            now = time.time()
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vec, accessed) VALUES (?, ?, ?, ?, ?)",
+                    [(k, model_name, int(v.shape[0]), np.asarray(v, dtype='float32').tobytes(), now) for k, v in items.items()]
+                )
+                self._db.commit()
+                # 按写入条数估算总条数（覆盖写会高估），超过上限时再精确计数并清理
+                self._disk_rows += len(items)
+                self._prune()
+
+    def _prune(self) -> None:
+        # 在持有 _db_lock（或初始化）时调用
+        if not self.disk_max_rows or self._disk_rows <= self.disk_max_rows:
+            return
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        excess = self._disk_rows - int(self.disk_max_rows * 0.9)
+        if self._disk_rows <= self.disk_max_rows or excess <= 0:
+            return
+        self._db.execute(
+            "DELETE FROM embedding_cache WHERE key IN (SELECT key FROM embedding_cache ORDER BY accessed LIMIT ?)",
+            (excess,)
+        )
+        self._db.commit()
+        self._disk_rows -= excess
+        self.pruned += excess
+        print(f"[EmbeddingCache] 磁盘缓存超过 {self.disk_max_rows} 条，已删除最久未访问的 {excess} 条")
+
+    def memory_items(self) -> int:
+        return len(self._mem)
+
+    def disk_items(self) -> int:
+        return self._disk_rows
+
+
+class CachedEmbedder:
+    """包装任意 Embedder，命中缓存的文本不再调用远端接口"""
+
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+        # 缓存键包含服务端输出维度，不同维度的向量互不混用
+        dimensions = getattr(embedder, 'dimensions', None)
+        self.model_name = f"{embedder.model_name}@{dimensions}" if dimensions else embedder.model_name
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 未命中时每条文本的平均远端耗时，用于估算命中节省的时间
+        self._miss_seconds = 0.0
+
+    def dimension(self) -> int:
+        return self.embedder.dimension()
+
+    @staticmethod
+    def _missing(keys: List[str], texts: List[str], found: Dict[str, np.ndarray]) -> Dict[str, str]:
+        # 同一批次内重复的文本只请求一次
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        return missing
+
+    def _lookup(self, texts: List[str]):
+        keys = [cache_key(self.model_name, t) for t in texts]
+        found = self.cache.get_many(keys)
+        return keys, found, self._missing(keys, texts, found)
+
+    async def _alookup(self, texts: List[str]):
+        # 内存层直接查询；只有内存未命中的键才到线程中查询磁盘层，sqlite 读不阻塞事件循环
+        keys = [cache_key(self.model_name, t) for t in texts]
+        found = self.cache.get_memory(keys)
+        rest = [k for k in dict.fromkeys(keys) if k not in found]
+        if rest and self.cache.disk_path:
+            found.update(await asyncio.to_thread(self.cache.get_disk, rest))
+        return keys, found, self._missing(keys, texts, found)
+
+    def _record(self, n_texts: int, n_missing: int, elapsed: float) -> None:
+        with self._stats_lock:
+            self.hits += n_texts - n_missing
+            self.misses += n_missing
+            self._miss_seconds += elapsed
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype='float32')
+        keys, found, missing = self._lookup(texts)
+        elapsed = 0.0
+        if missing:
+            t0 = time.perf_counter()
+            vecs = np.asarray(self.embedder.encode(list(missing.values())), dtype='float32')
+            elapsed = time.perf_counter() - t0
+            fresh = {k: vecs[i] for i, k in enumerate(missing.keys())}
+            self.cache.put_many(self.model_name, fresh)
+            found.update(fresh)
+        self._record(len(texts), len(missing), elapsed)
+        return np.stack([found[k] for k in keys]).astype('float32', copy=False)
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype='float32')
+        keys, found, missing = await self._alookup(texts)
+        elapsed = 0.0
+        if missing:
+            t0 = time.perf_counter()
+            vecs = np.asarray(await self.embedder.aencode(list(missing.values())), dtype='float32')
+            elapsed = time.perf_counter() - t0
+            fresh = {k: vecs[i] for i, k in enumerate(missing.keys())}
+            # 磁盘写入放到线程中，避免阻塞事件循环
+            await asyncio.to_thread(self.cache.put_many, self.model_name, fresh)
+            found.update(fresh)
+        self._record(len(texts), len(missing), elapsed)
+        return np.stack([found[k] for k in keys]).astype('float32', copy=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            total = self.hits + self.misses
+            avg_miss = self._miss_seconds / self.misses if self.misses else 0.0
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'memory_items': self.cache.memory_items(),
+                'disk_items': self.cache.disk_items(),
+                'disk_pruned': self.cache.pruned,
+                'avg_miss_ms': round(avg_miss * 1000, 2),
+                'saved_ms': round(self.hits * avg_miss * 1000, 2),
+            }
@@ -0,0 +1,131 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+# 可选的融合策略
+STRATEGIES = ('minmax', 'zscore', 'rrf')
+# RRF 的平滑常数（常用取值 60）
+RRF_K = 60
+
+
+def content_key(item: Dict[str, Any]) -> Any:
+    """
+    去重键：优先使用数据库 id，其次向量库点 ID（延迟检索的结果不含内容），
+    最后是内容的稳定哈希（跨进程一致，不同于内置 hash）
+    """
+    id_ = item.get('id') or item.get('_point_id')
+    if id_:
+        return id_
+    return hashlib.blake2b((item.get('content') or '').encode('utf-8'), digest_size=16).digest()
+
+
+def minmax(scores: np.ndarray) -> np.ndarray:
+    if not len(scores):
+        return scores
+    mn, mx = scores.min(), scores.max()
+    if mx == mn:
+        # 所有分数相同（如单条结果）时不应被归一化为 0，命中即满分
+        return np.full_like(scores, 1.0 if mx > 0 else 0.0)
+    return (scores - mn) / (mx - mn)
+
+
+def zscore(scores: np.ndarray) -> np.ndarray:
+    if not len(scores):
+        return scores
+    std = scores.std()
+    if std == 0:
+        return np.zeros_like(scores)
+    return (scores - scores.mean()) / std
+
+
+def _leg(pos: List[int], raw: List[float], n: int, strategy: str):
+    """把一路结果映射到候选下标上，返回 (归一化分数或 RRF 贡献, 是否命中)，同一候选多次出现取最优"""
+    raw = np.asarray(raw, dtype=np.float64)
+    if strategy == 'rrf':
+        # 按该路分数降序的名次（从 1 开始）
+        ranks = np.empty(len(raw), dtype=np.float64)
+        ranks[np.argsort(-raw, kind='stable')] = np.arange(1, len(raw) + 1)
+        values = 1.0 / (RRF_K + ranks)
+    else:
+        values = minmax(raw) if strategy == 'minmax' else zscore(raw)
+    out = np.full(n, -np.inf)
+    np.maximum.at(out, np.asarray(pos, dtype=np.int64), values)
+    return out, np.isfinite(out)
+
+
+def fuse(vec_items: List[Dict], kw_items: List[Dict], alpha: float = 0.7, beta: float = 0.3,
+         strategy: str = 'minmax', limit: Optional[int] = None) -> List[Dict]:
+    """
+    向量化融合两路检索结果，返回按融合分数降序的结果（只为前 limit 条构造结果字典）：
+    - minmax：两路分数各自 min-max 归一化后加权；只被关键词命中的条目向量分按 0.5 计（与原 merge_results 一致）
+    - zscore：两路分数各自标准化后加权，未命中的一路取该路最低分
+    - rrf：加权倒数排名融合 alpha/(k+rank_vec) + beta/(k+rank_kw)，未命中的一路不计分
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"不支持的融合策略: {strategy}")
+
+    # 两路结果合并为候选列表，同一去重键只保留一个下标；每条结果只计算一次去重键
+    index: Dict[Any, int] = {}
+    first: List[Dict] = []
+    vec_pos: List[int] = []
+    for item in vec_items:
+        k = content_key(item)
+        i = index.get(k)
+        if i is None:
+            i = index[k] = len(first)
+            first.append(item)
+        vec_pos.append(i)
+    n_vec = len(first)
+    extra: Dict[int, Dict] = {}
+    kw_pos: List[int] = []
+    for item in kw_items:
+        # 关键词检索优先使用全文检索的相关度（score_kw）；LIKE 回退结果没有分数时命中即 1.0
+        item.setdefault('score_kw', 1.0)
+        k = content_key(item)
+        i = index.get(k)
+        if i is None:
+            i = index[k] = len(first)
+            first.append(item)
+        elif i < n_vec and i not in extra:
+            extra[i] = item
+        kw_pos.append(i)
+    n = len(first)
+    if not n:
+        return []
+
+    sv, has_v = _leg(vec_pos, [float(i.get('score_vec') or 0.0) for i in vec_items], n, strategy)
+    sk, has_k = _leg(kw_pos, [float(i['score_kw'] or 0.0) for i in kw_items], n, strategy)
+    if strategy == 'minmax':
+        sv[~has_v] = 0.5
+        sk[~has_k] = 0.0
+    elif strategy == 'zscore':
+        sv[~has_v] = sv[has_v].min() if has_v.any() else 0.0
+        sk[~has_k] = sk[has_k].min() if has_k.any() else 0.0
+    else:
+        sv[~has_v] = 0.0
+        sk[~has_k] = 0.0
+    score = alpha * sv + beta * sk
+
+    if limit is not None and limit < n:
+        top = np.argpartition(-score, limit - 1)[:limit]
+        order = top[np.argsort(-score[top], kind='stable')]
+    else:
+        order = np.argsort(-score, kind='stable')
+
+    res = []
+    for i in order:
+        item = dict(first[i])
+        other = extra.get(int(i))
+        if other is not None:
+            # 合并字段：关键词结果补充向量结果中缺失或为空的字段
+            for kk, vv in other.items():
+                if kk not in item or not item.get(kk):
+                    item[kk] = vv
+        if strategy != 'rrf':
+            item['_norm_score_vec'] = float(sv[i])
+            item['_norm_score_kw'] = float(sk[i])
+        item['score'] = float(score[i])
+        res.append(item)
+    return res
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from rag_service.config import INGEST_QUEUE_CONFIG
+except ImportError:
+    from config import INGEST_QUEUE_CONFIG
+
+
+# 处理函数：handler(kind, request, progress) -> result，progress(done, total) 上报 chunk 进度
+Progress = Callable[[int, int], Awaitable[None]]
+Handler = Callable[[str, Dict[str, Any], Progress], Awaitable[Dict[str, Any]]]
+
+
+class IngestJobStore:
+    """入库任务的 sqlite 持久化，服务重启后未完成的任务可以继续执行"""
+
+    def __init__(self, path: str = None):
+        self.path = path or INGEST_QUEUE_CONFIG['path']
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, user TEXT, status TEXT NOT NULL, "
+            "request TEXT NOT NULL, total INTEGER DEFAULT 0, done INTEGER DEFAULT 0, "
+            "result TEXT, error TEXT, attempts INTEGER DEFAULT 0, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status, created_at)")
+        self._db.commit()
+
+    def create(self, kind: str, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO ingest_jobs (id, kind, user, status, request, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, request.get('user'), json.dumps(request, ensure_ascii=False), now, now)
+            )
+            self._db.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = time.time()
+        if fields.get('result') is not None:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False, default=str)
+        cols = ', '.join(f"{k}=?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE ingest_jobs SET {cols} WHERE id=?", [*fields.values(), job_id])
+            self._db.commit()
+
+    def start_attempt(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """标记为 running 并累计尝试次数，返回任务（含请求体）"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE ingest_jobs SET status='running', attempts=attempts+1, updated_at=? WHERE id=?",
+                (time.time(), job_id)
+            )
+            self._db.commit()
+        return self.get(job_id, with_request=True)
+
+    def get(self, job_id: str, with_request: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, user, status, total, done, result, error, attempts, created_at, updated_at, request "
+                "FROM ingest_jobs WHERE id=?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = {
+            'job_id': row[0], 'kind': row[1], 'user': row[2], 'status': row[3],
+            'total': row[4], 'done': row[5],
+            'result': json.loads(row[6]) if row[6] else None,
+            'error': row[7], 'attempts': row[8],
+            'created_at': row[9], 'updated_at': row[10],
+        }
+        if with_request:
+            job['request'] = json.loads(row[11])
+        return job
+
+    def unfinished(self) -> List[str]:
+        """排队中或执行中（上次进程中断）的任务，按提交顺序"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM ingest_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def purge(self, before: float) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM ingest_jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (before,)
+            )
+            self._db.commit()
+        return cur.rowcount
+
+
+class IngestQueue:
+    """
+    后台入库任务队列：
+    - 提交时只落库并返回 job_id，由固定数量的 worker 执行切分、embedding 与写入
+    - 任务状态 queued/running/done/failed 与 chunk 进度持久化在 sqlite
+    - 重启后重新执行未完成的任务（点 ID 确定，重复写入是幂等的），超过最大尝试次数的任务标记失败
+    """
+
+    def __init__(self, handler: Handler, store: IngestJobStore = None, workers: int = None,
+                 max_attempts: int = None):
+        self.handler = handler
+        self.store = store or IngestJobStore()
+        self.workers = workers or INGEST_QUEUE_CONFIG['workers']
+        self.max_attempts = max_attempts or INGEST_QUEUE_CONFIG['max_attempts']
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        purged = await asyncio.to_thread(self.store.purge, time.time() - INGEST_QUEUE_CONFIG['keep_days'] * 86400)
+        pending = await asyncio.to_thread(self.store.unfinished)
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"[IngestQueue] 启动 {self.workers} 个 worker，恢复 {len(pending)} 个未完成任务，清理 {purged} 个过期任务")
+
+    async def submit(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = await asyncio.to_thread(self.store.create, kind, request)
+        self._queue.put_nowait(job_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {'workers': self.workers, 'queued': self._queue.qsize() if self._queue else 0}
+
+    async def close(self) -> None:
+        # 执行中的任务保持 running 状态，下次启动时重新执行
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[IngestQueue] worker {n} 处理任务 {job_id} 异常: {e}")
+
+    async def _run(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.start_attempt, job_id)
+        if job is None:
+            return
+        if job['attempts'] > self.max_attempts:
+            await asyncio.to_thread(self.store.update, job_id, status='failed', error='超过最大尝试次数')
+            return
+
+        async def progress(done: int, total: int) -> None:
+            await asyncio.to_thread(self.store.update, job_id, done=done, total=total)
+
+        t0 = time.perf_counter()
+        try:
+            result = await self.handler(job['kind'], job['request'], progress)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[IngestQueue] 任务 {job_id} 失败: {e}")
+            await asyncio.to_thread(self.store.update, job_id, status='failed', error=str(e))
+            return
+        await asyncio.to_thread(self.store.update, job_id, status='done', result=result)
+        print(f"[IngestQueue] 任务 {job_id} 完成，耗时 {time.perf_counter() - t0:.2f}s: {result}")
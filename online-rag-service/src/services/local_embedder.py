@@ -0,0 +1,147 @@
+import asyncio
+import os.path as osp
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from rag_service.config import LOCAL_EMBED_CONFIG
+    from rag_service.services.embedder import EmbeddingProvider
+except ImportError:
+    from config import LOCAL_EMBED_CONFIG
+    from services.embedder import EmbeddingProvider
+
+try:
+    import onnxruntime as ort  # 可选依赖：本地 embedding 推理
+except ImportError:
+    ort = None
+
+try:
+    from tokenizers import Tokenizer  # 可选依赖：Hugging Face 快速分词器
+except ImportError:
+    Tokenizer = None
+
+
+# 可选的池化方式：mean（按 attention mask 平均，如 MiniLM/e5）、cls（取首个 token，如 bge）
+POOLINGS = ('mean', 'cls')
+# 未指定 ONNX 文件时按顺序查找（optimum 导出的目录 / Hugging Face 仓库的 onnx 子目录）
+ONNX_FILES = ('model.onnx', 'onnx/model.onnx')
+
+
+def resolve_model_dir(model_name: str, onnx_file: str = '') -> str:
+    """本地目录直接使用；否则视为 Hugging Face 仓库名，只下载 tokenizer/配置与 ONNX 模型文件（已下载的使用本地缓存）"""
+    if osp.isdir(model_name):
+        return model_name
+    try:
+        from huggingface_hub import snapshot_download
+    except ImportError:
+        raise RuntimeError(f"模型目录 {model_name} 不存在，且未安装 huggingface_hub，无法从仓库下载")
+    files = (onnx_file,) if onnx_file else ONNX_FILES
+    patterns = ['*.json', 'vocab.txt', *files, *(f + '_data' for f in files)]
+    return snapshot_download(model_name, allow_patterns=patterns)
+
+
+class LocalEmbedder(EmbeddingProvider):
+    """
+    本机 CPU 推理的句向量模型（ONNX Runtime + tokenizers），无网络往返与限流，可离线运行：
+    - 按 token 长度排序后分批，每批只填充到本批最长序列（动态 padding），减少无效计算
+    - 各批提交到线程池并发推理（onnxruntime 推理时释放 GIL），结果按输入顺序拼接
+    - mean/cls 池化后 L2 归一化
+    """
+
+    def __init__(self, model_name: str, batch_size: int = None, max_length: int = None, workers: int = None,
+                 intra_threads: int = None, pooling: str = None, onnx_file: str = None):
+        if ort is None or Tokenizer is None:
+            raise RuntimeError("本地 embedding 需要安装 onnxruntime 与 tokenizers")
+        self.model_name = model_name
+        self.dimensions = None
+        self.batch_size = batch_size or LOCAL_EMBED_CONFIG['batch_size']
+        self.max_length = max_length or LOCAL_EMBED_CONFIG['max_length']
+        self.pooling = pooling or LOCAL_EMBED_CONFIG['pooling']
+        if self.pooling not in POOLINGS:
+            raise ValueError(f"不支持的池化方式: {self.pooling}，可选: {', '.join(POOLINGS)}")
+        onnx_file = LOCAL_EMBED_CONFIG['onnx_file'] if onnx_file is None else onnx_file
+
+        model_dir = resolve_model_dir(model_name, onnx_file)
+        model_path = next((osp.join(model_dir, f) for f in ((onnx_file,) if onnx_file else ONNX_FILES)
+                           if osp.isfile(osp.join(model_dir, f))), None)
+        if model_path is None:
+            raise RuntimeError(f"模型目录 {model_dir} 中未找到 ONNX 模型（{onnx_file or ' / '.join(ONNX_FILES)}）")
+
+        self.tokenizer = Tokenizer.from_file(osp.join(model_dir, 'tokenizer.json'))
+        # padding 由推理时按批完成，这里只截断
+        self.pad_id = (self.tokenizer.padding or {}).get('pad_id', 0)
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(self.max_length)
+
+        options = ort.SessionOptions()
+        intra_threads = LOCAL_EMBED_CONFIG['intra_threads'] if intra_threads is None else intra_threads
+        if intra_threads:
+            options.intra_op_num_threads = intra_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self._pool = ThreadPoolExecutor(max_workers=workers or LOCAL_EMBED_CONFIG['workers'], thread_name_prefix='local-embed')
+
+        dim = self.session.get_outputs()[0].shape[-1]
+        self._dim: Optional[int] = dim if isinstance(dim, int) else None
+        print(f"[LocalEmbedder] 已加载模型: {model_path}，池化: {self.pooling}，每批: {self.batch_size}")
+
+    def dimension(self) -> int:
+        if self._dim is None:
+            # 输出维度为动态形状时试算一条得到
+            self._dim = int(self.encode(['dimension'])[0].shape[0])
+        return self._dim
+
+    def _plan(self, texts: List[str]) -> Tuple[list, List[List[int]]]:
+        # 分词在 Rust 侧并行；按长度排序后切批，长度相近的文本在同一批，padding 最少
+        encodings = self.tokenizer.encode_batch(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        return encodings, batches
+
+    def _infer(self, encodings: list) -> np.ndarray:
+        n = max(len(e.ids) for e in encodings)
+        ids = np.full((len(encodings), n), self.pad_id, dtype=np.int64)
+        mask = np.zeros((len(encodings), n), dtype=np.int64)
+        for i, e in enumerate(encodings):
+            ids[i, :len(e.ids)] = e.ids
+            mask[i, :len(e.ids)] = 1
+        feeds = {'input_ids': ids, 'attention_mask': mask, 'token_type_ids': np.zeros_like(ids)}
+        out = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        if out.ndim == 3:
+            # token 级输出 (batch, seq, hidden) 需要池化；已池化的句向量输出直接使用
+            if self.pooling == 'cls':
+                out = out[:, 0]
+            else:
+                m = mask[:, :, None].astype('float32')
+                out = (out * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+        out = np.asarray(out, dtype='float32')
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+    @staticmethod
+    def _assemble(n: int, batches: List[List[int]], results: List[np.ndarray]) -> np.ndarray:
+        out = np.empty((n, results[0].shape[1]), dtype='float32')
+        for rows, vecs in zip(batches, results):
+            out[rows] = vecs
+        return out
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype='float32')
+        encodings, batches = self._plan(texts)
+        results = list(self._pool.map(lambda rows: self._infer([encodings[i] for i in rows]), batches))
+        return self._assemble(len(texts), batches, results)
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension()), dtype='float32')
+        loop = asyncio.get_running_loop()
+        encodings, batches = await loop.run_in_executor(self._pool, self._plan, texts)
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self._pool, self._infer, [encodings[i] for i in rows]) for rows in batches
+        ])
+        return self._assemble(len(texts), batches, results)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
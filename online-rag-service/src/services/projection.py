@@ -0,0 +1,97 @@
+import hashlib
+import os
+import os.path as osp
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class PCAProjection:
+    """
+    离线拟合的 PCA 降维：x -> (x - mean) @ components，再做 L2 归一化（余弦距离）。
+    以 .npz 文件保存，指纹写入集合配置，保证入库与查询使用同一投影
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained: Optional[np.ndarray] = None):
+        self.mean = np.asarray(mean, dtype='float32')
+        self.components = np.ascontiguousarray(components, dtype='float32')  # (原维度, 目标维度)
+        self.explained = explained if explained is not None else np.zeros(self.components.shape[1], dtype='float32')
+
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dim: int) -> 'PCAProjection':
+        x = np.asarray(vectors, dtype='float64')
+        if dim > min(x.shape):
+            raise ValueError(f"目标维度 {dim} 超过样本数或原维度 {x.shape}")
+        mean = x.mean(axis=0)
+        # 奇异值分解求主成分，按方差从大到小排列
+        _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+        var = s ** 2
+        return cls(mean, vt[:dim].T, (var[:dim] / var.sum()).astype('float32'))
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        out = (np.asarray(vectors, dtype='float32') - self.mean) @ self.components
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms > 0, norms, 1.0)
+
+    def fingerprint(self) -> str:
+        h = hashlib.sha256()
+        h.update(self.mean.tobytes())
+        h.update(self.components.tobytes())
+        return h.hexdigest()[:16]
+
+    def save(self, path: str) -> None:
+        os.makedirs(osp.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, mean=self.mean, components=self.components, explained=self.explained)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'PCAProjection':
+        with np.load(path) as data:
+            return cls(data['mean'], data['components'], data['explained'])
+
+
+class ProjectedEmbedder:
+    """
+    包装 Embedder，输出经过投影降维的向量；放在缓存层外侧，缓存中保存原始向量，
+    更换投影无需重新请求 embedding
+    """
+
+    def __init__(self, embedder, projection: PCAProjection):
+        if embedder.dimension() != projection.input_dim:
+            raise ValueError(f"投影输入维度 {projection.input_dim} 与 embedding 维度 {embedder.dimension()} 不一致")
+        self.embedder = embedder
+        self.projection = projection
+        self.model_name = embedder.model_name
+
+    def dimension(self) -> int:
+        return self.projection.dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.projection.transform(self.embedder.encode(texts))
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        return self.projection.transform(await self.embedder.aencode(texts))
+
+
+def vector_space(embedder) -> Dict[str, Any]:
+    """描述向量空间（模型、服务端维度、投影），写入集合配置，用于发现入库与查询的向量不一致"""
+    space = {'model': embedder.model_name, 'dim': embedder.dimension()}
+    layer = embedder
+    while layer is not None:
+        # 取最内层（实际调用服务端）的模型名
+        space['model'] = getattr(layer, 'model_name', space['model'])
+        if isinstance(layer, ProjectedEmbedder):
+            space['projection'] = f"pca:{layer.projection.input_dim}->{layer.projection.dim}:{layer.projection.fingerprint()}"
+        if getattr(layer, 'dimensions', None):
+            space['dimensions'] = layer.dimensions
+        layer = getattr(layer, 'embedder', None)
+    return space
@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    from rag_service.config import QUERY_CACHE_CONFIG
+    from rag_service.services.embedding_cache import normalize_text
+except ImportError:
+    from config import QUERY_CACHE_CONFIG
+    from services.embedding_cache import normalize_text
+
+
+class QueryCache:
+    """
+    检索结果缓存：按 (接口, user, category, 规范化查询, 参数) 缓存结果，TTL + LRU 淘汰。
+    作为 VectorStore 的监听器使用，入库/删除时按 (user, category) 递增代数，
+    缓存项记录写入时的代数，代数变化后的读取视为未命中，不会返回过期结果
+    """
+
+    def __init__(self, max_items: int = None, ttl_seconds: float = None):
+        self.max_items = max_items if max_items is not None else QUERY_CACHE_CONFIG['max_items']
+        self.ttl = ttl_seconds if ttl_seconds is not None else QUERY_CACHE_CONFIG['ttl_seconds']
+        self._items: "OrderedDict[Tuple, Tuple[Any, Tuple, float, float]]" = OrderedDict()
+        # (user, category) -> 代数；(user, None) 在该用户任意变更时递增
+        self._gen: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        # 影响类别未知（按标题/来源删除、payload 变更）时按用户递增
+        self._wide: Dict[Optional[str], int] = {}
+        # 不限用户的删除使全部缓存失效
+        self._epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(kind: str, user: Optional[str], category: Optional[str], q: str, *params) -> Tuple:
+        return (kind, user or None, category or None, normalize_text(q).lower(), *params)
+
+    def token(self, user: Optional[str], category: Optional[str]) -> Tuple:
+        """当前代数快照；应在执行检索前获取，检索期间发生写入则结果不会被复用"""
+        user, category = user or None, category or None
+        if category is None:
+            return (self._epoch, self._gen.get((user, None), 0))
+        return (self._epoch, self._gen.get((user, category), 0), self._wide.get(user, 0))
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, token, expires, cost = item
+        if time.monotonic() > expires or token != self.token(key[1], key[2]):
+            del self._items[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        self.saved_seconds += cost
+        return value
+
+    def put(self, key: Tuple, value: Any, token: Tuple, cost_seconds: float) -> None:
+        if self.max_items <= 0:
+            return
+        self._items[key] = (value, token, time.monotonic() + self.ttl, cost_seconds)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def _bump(self, scope: Tuple[Optional[str], Optional[str]]) -> None:
+        self._gen[scope] = self._gen.get(scope, 0) + 1
+
+    # VectorStore 监听接口
+    def on_add(self, points: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        scopes = set()
+        for _, payload in points:
+            user = payload.get('user') or None
+            scopes.add((user, payload.get('category') or None))
+            scopes.add((user, None))
+        for scope in scopes:
+            self._bump(scope)
+
+    def on_update(self, points: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        # payload 变更可能改变类别，按用户整体失效
+        for user in {payload.get('user') or None for _, payload in points}:
+            self._wide[user] = self._wide.get(user, 0) + 1
+            self._bump((user, None))
+
+    def on_delete(self, user: Optional[str], title: Optional[str] = None, category: Optional[str] = None,
+                  source_ids: Optional[Iterable[Any]] = None, point_ids: Optional[Iterable[Any]] = None) -> None:
+        user = user or None
+        if user is None:
+            self._epoch += 1
+            return
+        if title is None and source_ids is None and point_ids is None and category:
+            self._bump((user, category))
+        else:
+            self._wide[user] = self._wide.get(user, 0) + 1
+        self._bump((user, None))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'items': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'saved_ms': round(self.saved_seconds * 1000, 1),
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from rag_service.config import RERANK_CONFIG
+    from rag_service.services.bm25_index import tokenize
+except ImportError:
+    from config import RERANK_CONFIG
+    from services.bm25_index import tokenize
+
+
+# 可选的重排后端
+BACKENDS = ('none', 'lexical', 'cross')
+
+
+def _text(item: Dict[str, Any]) -> str:
+    return f"{item.get('title') or ''} {item.get('content') or ''}"
+
+
+class LexicalReranker:
+    """
+    词项重叠重排（无模型依赖）：查询词在候选中的覆盖率，词权重按候选集内的 IDF 计算，
+    稀有词命中比常见词命中更重要；同时奖励查询原文在候选中连续出现
+    """
+
+    name = 'lexical'
+
+    def score(self, query: str, items: Sequence[Dict[str, Any]]) -> List[float]:
+        q_terms = set(tokenize(query))
+        if not q_terms or not items:
+            return [0.0] * len(items)
+        docs = [set(tokenize(_text(i))) for i in items]
+        n = len(docs)
+        weights = {t: math.log(1 + n / (1 + sum(1 for d in docs if t in d))) + 1e-6 for t in q_terms}
+        total = sum(weights.values())
+        needle = query.strip().lower()
+        scores = []
+        for item, d in zip(items, docs):
+            s = sum(w for t, w in weights.items() if t in d) / total
+            if needle and needle in _text(item).lower():
+                s += 0.5
+            scores.append(s)
+        return scores
+
+
+class CrossEncoderReranker:
+    """
+    本地 CPU 交叉编码器重排（如 bge-reranker），需要安装 sentence-transformers；
+    (查询, 候选) 按 batch_size 分批推理
+    """
+
+    name = 'cross'
+
+    def __init__(self, model_path: str, batch_size: int = None, max_length: int = None):
+        from sentence_transformers import CrossEncoder
+        self.batch_size = batch_size or RERANK_CONFIG['batch_size']
+        self.model = CrossEncoder(model_path, max_length=max_length or RERANK_CONFIG['max_length'], device='cpu')
+
+    def score(self, query: str, items: Sequence[Dict[str, Any]]) -> List[float]:
+        if not items:
+            return []
+        pairs = [(query, _text(i)) for i in items]
+        return [float(s) for s in self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)]
+
+
+def _minmax(scores: np.ndarray) -> np.ndarray:
+    mn, mx = scores.min(), scores.max()
+    if mx == mn:
+        return np.ones_like(scores)
+    return (scores - mn) / (mx - mn)
+
+
+class Reranker:
+    """
+    融合后的重排阶段：只对前 max_candidates 条候选打分，并受截止时间约束；
+    模型正在为其他请求推理、超时或失败时退回词项重叠打分，仍失败则保持融合顺序。
+    最终分数 = (1 - weight) * 融合分数 + weight * 重排分数（两者各自 min-max 归一化）
+    """
+
+    def __init__(self, backend: str = None, model_path: str = None, max_candidates: int = None,
+                 timeout_ms: float = None, weight: float = None):
+        backend = backend or RERANK_CONFIG['backend']
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的重排后端: {backend}")
+        self.max_candidates = max_candidates or RERANK_CONFIG['max_candidates']
+        self.timeout_ms = timeout_ms if timeout_ms is not None else RERANK_CONFIG['timeout_ms']
+        self.weight = weight if weight is not None else RERANK_CONFIG['weight']
+        self.fallback = LexicalReranker()
+        self.model = None
+        if backend == 'cross':
+            model_path = model_path or RERANK_CONFIG['model']
+            try:
+                self.model = CrossEncoderReranker(model_path)
+                print(f"[Rerank] 已加载交叉编码器: {model_path}")
+            except Exception as e:
+                print(f"[Rerank] 交叉编码器 {model_path or '(未配置)'} 不可用，使用词项重叠重排: {e}")
+        self.backend = self.model.name if self.model is not None else ('lexical' if backend != 'none' else 'none')
+        # 模型推理在单个线程中执行，同一时刻只跑一批，避免多个请求争抢 CPU；
+        # 超时的请求不再等待，但推理线程仍在运行，直到线程结束才释放模型
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rerank') if self.model is not None else None
+        self._busy = False
+        self.busy_fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != 'none'
+
+    def _release(self, _) -> None:
+        # 在推理线程结束时调用（可能在线程池线程中），赋值是原子的
+        self._busy = False
+
+    def _score_model(self, query: str, items: List[Dict[str, Any]]) -> Optional[asyncio.Future]:
+        """模型空闲时提交推理并返回 future，模型正在推理时返回 None（不排队）"""
+        if self._busy:
+            return None
+        self._busy = True
+        fut = self._pool.submit(self.model.score, query, items)
+        fut.add_done_callback(self._release)
+        return asyncio.wrap_future(fut)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.backend, 'busy': self._busy, 'busy_fallbacks': self.busy_fallbacks}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    async def rerank(self, query: str, items: List[Dict[str, Any]], topK: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """重排融合结果并截取前 topK 条，返回 (结果, 重排元信息)"""
+        t0 = time.perf_counter()
+        head, tail = items[:self.max_candidates], items[self.max_candidates:]
+        meta: Dict[str, Any] = {'backend': self.backend, 'candidates': len(head), 'status': 'ok'}
+        if not self.enabled or len(head) < 2:
+            meta['status'] = 'skipped'
+            meta['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+            return items[:topK], meta
+
+        scores: Optional[List[float]] = None
+        if self.model is not None:
+            try:
+                fut = self._score_model(query, head)
+                if fut is None:
+                    self.busy_fallbacks += 1
+                    meta['status'] = 'busy'
+                else:
+                    scores = await asyncio.wait_for(fut, timeout=self.timeout_ms / 1000.0)
+            except asyncio.TimeoutError:
+                meta['status'] = 'timeout'
+            except Exception as e:
+                print(f"[Rerank] 模型重排失败: {e}")
+                meta['status'] = 'error'
+        if scores is None:
+            try:
+                scores = self.fallback.score(query, head)
+                if self.model is not None:
+                    meta['backend'] = self.fallback.name
+            except Exception as e:
+                print(f"[Rerank] 词项重叠重排失败: {e}")
+                meta['status'] = 'error'
+                meta['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+                return items[:topK], meta
+
+        fused = _minmax(np.array([float(i.get('score') or 0.0) for i in head]))
+        rerank = _minmax(np.array(scores, dtype=np.float64))
+        final = (1 - self.weight) * fused + self.weight * rerank
+        res = []
+        for i in np.argsort(-final, kind='stable'):
+            item = dict(head[i])
+            item['score_fused'] = item.get('score')
+            item['score_rerank'] = float(scores[i])
+            item['score'] = float(final[i])
+            res.append(item)
+        meta['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+        return (res + tail)[:topK], meta
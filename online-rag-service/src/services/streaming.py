@@ -0,0 +1,43 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from fastapi.responses import StreamingResponse
+
+
+# 可选的流式响应格式
+FORMATS = ('ndjson', 'sse')
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+# 每输出多少条结果让出一次事件循环，避免大结果集长时间占用
+YIELD_EVERY = 32
+
+
+def project(items: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """只保留 fields 中的字段（如 id/title/score），fields 为空时原样返回"""
+    if not fields:
+        return items
+    return [{f: item[f] for f in fields if f in item} for item in items]
+
+
+def encode(event: str, data: Any, fmt: str) -> bytes:
+    body = json.dumps(data, ensure_ascii=False, default=str)
+    if fmt == 'sse':
+        return f"event: {event}\ndata: {body}\n\n".encode('utf-8')
+    return (json.dumps({'type': event, 'data': data}, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+
+async def _events(items: Iterable[Dict[str, Any]], meta: Dict[str, Any], fmt: str) -> AsyncIterator[bytes]:
+    for i, item in enumerate(items):
+        yield encode('result', item, fmt)
+        if (i + 1) % YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+    yield encode('done', meta, fmt)
+
+
+def stream_response(items: Iterable[Dict[str, Any]], meta: Dict[str, Any], fmt: str) -> StreamingResponse:
+    """
+    逐条输出结果的流式响应：每条结果一个 result 事件（按排名顺序），最后一个 done 事件携带元信息。
+    ndjson 每行 {"type": ..., "data": ...}；sse 为 event/data 格式
+    """
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'} if fmt == 'sse' else None
+    return StreamingResponse(_events(items, meta, fmt), media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional
+
+
+class TenantLocks:
+    """
+    按租户（user）加锁：
+    - 同一用户的写入/删除按到达顺序串行，保证先删后写等操作的先后关系
+    - 不同用户之间完全并行
+    - 不限用户的操作（如 user=None 的删除）独占执行，等待中的独占操作优先，避免被持续的租户操作饿死
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refs: Dict[str, int] = {}
+        self._cond = asyncio.Condition()
+        self._active = 0
+        self._exclusive = False
+        self._exclusive_waiting = 0
+
+    @asynccontextmanager
+    async def hold(self, users: Iterable[Optional[str]]):
+        """持有若干用户的锁（按排序后的顺序获取，避免死锁）"""
+        keys = sorted({u or '' for u in users})
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._exclusive and not self._exclusive_waiting)
+            self._active += 1
+        locks = []
+        acquired = []
+        try:
+            for key in keys:
+                lock = self._locks.get(key)
+                if lock is None:
+                    lock = asyncio.Lock()
+                    self._locks[key] = lock
+                self._refs[key] = self._refs.get(key, 0) + 1
+                locks.append((key, lock))
+            for _, lock in locks:
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in acquired:
+                lock.release()
+            for key, _ in locks:
+                self._refs[key] -= 1
+                if not self._refs[key]:
+                    # 没有等待者时回收，避免用户数增长导致锁表无限增长
+                    del self._refs[key]
+                    del self._locks[key]
+            async with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def hold_all(self):
+        """独占全部租户"""
+        async with self._cond:
+            self._exclusive_waiting += 1
+            try:
+                await self._cond.wait_for(lambda: not self._exclusive and not self._active)
+            finally:
+                self._exclusive_waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+    def scope(self, user: Optional[str]):
+        """user 为空时独占全部，否则只锁该用户"""
+        return self.hold([user]) if user else self.hold_all()
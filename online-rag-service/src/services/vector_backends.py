@@ -0,0 +1,870 @@
+import asyncio
+import json
+import os
+import os.path as osp
+import sqlite3
+import time
+import zlib
+from array import array
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import (
+    PointStruct, Filter, FieldCondition, MatchValue, MatchAny,
+    KeywordIndexParams, KeywordIndexType, ShardingMethod, VectorParams, Distance,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig,
+    Disabled, SearchParams, QuantizationSearchParams, QueryRequest, PayloadSelectorExclude,
+    PointIdsList
+)
+
+try:
+    from rag_service.config import QDRANT_CONFIG, VECTOR_BACKEND, INDEX_PATH, META_PATH, LOCAL_BACKEND_CONFIG
+except ImportError:
+    from config import QDRANT_CONFIG, VECTOR_BACKEND, INDEX_PATH, META_PATH, LOCAL_BACKEND_CONFIG
+
+try:
+    import faiss  # 可选依赖：安装后本地后端使用 HNSW 索引
+except ImportError:
+    faiss = None
+
+
+# 检索结果：(point_id, score, payload)
+Hit = Tuple[Any, float, Dict[str, Any]]
+
+# 可选的集合级量化方式
+QUANTIZATIONS = ('none', 'scalar', 'binary')
+
+
+def quantization_config(method: str, always_ram: bool = True):
+    """量化方式对应的 Qdrant 配置；none 返回 None"""
+    if method == 'scalar':
+        # int8 标量量化，按 0.99 分位数截断离群值，内存约为 float32 的 1/4
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=always_ram))
+    if method == 'binary':
+        # 每维 1 bit，内存约为 float32 的 1/32，适合高维（>=1024）embedding，需要较大的 oversampling
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=always_ram))
+    if method == 'none':
+        return None
+    raise ValueError(f"不支持的量化方式: {method}")
+
+
+class VectorBackend:
+    """
+    向量存储后端接口。filters 为 payload 字段的等值条件，如 {'user': 'u', 'category': 'c'}，
+    值为列表时匹配其中任意一个，值为 None 的条件忽略。
+    检索的 exclude 为不返回的 payload 字段（如 content），retrieve 的 fields 为只返回的字段，
+    用于检索时只传输轻量字段、最终结果再按 ID 补全
+    """
+
+    name = 'base'
+
+    @property
+    def location(self) -> str:
+        """存储位置（集合名、索引路径等），与向量空间一起标识一份向量数据"""
+        return ''
+
+    async def ensure(self, dim: int, space: Dict[str, Any] = None) -> None:
+        """
+        确保集合存在；space 描述向量空间（模型、维度、投影），随集合配置保存，
+        已有集合的向量空间与之不一致时拒绝使用，避免不同空间的向量混在一起
+        """
+        raise NotImplementedError
+
+    async def upsert(self, ids: List[Any], vectors: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def query(self, vector: np.ndarray, filters: Dict[str, Any], limit: int,
+                    exclude: Optional[List[str]] = None) -> List[Hit]:
+        raise NotImplementedError
+
+    async def query_batch(self, vectors: np.ndarray, filters: List[Dict[str, Any]], limits: List[int],
+                          exclude: Optional[List[str]] = None) -> List[List[Hit]]:
+        """批量检索，结果与输入顺序一致；默认并发执行单条查询，后端可覆盖为一次往返"""
+        return list(await asyncio.gather(*[self.query(v, f, n, exclude) for v, f, n in zip(vectors, filters, limits)]))
+
+    async def count(self, filters: Dict[str, Any], exact: bool = True) -> int:
+        raise NotImplementedError
+
+    async def retrieve(self, ids: List[Any], filters: Dict[str, Any] = None,
+                       fields: Optional[List[str]] = None) -> Dict[Any, Dict[str, Any]]:
+        """按 ID 批量读取 payload，返回存在的 id -> payload；filters 仅用于分片路由，fields 为空时返回完整 payload"""
+        raise NotImplementedError
+
+    async def delete(self, filters: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def point_ids(self, filters: Dict[str, Any]) -> List[Any]:
+        """满足过滤条件的全部点 ID"""
+        raise NotImplementedError
+
+    async def delete_ids(self, ids: List[Any], filters: Dict[str, Any] = None) -> None:
+        """按 ID 删除；filters 仅用于分片路由"""
+        raise NotImplementedError
+
+    async def scroll(self, batch_size: int = 512) -> AsyncIterator[List[Tuple[Any, Dict[str, Any]]]]:
+        raise NotImplementedError
+        yield
+
+    async def close(self) -> None:
+        pass
+
+
+def _active(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in (filters or {}).items() if v is not None and v != ''}
+
+
+def _payload_selector(exclude: Optional[List[str]]):
+    return PayloadSelectorExclude(exclude=list(exclude)) if exclude else True
+
+
+# 建立 payload 索引的过滤字段；user 标记为租户字段，Qdrant 会按租户组织存储
+PAYLOAD_INDEX_FIELDS = ('user', 'category', 'title')
+
+
+def shard_group(user: Optional[str], groups: int) -> str:
+    """按用户稳定哈希到分组（进程重启后保持不变）"""
+    return f"g{zlib.crc32((user or '').encode('utf-8')) % max(1, groups)}"
+
+
+class QdrantBackend(VectorBackend):
+    """
+    远端 Qdrant 后端（默认）。
+    shard_mode 控制按用户分组的分片方式，对调用方透明：
+    - none：所有用户共享一个集合
+    - shard_key：单集合 + 自定义分片键，按用户分组路由到分片（需 Qdrant 集群模式）
+    - collection：每个用户分组一个集合 <collection_name>_gN
+    带 user 条件的读写只访问所属分组，不带 user 时遍历全部分组。
+    quantization 为 scalar/binary 时集合启用量化，检索先在量化向量上按 oversampling 倍数取候选，
+    再用原始向量重新打分；已有集合的量化配置在启动时按配置更新
+    """
+
+    name = 'qdrant'
+
+    def __init__(self, client: AsyncQdrantClient = None, collection_name: str = None,
+                 shard_mode: str = None, shard_groups: int = None, quantization: str = None):
+        # 使用Qdrant服务（异步客户端，不阻塞事件循环）
+        self.client = client or AsyncQdrantClient(
+            host=QDRANT_CONFIG['host'],
+            port=QDRANT_CONFIG['port']
+        )
+        self.collection_name = collection_name or QDRANT_CONFIG.get('collection_name', 'knowledge_base')
+        self.shard_mode = shard_mode or QDRANT_CONFIG.get('shard_mode', 'none')
+        self.shard_groups = shard_groups or QDRANT_CONFIG.get('shard_groups', 16)
+        if self.shard_mode not in ('none', 'shard_key', 'collection'):
+            raise ValueError(f"不支持的分片方式: {self.shard_mode}")
+        self.quantization = quantization or QDRANT_CONFIG.get('quantization', 'none')
+        self._quantization_config = quantization_config(self.quantization, QDRANT_CONFIG.get('quantization_always_ram', True))
+        self._search_params = None
+        if self._quantization_config is not None:
+            self._search_params = SearchParams(quantization=QuantizationSearchParams(
+                rescore=QDRANT_CONFIG.get('rescore', True),
+                oversampling=QDRANT_CONFIG.get('oversampling', 2.0)
+            ))
+        self._dim = None
+        self._space = None
+        self._collections = set()  # collection 模式下已存在的分组集合
+        # 其他实例可能创建新的分组集合：访问未知分组或遍历全部分组时，按该间隔重新列出
+        self.refresh_seconds = QDRANT_CONFIG.get('collection_refresh_seconds', 10.0)
+        self._listed_at = float('-inf')
+        self._create_lock = asyncio.Lock()
+
+    @staticmethod
+    def to_filter(filters: Dict[str, Any]) -> Optional[Filter]:
+        conditions = [
+            FieldCondition(key=k, match=MatchAny(any=list(v)) if isinstance(v, (list, tuple, set)) else MatchValue(value=v))
+            for k, v in _active(filters).items()
+        ]
+        return Filter(must=conditions) if conditions else None
+
+    @property
+    def location(self) -> str:
+        if self.shard_mode == 'collection':
+            return f"{self.collection_name}?shard=collection&groups={self.shard_groups}"
+        return f"{self.collection_name}?shard={self.shard_mode}"
+
+    def _group(self, user: Optional[str]) -> str:
+        return shard_group(user, self.shard_groups)
+
+    async def _targets(self, filters: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+        """根据过滤条件返回需要访问的 (集合名, 分片键) 列表"""
+        if self.shard_mode == 'none':
+            return [(self.collection_name, None)]
+        user = _active(filters).get('user')
+        if self.shard_mode == 'shard_key':
+            # 未指定分片键时 Qdrant 会查询全部分片
+            return [(self.collection_name, self._group(user) if user else None)]
+        if user:
+            name = f"{self.collection_name}_{self._group(user)}"
+            if name not in self._collections:
+                # 分组集合可能已由其他实例创建，未知时重新列出
+                await self._discover()
+            return [(name, None)] if name in self._collections else []
+        await self._discover()
+        return [(name, None) for name in sorted(self._collections)]
+
+    async def _discover(self, force: bool = False) -> List[str]:
+        """collection 模式下列出已有的分组集合，返回新发现的集合；refresh_seconds 内不重复列出"""
+        now = time.monotonic()
+        if not force and now - self._listed_at < self.refresh_seconds:
+            return []
+        self._listed_at = now
+        prefix = f"{self.collection_name}_g"
+        found = []
+        existing = await self.client.get_collections()
+        for c in existing.collections:
+            if c.name.startswith(prefix) and c.name[len(prefix):].isdigit() and c.name not in self._collections:
+                await self._check_space(c.name, await self.client.get_collection(c.name))
+                self._collections.add(c.name)
+                found.append(c.name)
+        if found and not force:
+            print(f"[VectorStore] 发现新的分组集合: {', '.join(found)}")
+        return found
+
+    async def _create(self, name: str, custom_sharding: bool = False) -> None:
+        if await self.client.collection_exists(name):
+            print(f"[VectorStore] 集合已存在: {name}")
+            info = await self.client.get_collection(name)
+            await self._check_space(name, info)
+            await self._update_quantization(name, info)
+        else:
+            on_disk = QDRANT_CONFIG.get('vectors_on_disk')
+            if on_disk is None:
+                # 启用量化时原始向量默认放到磁盘，只在重新打分时读取
+                on_disk = self._quantization_config is not None
+            await self.client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=self._dim, distance=Distance.COSINE, on_disk=on_disk),
+                quantization_config=self._quantization_config,
+                sharding_method=ShardingMethod.CUSTOM if custom_sharding else None,
+                metadata={'vector_space': self._space} if self._space else None
+            )
+            print(f"[VectorStore] 已创建集合: {name}（量化: {self.quantization}，原始向量{'在磁盘' if on_disk else '在内存'}）")
+        if QDRANT_CONFIG.get('payload_indexes', True):
+            await self._create_payload_indexes(name)
+
+    async def _check_space(self, name: str, info) -> None:
+        size = getattr(info.config.params.vectors, 'size', None)
+        if size is not None and size != self._dim:
+            raise RuntimeError(f"集合 {name} 的向量维度 {size} 与 embedder 维度 {self._dim} 不一致，请更换集合名或重新入库")
+        if not self._space:
+            return
+        stored = (info.config.metadata or {}).get('vector_space')
+        if stored is None:
+            # 旧集合没有记录向量空间，维度一致时按当前配置补写
+            await self.client.update_collection(collection_name=name, metadata={'vector_space': self._space})
+        elif stored != self._space:
+            raise RuntimeError(f"集合 {name} 的向量空间 {stored} 与当前配置 {self._space} 不一致，请更换集合名或重新入库")
+
+    async def _update_quantization(self, name: str, info) -> None:
+        """已有集合的量化方式与配置不一致时更新（Qdrant 在后台重建量化数据）"""
+        current = info.config.quantization_config
+        current = 'scalar' if isinstance(current, ScalarQuantization) else 'binary' if isinstance(current, BinaryQuantization) else 'none'
+        if current == self.quantization:
+            return
+        try:
+            await self.client.update_collection(
+                collection_name=name,
+                quantization_config=self._quantization_config or Disabled.DISABLED
+            )
+            print(f"[VectorStore] 集合 {name} 量化方式已由 {current} 更新为 {self.quantization}")
+        except Exception as e:
+            print(f"[VectorStore] 集合 {name} 更新量化方式失败: {e}")
+
+    async def _create_payload_indexes(self, name: str) -> None:
+        for field in PAYLOAD_INDEX_FIELDS:
+            try:
+                await self.client.create_payload_index(
+                    collection_name=name,
+                    field_name=field,
+                    field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=field == 'user')
+                )
+            except Exception as e:
+                # 索引已存在时 Qdrant 直接返回成功，这里只记录真正的失败
+                print(f"[VectorStore] 集合 {name} 创建 {field} 索引失败: {e}")
+        print(f"[VectorStore] 集合 {name} 已确保 payload 索引: {', '.join(PAYLOAD_INDEX_FIELDS)}")
+
+    async def ensure(self, dim: int, space: Dict[str, Any] = None) -> None:
+        self._dim = dim
+        self._space = space
+        if self.shard_mode == 'collection':
+            # 分组集合按需创建，这里只发现已有集合并补齐索引
+            for name in await self._discover(force=True):
+                if QDRANT_CONFIG.get('payload_indexes', True):
+                    await self._create_payload_indexes(name)
+            print(f"[VectorStore] 分组集合模式，已有 {len(self._collections)} 个集合")
+            return
+
+        await self._create(self.collection_name, custom_sharding=self.shard_mode == 'shard_key')
+        if self.shard_mode == 'shard_key':
+            info = await self.client.get_collection(self.collection_name)
+            if info.config.params.sharding_method != ShardingMethod.CUSTOM:
+                # 已有集合未启用自定义分片，无法使用分片键，退回共享集合
+                print(f"[VectorStore] 集合 {self.collection_name} 未启用自定义分片，按不分片方式使用")
+                self.shard_mode = 'none'
+                return
+            for i in range(self.shard_groups):
+                try:
+                    await self.client.create_shard_key(self.collection_name, f"g{i}")
+                except Exception as e:
+                    # 分片键已存在
+                    print(f"[VectorStore] 分片键 g{i} 可能已存在: {e}")
+
+    async def _ensure_group_collection(self, name: str) -> None:
+        if name in self._collections:
+            return
+        async with self._create_lock:
+            if name not in self._collections:
+                await self._create(name)
+                self._collections.add(name)
+
+    async def upsert(self, ids, vectors, payloads) -> None:
+        # 按用户分组拆分写入，同组的点一次写入
+        groups: Dict[str, List[PointStruct]] = {}
+        for pid, vec, meta in zip(ids, vectors, payloads):
+            key = self._group(meta.get('user')) if self.shard_mode != 'none' else ''
+            groups.setdefault(key, []).append(PointStruct(id=pid, vector=vec.tolist(), payload=meta))
+        for key, points in groups.items():
+            if self.shard_mode == 'collection':
+                name = f"{self.collection_name}_{key}"
+                await self._ensure_group_collection(name)
+                await self.client.upsert(collection_name=name, points=points)
+            else:
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points,
+                    shard_key_selector=key or None
+                )
+
+    async def query(self, vector, filters, limit, exclude=None) -> List[Hit]:
+        # 使用query_points方法进行向量相似度搜索；多个分组并发查询后按分数合并
+        query_filter = self.to_filter(filters)
+        vector = vector.tolist()
+        with_payload = _payload_selector(exclude)
+        responses = await asyncio.gather(*[
+            self.client.query_points(
+                collection_name=name,
+                query=vector,
+                query_filter=query_filter,
+                limit=limit,
+                with_payload=with_payload,
+                with_vectors=False,
+                search_params=self._search_params,
+                shard_key_selector=shard_key
+            )
+            for name, shard_key in await self._targets(filters)
+        ])
+        hits = [(p.id, float(p.score), p.payload) for r in responses for p in r.points]
+        if len(responses) > 1:
+            hits.sort(key=lambda h: h[1], reverse=True)
+            hits = hits[:limit]
+        return hits
+
+    async def query_batch(self, vectors, filters, limits, exclude=None) -> List[List[Hit]]:
+        # 按集合分组，每个集合一次 query_batch_points 往返（分片键随单条请求传递）；
+        # 不带 user 的查询在 collection 模式下会分到多个集合，结果按分数合并
+        with_payload = _payload_selector(exclude)
+        groups: Dict[str, List[Tuple[int, QueryRequest]]] = {}
+        for i, (vector, flt, limit) in enumerate(zip(vectors, filters, limits)):
+            query_filter = self.to_filter(flt)
+            for name, shard_key in await self._targets(flt):
+                groups.setdefault(name, []).append((i, QueryRequest(
+                    query=vector.tolist(),
+                    filter=query_filter,
+                    limit=limit,
+                    params=self._search_params,
+                    with_payload=with_payload,
+                    with_vector=False,
+                    shard_key=shard_key
+                )))
+        responses = await asyncio.gather(*[
+            self.client.query_batch_points(collection_name=name, requests=[r for _, r in requests])
+            for name, requests in groups.items()
+        ])
+        hits: List[List[Hit]] = [[] for _ in limits]
+        fanout = [0] * len(limits)
+        for requests, response in zip(groups.values(), responses):
+            for (i, _), r in zip(requests, response):
+                hits[i].extend((p.id, float(p.score), p.payload) for p in r.points)
+                fanout[i] += 1
+        for i, n in enumerate(fanout):
+            if n > 1:
+                hits[i].sort(key=lambda h: h[1], reverse=True)
+                hits[i] = hits[i][:limits[i]]
+        return hits
+
+    async def count(self, filters, exact: bool = True) -> int:
+        # 服务端带过滤计数，不传输任何点数据，规模不受限制
+        count_filter = self.to_filter(filters)
+        results = await asyncio.gather(*[
+            self.client.count(
+                collection_name=name,
+                count_filter=count_filter,
+                exact=exact,
+                shard_key_selector=shard_key
+            )
+            for name, shard_key in await self._targets(filters)
+        ])
+        return sum(r.count for r in results)
+
+    async def retrieve(self, ids, filters=None, fields=None) -> Dict[Any, Dict[str, Any]]:
+        if not ids:
+            return {}
+        results = await asyncio.gather(*[
+            self.client.retrieve(
+                collection_name=name,
+                ids=list(ids),
+                with_payload=list(fields) if fields else True,
+                with_vectors=False,
+                shard_key_selector=shard_key
+            )
+            for name, shard_key in await self._targets(filters or {})
+        ])
+        return {p.id: p.payload for r in results for p in r}
+
+    async def delete(self, filters) -> None:
+        # 直接按条件删除 (原子操作，更快)
+        for name, shard_key in await self._targets(filters):
+            await self.client.delete(
+                collection_name=name,
+                points_selector=self.to_filter(filters),
+                shard_key_selector=shard_key
+            )
+
+    async def point_ids(self, filters, batch_size: int = 1024) -> List[Any]:
+        res = []
+        for name, shard_key in await self._targets(filters):
+            offset = None
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=name,
+                    scroll_filter=self.to_filter(filters),
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False,
+                    shard_key_selector=shard_key
+                )
+                res.extend(p.id for p in points)
+                if offset is None:
+                    break
+        return res
+
+    async def delete_ids(self, ids, filters=None) -> None:
+        if not ids:
+            return
+        for name, shard_key in await self._targets(filters or {}):
+            await self.client.delete(
+                collection_name=name,
+                points_selector=PointIdsList(points=list(ids)),
+                shard_key_selector=shard_key
+            )
+
+    async def scroll(self, batch_size: int = 512):
+        for name, _ in await self._targets({}):
+            offset = None
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                if points:
+                    yield [(p.id, p.payload) for p in points]
+                if offset is None:
+                    break
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class LocalBackend(VectorBackend):
+    """
+    进程内向量后端，适合小规模部署与测试，无需 Qdrant：
+    - 归一化后的 float32 向量存放在内存映射文件中，冷启动直接映射，无需加载
+    - 安装 faiss 时建立 HNSW 索引（内积），否则使用 NumPy 精确检索；索引按间隔与关闭时落盘，
+      启动时版本与向量文件不一致则重建
+    - id 与 payload 存放在 META_PATH 的 SQLite 旁路文件中（行号即向量文件中的槽位），每次写入只增删改涉及的行
+    - 已删除的槽位累计到一定比例后压缩向量文件与行号
+    - user/category/title 维护编码数组，过滤条件向量化计算
+    """
+
+    name = 'local'
+    FILTER_FIELDS = ('user', 'category', 'title')
+    # 过滤后候选不超过该数量时直接精确检索
+    EXACT_LIMIT = 50000
+    # 压缩时每次搬移的行数
+    COMPACT_BATCH = 65536
+
+    def __init__(self, index_path: str = None, meta_path: str = None, save_interval: float = None,
+                 compact_ratio: float = None, compact_min: int = None):
+        self.index_path = index_path or INDEX_PATH
+        self.meta_path = meta_path or META_PATH
+        self.vec_path = osp.splitext(self.index_path)[0] + '.f32'
+        # 旧版本的 JSON 旁路文件：启动时导入 SQLite
+        base, ext = osp.splitext(self.meta_path)
+        self.db_path = base + '.sqlite3' if ext == '.json' else self.meta_path
+        self.legacy_path = base + '.json'
+        self.save_interval = LOCAL_BACKEND_CONFIG['save_interval'] if save_interval is None else save_interval
+        self.compact_ratio = compact_ratio or LOCAL_BACKEND_CONFIG['compact_ratio']
+        self.compact_min = LOCAL_BACKEND_CONFIG['compact_min'] if compact_min is None else compact_min
+        self.dim = 0
+        self.space = None
+        self.capacity = 0
+        self.size = 0
+        self.vectors: Optional[np.memmap] = None
+        self.db: Optional[sqlite3.Connection] = None
+        self.ids: List[Any] = []
+        self.payloads: List[Optional[Dict[str, Any]]] = []
+        self.alive = bytearray()
+        self.n_dead = 0
+        self.row_of: Dict[Any, int] = {}
+        self.codes: Dict[str, array] = {f: array('I') for f in self.FILTER_FIELDS}
+        self.code_maps: Dict[str, Dict[Any, int]] = {f: {} for f in self.FILTER_FIELDS}
+        self.hnsw = None
+        self._hnsw_rows = 0
+        self._stale = 0
+        # 向量文件每次变更递增；索引落盘时记录对应版本
+        self._version = 0
+        self._saved_version = 0
+        self._saved_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def location(self) -> str:
+        return osp.abspath(self.vec_path)
+
+    # ---- 文件与内存映射 ----
+    def _open(self, capacity: int) -> None:
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        nbytes = capacity * self.dim * 4
+        mode = 'r+b' if osp.exists(self.vec_path) else 'w+b'
+        with open(self.vec_path, mode) as f:
+            f.truncate(max(nbytes, 4))
+        self.vectors = np.memmap(self.vec_path, dtype='float32', mode='r+', shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _code(self, field: str, value: Any) -> int:
+        m = self.code_maps[field]
+        code = m.get(value)
+        if code is None:
+            code = len(m) + 1
+            m[value] = code
+        return code
+
+    def _connect(self) -> None:
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS points (row INTEGER PRIMARY KEY, pid TEXT NOT NULL, payload TEXT NOT NULL)")
+        self.db.commit()
+
+    def _meta(self) -> Dict[str, Any]:
+        return {k: json.loads(v) for k, v in self.db.execute("SELECT key, value FROM meta")}
+
+    def _set_meta(self, **values) -> None:
+        self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            [(k, json.dumps(v)) for k, v in values.items()])
+
+    def _import_legacy(self) -> None:
+        """导入旧版本的 JSON 旁路文件，导入后重命名保留"""
+        with open(self.legacy_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self._set_meta(dim=meta['dim'], space=meta.get('space'), size=len(meta['ids']), version=0)
+        self.db.executemany("INSERT INTO points (row, pid, payload) VALUES (?, ?, ?)", [
+            (row, json.dumps(pid), json.dumps(payload, ensure_ascii=False, default=str))
+            for row, (pid, payload) in enumerate(zip(meta['ids'], meta['payloads'])) if payload is not None
+        ])
+        self.db.commit()
+        os.replace(self.legacy_path, self.legacy_path + '.bak')
+        print(f"[LocalBackend] 已将 {self.legacy_path} 导入 {self.db_path}")
+
+    def _load(self) -> None:
+        meta = self._meta()
+        if meta['dim'] != self.dim:
+            raise RuntimeError(f"本地向量库维度 {meta['dim']} 与 embedder 维度 {self.dim} 不一致")
+        if self.space and meta.get('space') and meta['space'] != self.space:
+            raise RuntimeError(f"本地向量库的向量空间 {meta['space']} 与当前配置 {self.space} 不一致")
+        self.size = meta['size']
+        self._version = meta.get('version', 0)
+        self.ids = [None] * self.size
+        self.payloads = [None] * self.size
+        for row, pid, payload in self.db.execute("SELECT row, pid, payload FROM points"):
+            self.ids[row] = json.loads(pid)
+            self.payloads[row] = json.loads(payload)
+            self.row_of[self.ids[row]] = row
+        self.alive = bytearray(p is not None for p in self.payloads)
+        self.n_dead = self.size - len(self.row_of)
+        for payload in self.payloads:
+            for field in self.FILTER_FIELDS:
+                self.codes[field].append(self._code(field, (payload or {}).get(field)))
+        self._open(max(self.size, 1024))
+
+    def _build_hnsw(self) -> None:
+        if faiss is None:
+            return
+        self.hnsw = faiss.IndexHNSWFlat(self.dim, 32, faiss.METRIC_INNER_PRODUCT)
+        if self.size:
+            self.hnsw.add(np.ascontiguousarray(self.vectors[:self.size]))
+        self._hnsw_rows = self.size
+        self._stale = 0
+
+    def _save_index(self) -> None:
+        """向量文件刷盘，HNSW 索引写入临时文件后替换，并记录对应的版本"""
+        self.vectors.flush()
+        if self.hnsw is not None:
+            tmp = self.index_path + '.tmp'
+            faiss.write_index(self.hnsw, tmp)
+            os.replace(tmp, self.index_path)
+        self._set_meta(index_version=self._version)
+        self.db.commit()
+        self._saved_version = self._version
+        self._saved_at = time.monotonic()
+
+    async def _maybe_save(self) -> None:
+        # 在锁内调用；只在距上次落盘超过间隔时写，关闭时写最后一次
+        if self._version != self._saved_version and time.monotonic() - self._saved_at >= self.save_interval:
+            await asyncio.to_thread(self._save_index)
+
+    async def ensure(self, dim: int, space: Dict[str, Any] = None) -> None:
+        async with self._lock:
+            if self.vectors is not None:
+                return
+            self.dim = dim
+            self.space = space
+            os.makedirs(osp.dirname(self.db_path) or '.', exist_ok=True)
+            fresh = not osp.exists(self.db_path)
+            self._connect()
+            if fresh and osp.exists(self.legacy_path) and osp.exists(self.vec_path):
+                self._import_legacy()
+                fresh = False
+            if not fresh and osp.exists(self.vec_path):
+                self._load()
+                meta = self._meta()
+                if faiss is not None and osp.exists(self.index_path) and meta.get('index_version') == self._version:
+                    self.hnsw = faiss.read_index(self.index_path)
+                    self._hnsw_rows = self.hnsw.ntotal
+                    self._saved_version = self._version
+                else:
+                    # 索引未在最近一次写入后落盘（如进程异常退出），按向量文件重建
+                    self._build_hnsw()
+            else:
+                self.db.execute("DELETE FROM points")
+                self._set_meta(dim=dim, space=space, size=0, version=0)
+                self.db.commit()
+                self._open(1024)
+                self._build_hnsw()
+            print(f"[LocalBackend] 本地向量库: {self.vec_path}，已有 {len(self.row_of)} 条记录，HNSW={'on' if self.hnsw is not None else 'off'}")
+
+    # ---- 写入 ----
+    async def upsert(self, ids, vectors, payloads) -> None:
+        vecs = np.asarray(vectors, dtype='float32')
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms > 0, norms, 1.0)
+        async with self._lock:
+            records = []
+            for pid, vec, payload in zip(ids, vecs, payloads):
+                row = self.row_of.get(pid)
+                if row is None:
+                    if self.size == self.capacity:
+                        self._open(self.capacity * 2)
+                    row = self.size
+                    self.size += 1
+                    self.ids.append(pid)
+                    self.payloads.append(payload)
+                    self.alive.append(1)
+                    for field in self.FILTER_FIELDS:
+                        self.codes[field].append(self._code(field, payload.get(field)))
+                    self.row_of[pid] = row
+                else:
+                    # 覆盖已有点：HNSW 中的旧向量失效，累计到一定比例后重建
+                    self.payloads[row] = payload
+                    for field in self.FILTER_FIELDS:
+                        self.codes[field][row] = self._code(field, payload.get(field))
+                    self._stale += 1
+                self.vectors[row] = vec
+                records.append((row, json.dumps(pid), json.dumps(payload, ensure_ascii=False, default=str)))
+            if self.hnsw is not None:
+                if self._stale > max(1000, self.size // 10):
+                    self._build_hnsw()
+                elif self.size > self._hnsw_rows:
+                    self.hnsw.add(np.ascontiguousarray(self.vectors[self._hnsw_rows:self.size]))
+                    self._hnsw_rows = self.size
+            self._version += 1
+            await asyncio.to_thread(self._write_rows, records, [])
+            await self._maybe_save()
+
+    def _write_rows(self, upserts: List[Tuple[int, str, str]], deletes: List[int]) -> None:
+        if upserts:
+            self.db.executemany("INSERT OR REPLACE INTO points (row, pid, payload) VALUES (?, ?, ?)", upserts)
+        if len(deletes):
+            self.db.executemany("DELETE FROM points WHERE row = ?", [(int(r),) for r in deletes])
+        self._set_meta(size=self.size, version=self._version)
+        self.db.commit()
+
+    async def _delete_rows(self, rows) -> None:
+        # 在锁内调用：标记槽位失效并删除对应记录，失效槽位过多时压缩
+        for row in rows:
+            self.alive[row] = 0
+            self.row_of.pop(self.ids[row], None)
+            self.payloads[row] = None
+        self.n_dead += len(rows)
+        await asyncio.to_thread(self._write_rows, [], rows)
+        if self.n_dead >= max(self.compact_min, self.compact_ratio * self.size):
+            await self._compact()
+
+    def _compact_prepare(self):
+        """
+        在线程中准备压缩结果（期间检索仍读原文件）：存活的行依次写入新的向量文件，重新编号并重建 HNSW，
+        SQLite 记录在未提交的事务中改写
+        """
+        rows = np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8)[:self.size])
+        capacity = max(len(rows), 1024)
+        vectors = np.memmap(self.vec_path + '.compact', dtype='float32', mode='w+', shape=(capacity, self.dim))
+        for start in range(0, len(rows), self.COMPACT_BATCH):
+            part = rows[start:start + self.COMPACT_BATCH]
+            vectors[start:start + len(part)] = self.vectors[part]
+        vectors.flush()
+        hnsw = None
+        if faiss is not None:
+            hnsw = faiss.IndexHNSWFlat(self.dim, 32, faiss.METRIC_INNER_PRODUCT)
+            if len(rows):
+                hnsw.add(np.ascontiguousarray(vectors[:len(rows)]))
+        del vectors
+        ids = [self.ids[r] for r in rows]
+        payloads = [self.payloads[r] for r in rows]
+        codes = {f: array('I', (self.codes[f][r] for r in rows)) for f in self.FILTER_FIELDS}
+        self.db.execute("DELETE FROM points")
+        self.db.executemany("INSERT INTO points (row, pid, payload) VALUES (?, ?, ?)", [
+            (row, json.dumps(pid), json.dumps(payload, ensure_ascii=False, default=str))
+            for row, (pid, payload) in enumerate(zip(ids, payloads))
+        ])
+        return capacity, ids, payloads, codes, hnsw
+
+    async def _compact(self) -> None:
+        # 在锁内调用：线程中准备好新文件后，在事件循环中一次性替换，检索不会看到中间状态
+        capacity, ids, payloads, codes, hnsw = await asyncio.to_thread(self._compact_prepare)
+        print(f"[LocalBackend] 压缩本地向量库: {self.size} -> {len(ids)} 个槽位")
+        self.vectors.flush()
+        del self.vectors
+        os.replace(self.vec_path + '.compact', self.vec_path)
+        self.vectors = np.memmap(self.vec_path, dtype='float32', mode='r+', shape=(capacity, self.dim))
+        self.capacity = capacity
+        self.size = len(ids)
+        self.ids, self.payloads, self.codes = ids, payloads, codes
+        self.alive = bytearray(b'\x01' * self.size)
+        self.row_of = {pid: row for row, pid in enumerate(ids)}
+        self.n_dead = 0
+        self.hnsw, self._hnsw_rows, self._stale = hnsw, self.size, 0
+        self._version += 1
+        self._set_meta(size=self.size, version=self._version)
+        self.db.commit()
+        await asyncio.to_thread(self._save_index)
+
+    async def delete(self, filters) -> None:
+        async with self._lock:
+            rows = np.flatnonzero(self._mask(filters))
+            if len(rows):
+                await self._delete_rows(rows)
+
+    async def delete_ids(self, ids, filters=None) -> None:
+        async with self._lock:
+            rows = [row for row in (self.row_of.get(pid) for pid in ids) if row is not None]
+            if rows:
+                await self._delete_rows(rows)
+
+    # ---- 查询 ----
+    def _mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        mask = np.frombuffer(self.alive, dtype=np.uint8)[:self.size] == 1
+        for field, value in _active(filters).items():
+            values = set(value) if isinstance(value, (list, tuple, set)) else {value}
+            if field in self.codes:
+                codes = [self.code_maps[field][v] for v in values if v in self.code_maps[field]]
+                if not codes:
+                    return np.zeros(self.size, dtype=bool)
+                mask &= np.isin(np.frombuffer(self.codes[field], dtype=np.uint32)[:self.size], codes)
+            else:
+                mask &= np.array([(p or {}).get(field) in values for p in self.payloads[:self.size]], dtype=bool)
+        return mask
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray, exclude: Optional[List[str]] = None) -> List[Hit]:
+        if exclude:
+            return [(self.ids[r], float(s), {k: v for k, v in self.payloads[r].items() if k not in exclude})
+                    for r, s in zip(rows, scores)]
+        return [(self.ids[r], float(s), self.payloads[r]) for r, s in zip(rows, scores)]
+
+    async def query(self, vector, filters, limit, exclude=None) -> List[Hit]:
+        if not self.size:
+            return []
+        q = np.asarray(vector, dtype='float32')
+        q = q / (np.linalg.norm(q) or 1.0)
+        mask = self._mask(filters)
+        n_match = int(mask.sum())
+        if not n_match:
+            return []
+        if self.hnsw is not None and n_match > self.EXACT_LIMIT:
+            # 过滤后仍有大量候选时走 HNSW，按过滤比例放大候选数后再精确重排
+            k = min(self._hnsw_rows, max(limit * 4, int(limit * self.size / n_match) * 2))
+            _, cand = self.hnsw.search(q[None, :], k)
+            cand = cand[0][cand[0] >= 0]
+            cand = cand[mask[cand]]
+            if len(cand) >= limit:
+                scores = self.vectors[cand] @ q
+                order = np.argsort(-scores)[:limit]
+                return self._hits(cand[order], scores[order], exclude)
+        rows = np.flatnonzero(mask)
+        scores = self.vectors[rows] @ q
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores)
+        return self._hits(rows[order], scores[order], exclude)
+
+    async def count(self, filters, exact: bool = True) -> int:
+        return int(self._mask(filters).sum()) if self.size else 0
+
+    async def point_ids(self, filters) -> List[Any]:
+        return [self.ids[r] for r in np.flatnonzero(self._mask(filters))] if self.size else []
+
+    async def retrieve(self, ids, filters=None, fields=None) -> Dict[Any, Dict[str, Any]]:
+        res = {}
+        for pid in ids:
+            row = self.row_of.get(pid)
+            if row is not None:
+                payload = self.payloads[row]
+                res[pid] = {k: payload[k] for k in fields if k in payload} if fields else payload
+        return res
+
+    async def scroll(self, batch_size: int = 512):
+        batch = []
+        for pid, payload in zip(self.ids, self.payloads):
+            if payload is None:
+                continue
+            batch.append((pid, payload))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self.vectors is not None and self._version != self._saved_version:
+                await asyncio.to_thread(self._save_index)
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+def create_backend(name: str = None) -> VectorBackend:
+    name = (name or VECTOR_BACKEND).lower()
+    if name == 'local':
+        return LocalBackend()
+    if name == 'qdrant':
+        return QdrantBackend()
+    raise ValueError(f"未知的向量后端: {name}")
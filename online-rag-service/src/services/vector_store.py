@@ -1,226 +1,343 @@
+import asyncio
+import hashlib
 import json
-import os
-import threading
-import time
-from typing import Dict, List, Any, Optional
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, SearchRequest, Filter, FieldCondition, MatchValue
 
-# 导入配置
-from config import QDRANT_CONFIG
+try:
+    from rag_service.config import COUNT_CONFIG, LAZY_PAYLOAD_CONFIG
+    from rag_service.services.vector_backends import VectorBackend, create_backend
+    from rag_service.services.counters import CountIndex
+    from rag_service.services.tenant_locks import TenantLocks
+    from rag_service.services.projection import vector_space
+except ImportError:
+    from config import COUNT_CONFIG, LAZY_PAYLOAD_CONFIG
+    from services.vector_backends import VectorBackend, create_backend
+    from services.counters import CountIndex
+    from services.tenant_locks import TenantLocks
+    from services.projection import vector_space
+
+
+# 点 ID 的 UUIDv5 命名空间，保证同一 chunk 在任何进程中得到相同的 ID
+POINT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'online-rag-service/knowledge')
+
+
+def point_id(meta: Dict[str, Any], text: str) -> str:
+    """
+    由 (user, title, 来源记录ID 或 raw 文档 doc_id, 内容哈希) 生成确定性点 ID；不含 chunk 序号，
+    文档中插入/删除 chunk 不改变其余 chunk 的 ID，同一文档内容相同的 chunk 只保留一个点
+    """
+    digest = hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+    source = meta.get('id') or (f"doc:{meta['doc_id']}" if meta.get('doc_id') else '')
+    key = '\x00'.join(str(x) for x in (meta.get('user') or '', meta.get('title') or '', source, digest))
+    return str(uuid.uuid5(POINT_NAMESPACE, key))
 
 
 class VectorStore:
-    def __init__(self, embedder, user_id: Optional[str] = None):
+    def __init__(self, embedder, user_id: Optional[str] = None, backend: Optional[VectorBackend] = None):
         self.embedder = embedder
-        self.lock = threading.Lock()
+        # 按用户加锁：同一用户的写入/删除保持顺序，不同用户并行
+        self.locks = TenantLocks()
+        # 按文档加锁：同一文档"写入新 chunk + 清理旧 chunk"整体串行，并发入库同一文档时
+        # 一方的清理不会删掉另一方刚写入的 chunk
+        self.doc_locks = TenantLocks()
         # 保留user_id参数以便在元数据中使用，但不再用于集合命名
         self.user_id = user_id
-        
-        # 使用Qdrant服务
-        self.client = QdrantClient(
-            host=QDRANT_CONFIG['host'],
-            port=QDRANT_CONFIG['port']
-        )
-        
-        # 所有用户共享同一个集合
-        self.collection_name = QDRANT_CONFIG.get('collection_name', 'knowledge_base')
-        print(f"[VectorStore] 使用共享集合: {self.collection_name}")
-        
-        # 确保集合存在
-        self._ensure_collection()
 
+        # 向量存储后端：默认按配置选择 Qdrant 或本地后端
+        self.backend = backend or create_backend()
+        print(f"[VectorStore] 使用向量后端: {self.backend.name}")
 
-    def _ensure_collection(self):
-        # 创建集合（如果不存在）
-        try:
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config={"size": self.embedder.dimension(), "distance": "Cosine"}
-            )
-            print(f"[VectorStore] 已创建集合: {self.collection_name}")
-        except Exception as e:
-            # 集合可能已存在
-            print(f"[VectorStore] 集合 {self.collection_name} 可能已存在或创建失败: {str(e)}")
+        # 异步后端无法在构造函数中初始化，首次使用时确保集合存在
+        self._ready = False
+        self._ready_lock = asyncio.Lock()
+
+        # 入库/删除监听器（如进程内关键词索引），需实现 on_add(points) 与 on_delete(user, title, category, source_ids, point_ids)，
+        # 可选实现 on_update(points) 处理已有点的 payload 变更（未实现时按 on_add 处理）
+        self.listeners = []
+
+        # 按 (user, category) 缓存的计数，随入库/删除增量维护
+        self.counts = CountIndex()
+        self.add_listener(self.counts)
 
+        # 延迟检索（lazy=True）时不从后端取回的 payload 字段，由 hydrate 只为最终结果补全
+        self.lazy_fields = LAZY_PAYLOAD_CONFIG['fields'] if LAZY_PAYLOAD_CONFIG['enabled'] else []
 
-    def count(self, user: str = None, category: str = None) -> int:
+    def add_listener(self, listener) -> None:
+        self.listeners.append(listener)
+
+
+    async def _ensure_collection(self):
+        if self._ready:
+            return
+        async with self._ready_lock:
+            if self._ready:
+                return
+            # 向量空间（模型、维度、投影）随集合配置保存，已有集合不一致时拒绝写入与查询
+            await self.backend.ensure(self.embedder.dimension(), vector_space(self.embedder))
+            self._ready = True
+
+    def space_key(self) -> str:
+        """向量空间（模型、维度、投影）与存储位置（后端、集合或索引路径）的指纹，换集合或换向量空间后随之变化"""
+        desc = dict(vector_space(self.embedder), backend=self.backend.name, location=self.backend.location)
+        return hashlib.sha256(json.dumps(desc, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+    async def init(self) -> None:
+        """启动时预先创建集合、payload 索引与分片，避免首个请求承担初始化开销"""
+        await self._ensure_collection()
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        # 优先使用异步 embedding；同步 Embedder 放到线程中执行
+        if hasattr(self.embedder, 'aencode'):
+            vecs = await self.embedder.aencode(texts)
+        else:
+            vecs = await asyncio.to_thread(self.embedder.encode, texts)
+        return np.asarray(vecs, dtype='float32')
+
+
+    async def count(self, user: str = None, category: str = None, fresh: bool = False) -> int:
+        """返回点数；默认读取增量维护的计数，fresh=True 时直接向后端精确计数"""
+        await self._ensure_collection()
+        filters = {'user': user, 'category': category}
         try:
-            # 构建过滤条件
-            conditions = []
-            if user:
-                conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
-            if category:
-                conditions.append(FieldCondition(key="category", match=MatchValue(value=category)))
-            
-            # 如果有过滤条件，使用scroll方法进行过滤计数
-            if conditions:
-                filters = Filter(must=conditions)
-                # 使用scroll获取所有匹配的点，然后计算数量
-                results = self.client.scroll(
-                    collection_name=self.collection_name,
-                    scroll_filter=filters,
-                    limit=10000,  # 设置一个较大的限制
-                    with_payload=False,
-                    with_vectors=False
-                )
-                # scroll返回的是元组 (points, next_page_offset)，points是匹配的点列表
-                points = results[0]
-                return len(points)
-            else:
-                # 无过滤条件，返回所有记录数
-                return self.client.count(collection_name=self.collection_name).count
+            if fresh:
+                return await self.backend.count(filters, exact=True)
+            return await self.counts.get(user, category, lambda: self.backend.count(filters, exact=COUNT_CONFIG['exact']))
         except Exception as e:
             print(f"[VectorStore] count方法出错: {e}")
             return 0
 
-    def add_texts(self, texts: List[str], metas: List[Dict[str, Any]]):
+    def lock_documents(self, user: Optional[str], doc_ids: Iterable[Any] = (), source_ids: Iterable[Any] = ()):
+        """持有若干文档（raw 文档 doc_id / 数据库记录 id）的锁，跨越一次入库的写入与 delete_stale"""
+        prefix = user or ''
+        keys = [f"{prefix}\x00doc\x00{d}" for d in doc_ids] + [f"{prefix}\x00id\x00{s}" for s in source_ids]
+        return self.doc_locks.hold(keys)
+
+    async def add_texts(self, texts: List[str], metas: List[Dict[str, Any]]) -> int:
+        """幂等写入：点 ID 由内容确定，已存在且 payload 未变化的 chunk 跳过 embedding，返回实际写入条数"""
         assert len(texts) == len(metas), 'texts 与 metas 长度需一致'
-        
+        await self._ensure_collection()
+
         # 记录数据存储的详细信息
         print(f"[VectorStore] 开始添加数据: {len(texts)} 条记录")
         print(f"[VectorStore] 向量维度: {self.embedder.dimension()}")
-        print(f"[VectorStore] Qdrant集合: {self.collection_name}")
-        
+
         # 记录部分元数据样例用于调试
         if metas:
             print(f"[VectorStore] 元数据示例: {json.dumps(metas[0], ensure_ascii=False, indent=2)}")
             if len(metas) > 1:
                 print(f"[VectorStore] 最后一条元数据示例: {json.dumps(metas[-1], ensure_ascii=False, indent=2)}")
-        
-        # 从元数据中提取用户信息（只需要第一个用户信息用于统计）
-        user = None
-        if metas and 'user' in metas[0]:
-            user = metas[0]['user']
-        
-        vecs = self.embedder.encode(texts)
-        vecs = np.asarray(vecs, dtype='float32')
-        
-        with self.lock:
-            # 使用时间戳+索引作为唯一ID，避免ID冲突
-            timestamp = int(time.time() * 1000)
-            
-            # 准备要添加的点
-            points = []
-            for i, (vec, meta) in enumerate(zip(vecs, metas)):
-                # 使用时间戳+索引作为唯一ID，确保不重复
-                point_id = timestamp + i
-                points.append(PointStruct(id=point_id, vector=vec.tolist(), payload=meta))
-            
-            # 添加到Qdrant
-            self.client.upsert(collection_name=self.collection_name, points=points)
-            
-            # 记录添加后的索引大小（传递用户参数）
-            after_count = self.count(user=user)
-            print(f"[VectorStore] 索引更新: 当前共有 {after_count} 条记录")
-        
-            # 保存更改（Qdrant自动保存）
-            print(f"[VectorStore] 数据已保存到Qdrant")
-
-    def search(self, q: str, topK: int = 5, category: Optional[str] = None, user: str = None) -> List[Dict]:
-        """
-        在Qdrant中检索相似文本 (使用query_points方法)
-        """
-        # 生成查询向量
-        qv = self.embedder.encode([q])
-        qv = np.asarray(qv, dtype='float32')
-        
-        # 构建过滤条件
-        conditions = []
-        # 添加用户过滤条件，确保用户只能访问自己的数据
-        if user:
-            conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
-        # 添加类别过滤条件
-        if category:
-            conditions.append(FieldCondition(key="category", match=MatchValue(value=category)))
-        
-        filters = Filter(must=conditions) if conditions else None
-
-        
-        # 使用query_points方法进行向量相似度搜索
-        results = self.client.query_points(
-            collection_name=self.collection_name,
-            query=qv[0].tolist(),
-            query_filter=filters,
-            limit=topK,
-            with_payload=True,
-            with_vectors=False
-        )
-        
-        # 格式化结果，按相似度分数排序
+
+        # 同一 ID 只保留最后一条
+        points: Dict[str, Any] = {}
+        for text, meta in zip(texts, metas):
+            points[point_id(meta, text)] = (text, meta)
+
+        # 查询已存在的点，内容与 payload 都未变化的不再 embedding
+        existing = await self._existing({pid: meta for pid, (_, meta) in points.items()})
+        todo = [(pid, text, meta) for pid, (text, meta) in points.items() if existing.get(pid) != meta]
+        skipped = len(points) - len(todo)
+        if skipped:
+            print(f"[VectorStore] 跳过 {skipped} 条未变化的记录")
+        if not todo:
+            return 0
+
+        vecs = await self._encode([text for _, text, _ in todo])
+
+        async with self.locks.hold(meta.get('user') for _, _, meta in todo):
+            # embedding 期间其他写入可能已写入同一 chunk：在锁内重新查询，按写入前的状态区分新增与更新，
+            # 已由其他写入写成相同 payload 的点不再重复写入，监听者（如计数）不会重复计入
+            existing = await self._existing({pid: meta for pid, _, meta in todo})
+            keep = [i for i, (pid, _, meta) in enumerate(todo) if existing.get(pid) != meta]
+            if not keep:
+                return 0
+            ids = [todo[i][0] for i in keep]
+            metas = [todo[i][2] for i in keep]
+            # 确定性 ID 的 upsert 是幂等的，并发写入同一 chunk 只会得到同一个点
+            await self.backend.upsert(ids, vecs[keep], metas)
+            added = [(pid, meta) for pid, meta in zip(ids, metas) if pid not in existing]
+            updated = [(pid, meta) for pid, meta in zip(ids, metas) if pid in existing]
+            for listener in self.listeners:
+                if added:
+                    listener.on_add(added)
+                if updated:
+                    getattr(listener, 'on_update', listener.on_add)(updated)
+            print(f"[VectorStore] 已写入 {len(ids)} 条记录")
+        return len(ids)
+
+    async def _existing(self, metas: Dict[str, Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+        """按用户分组查询已存在的点，返回 {point_id: payload}"""
+        existing: Dict[Any, Dict[str, Any]] = {}
+        by_user: Dict[Any, List[str]] = {}
+        for pid, meta in metas.items():
+            by_user.setdefault(meta.get('user'), []).append(pid)
+        for user, pids in by_user.items():
+            existing.update(await self.backend.retrieve(pids, {'user': user}))
+        return existing
+
+    def _format_hits(self, hits, lazy: bool = False) -> List[Dict]:
+        # 格式化结果，按相似度分数降序排序，确保最高相似度的结果排在前面；
+        # 延迟检索的结果带上点 ID（_point_id），省略了字段的标记 _lazy，供融合去重与 hydrate 使用
         res = []
-        # query_points返回的对象包含points属性
-        points_list = results.points 
-        
-        for result in points_list:
-            item = dict(result.payload)
-            item['score_vec'] = float(result.score)
+        for pid, score, payload in hits:
+            item = dict(payload)
+            item['score_vec'] = score
+            if lazy:
+                item['_point_id'] = pid
+                if self.lazy_fields:
+                    item['_lazy'] = True
             res.append(item)
-            
-        # 按相似度分数降序排序，确保最高相似度的结果排在前面
         res.sort(key=lambda x: x['score_vec'], reverse=True)
-            
+        return res
+
+    async def search(self, q: str, topK: int = 5, category: Optional[str] = None, user: str = None,
+                     lazy: bool = False) -> List[Dict]:
+        """
+        检索相似文本，user 过滤确保用户只能访问自己的数据。
+        lazy=True 时不取回 lazy_fields（如 content），结果需经 hydrate 补全后再返回给调用方
+        """
+        await self._ensure_collection()
+        # 生成查询向量
+        qv = await self._encode([q])
+
+        hits = await self.backend.query(qv[0], {'user': user, 'category': category}, topK,
+                                        exclude=self.lazy_fields if lazy else None)
+        res = self._format_hits(hits, lazy)
+
         print(f"[VectorStore] 搜索查询: '{q}'，返回 {len(res)} 条结果")
         if res:
             print(f"[VectorStore] 最高相似度分数: {res[0]['score_vec']:.4f}")
-            
+
+        return res
+
+    async def search_batch(self, queries: List[Tuple[str, int, Optional[str]]], user: str = None,
+                           lazy: bool = False) -> List[List[Dict]]:
+        """
+        批量检索：queries 为 [(查询文本, topK, category), ...]，所有查询一次 embedding 调用、
+        一次批量向量查询，返回与 queries 顺序一致的结果；lazy 同 search
+        """
+        if not queries:
+            return []
+        await self._ensure_collection()
+        qv = await self._encode([q for q, _, _ in queries])
+        hits = await self.backend.query_batch(
+            qv, [{'user': user, 'category': category} for _, _, category in queries], [k for _, k, _ in queries],
+            exclude=self.lazy_fields if lazy else None
+        )
+        res = [self._format_hits(h, lazy) for h in hits]
+        print(f"[VectorStore] 批量搜索: {len(queries)} 条查询，共返回 {sum(len(r) for r in res)} 条结果")
         return res
-    
-    
-    def delete_by_title(self, title: str, user: str = None) -> int:
+
+    async def hydrate(self, items: List[Dict], user: str = None) -> List[Dict]:
+        """
+        为延迟检索得到的结果补全省略的字段：一次按 ID 批量读取，覆盖融合时从关键词结果合并来的同名字段；
+        无论成功与否都移除内部标记。原地修改并返回 items
+        """
+        try:
+            pids = [item['_point_id'] for item in items if item.get('_lazy')]
+            if pids:
+                payloads = await self.backend.retrieve(pids, {'user': user}, fields=self.lazy_fields)
+                for item in items:
+                    if item.get('_lazy'):
+                        item.update(payloads.get(item['_point_id'], {}))
+        finally:
+            for item in items:
+                item.pop('_lazy', None)
+                item.pop('_point_id', None)
+        return items
+
+
+    async def delete_by_title(self, title: str, user: str = None) -> int:
         """根据标题直接删除 (优化版)"""
         print(f"[VectorStore] 开始删除标题为 '{title}' 的记录，用户: {user}")
         if not title:
             return 0
-            
-        with self.lock:
-            # 1. 构建过滤器
-            conditions = [FieldCondition(key="title", match=MatchValue(value=title))]
-            # 添加用户过滤条件，确保用户只能删除自己的数据
-            if user:
-                conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
-            
-            filter = Filter(must=conditions)
-            
-            # 2. 直接按条件删除 (原子操作，更快)
-            # 注意：delete 操作通常返回 UpdateResult，不直接包含删除行数
-            # 如果非常需要知道删除了多少条，必须先 count，但这会降低性能。
-            # 这里我们假设只要不报错就是成功。
+        await self._ensure_collection()
+
+        async with self.locks.scope(user):
+            # 直接按条件删除，添加用户过滤条件，确保用户只能删除自己的数据
+            # 注意：删除操作不直接返回删除行数，这里假设只要不报错就是成功
             try:
-                self.client.delete(
-                    collection_name=self.collection_name,
-                    points_selector=filter
-                    #points=Filter(must=[FieldCondition(key=’rand_number’, range=Range(gte=0.7))])
-                )
+                await self.backend.delete({'title': title, 'user': user})
                 print(f"[VectorStore] 已执行删除标题 '{title}' 的操作")
+                for listener in self.listeners:
+                    listener.on_delete(user, title=title)
                 return 1 # 返回 1 表示操作成功提交
             except Exception as e:
                 print(f"[VectorStore] 删除失败: {e}")
                 return 0
 
-    def delete_by_category(self, category: str, user: str = None) -> int:
+    async def delete_by_category(self, category: str, user: str = None) -> int:
         """根据类别直接删除 (优化版)"""
         print(f"[VectorStore] 开始删除类别为 '{category}' 的记录，用户: {user}")
         if not category:
             return 0
-            
-        with self.lock:
-            conditions = [FieldCondition(key="category", match=MatchValue(value=category))]
-            # 添加用户过滤条件，确保用户只能删除自己的数据
-            if user:
-                conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
-            
-            filter = Filter(must=conditions)
-            
+        await self._ensure_collection()
+
+        async with self.locks.scope(user):
             try:
-                self.client.delete(
-                    collection_name=self.collection_name,
-                    points_selector=filter
-                )
+                await self.backend.delete({'category': category, 'user': user})
                 print(f"[VectorStore] 已执行删除类别 '{category}' 的操作")
+                for listener in self.listeners:
+                    listener.on_delete(user, category=category)
                 return 1
             except Exception as e:
                 print(f"[VectorStore] 删除失败: {e}")
-                return 0
\ No newline at end of file
+                return 0
+
+    async def delete_by_source_ids(self, source_ids: List[Any], user: str = None) -> int:
+        """删除来源于指定数据库记录（payload.id）的全部 chunk，返回删除的点数"""
+        if not source_ids:
+            return 0
+        await self._ensure_collection()
+
+        filters = {'id': list(source_ids), 'user': user}
+        async with self.locks.scope(user):
+            try:
+                # 在锁内先精确计数，返回值是实际删除的点数而不是记录数
+                n = await self.backend.count(filters, exact=True)
+                await self.backend.delete(filters)
+                for listener in self.listeners:
+                    listener.on_delete(user, source_ids=source_ids)
+                return n
+            except Exception as e:
+                print(f"[VectorStore] 删除失败: {e}")
+                return 0
+
+    async def delete_stale(self, keep_ids, user: str = None, doc_id: str = None, source_ids: List[Any] = None) -> int:
+        """
+        重新入库后清理旧 chunk：给出 source_ids 时范围为这些数据库记录的 chunk，否则为 user 下 doc_id 文档的 chunk；
+        删除范围内不在 keep_ids 中的点，返回删除条数（两者都未给出时不清理）
+        """
+        if source_ids:
+            filters = {'user': user, 'id': list(source_ids)}
+        elif doc_id:
+            filters = {'user': user, 'doc_id': doc_id}
+        else:
+            return 0
+        await self._ensure_collection()
+
+        async with self.locks.scope(user):
+            try:
+                keep = set(keep_ids)
+                stale = [pid for pid in await self.backend.point_ids(filters) if pid not in keep]
+                if stale:
+                    await self.backend.delete_ids(stale, {'user': user})
+                    for listener in self.listeners:
+                        listener.on_delete(user, point_ids=stale)
+                    print(f"[VectorStore] 已清理 {len(stale)} 条旧 chunk，用户: {user}")
+                return len(stale)
+            except Exception as e:
+                print(f"[VectorStore] 清理旧 chunk 失败: {e}")
+                return 0
+
+    async def iter_points(self, batch_size: int = 512):
+        """分页遍历全部点，每批产出 [(point_id, payload), ...]"""
+        await self._ensure_collection()
+        async for batch in self.backend.scroll(batch_size):
+            yield batch
+
+    async def close(self) -> None:
+        await self.backend.close()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批处理 Embedder：并发的单条查询合并为一次调用且各自拿回自己的向量，大批量输入拆分后按输入顺序拼接、
+并发数不超过上限，底层调用出错时异常传递给合并批次中的每个调用方（异步与同步路径各测一遍）
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.batching_embedder import BatchingEmbedder
+
+
+def vector(text: str) -> list:
+    """每条文本对应可辨认的向量：('t12' -> [12, 1])"""
+    return [float(text[1:]), 1.0]
+
+
+class RecordingEmbedder:
+    """记录每次调用的文本与最大并发数，可设置为抛出异常"""
+
+    model_name = 'recording'
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def dimension(self) -> int:
+        return 2
+
+    def _enter(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _result(self, texts):
+        with self._lock:
+            self.active -= 1
+        if self.fail:
+            raise RuntimeError('embedding 服务不可用')
+        return np.array([vector(t) for t in texts], dtype='float32')
+
+    async def aencode(self, texts):
+        self._enter(texts)
+        await asyncio.sleep(self.delay)
+        return self._result(texts)
+
+    def encode(self, texts):
+        self._enter(texts)
+        time.sleep(self.delay)
+        return self._result(texts)
+
+
+def test_async_single_queries_coalesced():
+    async def main():
+        inner = RecordingEmbedder()
+        embedder = BatchingEmbedder(inner, max_batch=10, max_concurrency=2, window_ms=20)
+        texts = [f't{i}' for i in range(5)]
+        results = await asyncio.gather(*(embedder.aencode([t]) for t in texts))
+        assert len(inner.calls) == 1 and sorted(inner.calls[0]) == texts
+        for t, vecs in zip(texts, results):
+            assert vecs.shape == (1, 2) and vecs[0].tolist() == vector(t)
+        assert embedder.stats()['avg_coalesced_size'] == 5
+
+    asyncio.run(main())
+
+
+def test_async_split_keeps_order_and_concurrency():
+    async def main():
+        inner = RecordingEmbedder(delay=0.01)
+        embedder = BatchingEmbedder(inner, max_batch=3, max_concurrency=2, window_ms=20)
+        texts = [f't{i}' for i in range(10)]
+        vecs = await embedder.aencode(texts)
+        assert vecs.tolist() == [vector(t) for t in texts]
+        assert [len(c) for c in inner.calls] == [3, 3, 3, 1] and inner.max_active == 2
+
+    asyncio.run(main())
+
+
+def test_async_errors_reach_every_caller():
+    async def main():
+        embedder = BatchingEmbedder(RecordingEmbedder(fail=True), max_batch=10, max_concurrency=2, window_ms=20)
+        results = await asyncio.gather(*(embedder.aencode([f't{i}']) for i in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await embedder.aencode(['t1', 't2'])
+
+    asyncio.run(main())
+
+
+def test_sync_single_queries_coalesced():
+    inner = RecordingEmbedder()
+    embedder = BatchingEmbedder(inner, max_batch=10, max_concurrency=2, window_ms=50)
+    texts = [f't{i}' for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda t: embedder.encode([t]), texts))
+    assert sum(len(c) for c in inner.calls) == 4 and len(inner.calls) < 4
+    for t, vecs in zip(texts, results):
+        assert vecs[0].tolist() == vector(t)
+    assert embedder.encode([f't{i}' for i in range(25)]).tolist() == [vector(f't{i}') for i in range(25)]
+
+
+def test_sync_errors_reach_every_caller():
+    embedder = BatchingEmbedder(RecordingEmbedder(fail=True), max_batch=10, max_concurrency=2, window_ms=50)
+
+    def call(t):
+        try:
+            embedder.encode([t])
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(call, ['t1', 't2', 't3']))
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+if __name__ == "__main__":
+    test_async_single_queries_coalesced()
+    test_async_split_keeps_order_and_concurrency()
+    test_async_errors_reach_every_caller()
+    test_sync_single_queries_coalesced()
+    test_sync_errors_reach_every_caller()
+    print("OK")
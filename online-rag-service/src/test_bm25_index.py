@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试进程内 BM25 关键词索引：分词、按用户隔离与类别过滤、覆盖写入、各种删除方式以及压缩后结果不变
+"""
+
+import os
+import sys
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.bm25_index import BM25Index, tokenize
+
+
+def point(key, content, user='u', category='a', title='t', source_id=None):
+    payload = {'user': user, 'category': category, 'title': title, 'content': content}
+    if source_id is not None:
+        payload['id'] = source_id
+    return key, payload
+
+
+def keys(results):
+    return [r['_point_id'] for r in results]
+
+
+def test_tokenize():
+    assert tokenize('向量检索') == ['向量', '量检', '检索']
+    assert tokenize('库') == ['库']
+    # 全角字母数字归一化并转小写，标点不产生词项
+    assert tokenize('ＲＡＧ Service, v2!') == ['rag', 'service', 'v2']
+    assert tokenize('') == []
+
+
+def test_ranking_user_and_category():
+    index = BM25Index(k1=1.2, b=0.75)
+    index.on_add([
+        point('p1', '向量检索 向量检索 混合检索'),
+        point('p2', '关键词检索', category='b'),
+        point('p3', '今天天气不错'),
+        point('q1', '向量检索', user='other'),
+    ])
+    res = index.search('向量检索', 5, user='u')
+    assert keys(res) == ['p1', 'p2'] and res[0]['score_kw'] > res[1]['score_kw']
+    assert keys(index.search('向量检索', 5, category='b', user='u')) == ['p2']
+    assert index.search('向量检索', 5, category='missing', user='u') == []
+    assert keys(index.search('向量检索', 5, user='other')) == ['q1']
+    assert index.search('向量检索', 5, user='nobody') == []
+    assert index.search('，。', 5, user='u') == []
+    assert keys(index.search('检索', 1, user='u')) == ['p1']
+
+
+def test_update_replaces_document():
+    index = BM25Index()
+    index.on_add([point('p1', '旧的内容')])
+    index.on_add([point('p1', '新的文本')])
+    assert index.search('旧的', 5, user='u') == []
+    assert keys(index.search('文本', 5, user='u')) == ['p1']
+    assert index.stats()['docs'] == 1
+
+
+def test_delete_variants():
+    index = BM25Index()
+    index.on_add([
+        point('p1', '知识库内容', title='t1', source_id=1),
+        point('p2', '知识库内容', title='t2', category='b', source_id=2),
+        point('p3', '知识库内容', title='t3', source_id=3),
+        point('p4', '知识库内容', title='t4'),
+        point('q1', '知识库内容', user='other'),
+    ])
+    index.on_delete('u', title='t1')
+    index.on_delete('u', category='b')
+    index.on_delete('u', source_ids=[3])
+    assert keys(index.search('知识库', 5, user='u')) == ['p4']
+    index.on_delete('u', point_ids=['p4', 'missing'])
+    assert index.search('知识库', 5, user='u') == []
+    assert keys(index.search('知识库', 5, user='other')) == ['q1']
+
+
+def test_compaction_keeps_results():
+    index = BM25Index()
+    index.on_add([point(f'p{i}', f'文档{i} 知识库' if i % 3 else f'文档{i} 向量库') for i in range(3000)])
+    before = keys(index.search('向量库', 10, user='u'))
+    # 删除超过存活数的文档后触发压缩，倒排表只剩存活文档
+    index.on_delete('u', point_ids=[f'p{i}' for i in range(3000) if i % 3])
+    part = index._parts['u']
+    assert part.n_dead == 0 and len(part.keys) == 1000
+    assert keys(index.search('向量库', 10, user='u')) == before
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_ranking_user_and_category()
+    test_update_replaces_document()
+    test_delete_variants()
+    test_compaction_keeps_results()
+    print("OK")
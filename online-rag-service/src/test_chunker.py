@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试语义切分：边界情况、过小片段合并、重叠与超长文本的计数开销（使用字符估算计数，不依赖分词器）
+"""
+
+import os
+import re
+import sys
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.chunker import chunk_text, estimate_tokens, iter_chunks, split_sentences
+
+_CONTENT_RE = re.compile(r'[\w一-鿿]')
+
+
+def chunks(text, max_tokens=50, overlap=10, min_tokens=5):
+    return list(iter_chunks(text, max_tokens, overlap, count=estimate_tokens, min_tokens=min_tokens))
+
+
+def test_empty_text():
+    assert chunks('') == []
+    assert chunks('   \n\n  ') == []
+    assert chunks(None) == []
+
+
+def test_short_text_single_chunk():
+    assert chunks('你好，世界。') == ['你好，世界。']
+
+
+def test_no_punctuation_only_chunks():
+    # 长句按上限截断后句末标点不能单独成为 chunk
+    for text in ('一' * 50 + '。', '一' * 100 + '。', '字' * 20000 + '。', '一' * 49 + '。\n\n---'):
+        for c in chunks(text, overlap=0):
+            assert _CONTENT_RE.search(c), repr(c)
+
+
+def test_chunk_size_bounds():
+    text = '\n\n'.join('这是第%d段。' % i + '内容' * (i % 30) + '。' * (i % 3) for i in range(200))
+    for c in chunks(text):
+        assert estimate_tokens(c) <= 50 + 5, c
+
+
+def test_tiny_first_piece_merged_forward():
+    res = chunks('前言。\n\n' + '正文' * 24 + '。', overlap=0)
+    assert len(res) == 1 and res[0].startswith('前言。')
+
+
+def test_overlap_sentences():
+    sents = ['第%d句内容比较长一些。' % i for i in range(20)]
+    res = chunks(''.join(sents), max_tokens=40, overlap=12)
+    assert len(res) > 1
+    for prev, cur in zip(res, res[1:]):
+        # 下一个 chunk 以上一个 chunk 的末尾句子开头
+        first = next(s for s in sents if cur.startswith(s))
+        assert first in prev
+
+
+def test_all_sentences_kept():
+    text = '。'.join('句子%d' % i for i in range(300)) + '。'
+    joined = '\n'.join(chunks(text, overlap=0))
+    for s in split_sentences(text):
+        assert s.strip() in joined
+
+
+def test_latin_not_split_mid_word():
+    res = chunks('word ' * 400, overlap=0)
+    assert len(res) > 1
+    for c in res:
+        assert all(w == 'word' for w in c.split()), c
+
+
+def test_long_run_linear_counting():
+    # 超长无标点文本：计数的总字符数应与文本长度成线性，而不是每次截断都对剩余全文计数
+    counted = [0]
+
+    def count(text):
+        counted[0] += len(text)
+        return estimate_tokens(text)
+
+    text = '字' * 100000
+    res = list(iter_chunks(text, 500, 0, count=count, min_tokens=20))
+    assert ''.join(res) == text
+    assert counted[0] < 30 * len(text)
+
+
+def test_chunk_text_returns_list():
+    assert chunk_text('一句话。', 100, 10) == ['一句话。']
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+    print("OK")
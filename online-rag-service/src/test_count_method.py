@@ -4,6 +4,7 @@
 测试vector_store.py中的count方法修复
 """
 
+import asyncio
 import sys
 import os
 
@@ -13,7 +14,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from services.vector_store import VectorStore
 from services.embedder import Embedder
 
-def test_count_method():
+async def test_count_method():
     """测试count方法的修复效果"""
     print("=== 测试count方法修复 ===")
     
@@ -38,35 +39,35 @@ def test_count_method():
         {"user": "another_user", "category": "Technology", "title": "计算机视觉"}
     ]
     
-    vector_store.add_texts(test_texts, test_metas)
+    await vector_store.add_texts(test_texts, test_metas)
     print("   测试数据添加完成")
     
     # 1. 测试无过滤条件的count
     print("\n1. 测试无过滤条件的count...")
-    total_count = vector_store.count()
+    total_count = await vector_store.count()
     print(f"   总记录数: {total_count}")
     
     # 2. 测试按用户过滤的count
     print("\n2. 测试按用户过滤的count...")
-    test_user_count = vector_store.count(user="test_user")
+    test_user_count = await vector_store.count(user="test_user")
     print(f"   用户'test_user'的记录数: {test_user_count}")
     
     # 3. 测试按类别过滤的count
     print("\n3. 测试按类别过滤的count...")
-    ai_category_count = vector_store.count(category="AI")
+    ai_category_count = await vector_store.count(category="AI")
     print(f"   类别'AI'的记录数: {ai_category_count}")
     
     # 4. 测试同时按用户和类别过滤的count
     print("\n4. 测试同时按用户和类别过滤的count...")
-    combined_count = vector_store.count(user="test_user", category="AI")
+    combined_count = await vector_store.count(user="test_user", category="AI")
     print(f"   用户'test_user'且类别'AI'的记录数: {combined_count}")
     
     # 5. 测试不存在的用户和类别
     print("\n5. 测试不存在的用户和类别...")
-    non_existent_user_count = vector_store.count(user="non_existent_user")
+    non_existent_user_count = await vector_store.count(user="non_existent_user")
     print(f"   用户'non_existent_user'的记录数: {non_existent_user_count}")
     
-    non_existent_category_count = vector_store.count(category="non_existent_category")
+    non_existent_category_count = await vector_store.count(category="non_existent_category")
     print(f"   类别'non_existent_category'的记录数: {non_existent_category_count}")
     
     print("\n=== count方法测试完成 ===")
@@ -92,4 +93,4 @@ def test_count_method():
         return False
 
 if __name__ == "__main__":
-    test_count_method()
\ No newline at end of file
+    asyncio.run(test_count_method())
\ No newline at end of file
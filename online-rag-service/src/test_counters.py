@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量计数：新增、payload 更新、各种删除以及并发写入同一批 chunk 之后，
+增量维护的计数始终与向后端精确计数（count(fresh=True)）一致
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_backends import LocalBackend, QdrantBackend
+from services.vector_store import VectorStore
+
+SCOPES = [('u', None), ('u', 'a'), ('u', 'b'), (None, None), (None, 'a'), ('w', None)]
+
+
+class SlowEmbedder:
+    """按文本哈希生成确定性向量；每次 embedding 让出事件循环，使并发写入交错执行"""
+
+    model_name = 'hash'
+
+    def dimension(self) -> int:
+        return 16
+
+    async def aencode(self, texts):
+        await asyncio.sleep(0.001)
+        return np.stack([
+            np.frombuffer(hashlib.sha256(t.encode('utf-8')).digest()[:16], dtype=np.uint8).astype('float32') + 1
+            for t in texts
+        ])
+
+
+def metas(texts, user='u', category='a', source_id=None):
+    res = [{'title': 't', 'category': category, 'content': t, 'user': user} for t in texts]
+    if source_id is not None:
+        for meta in res:
+            meta['id'] = source_id
+    return res
+
+
+async def assert_counts(store: VectorStore):
+    for user, category in SCOPES:
+        cached = await store.count(user=user, category=category)
+        fresh = await store.count(user=user, category=category, fresh=True)
+        assert cached == fresh, f'{user}/{category}: 计数 {cached} != 实际 {fresh}'
+
+
+async def check_counts(backend):
+    store = VectorStore(SlowEmbedder(), backend=backend)
+    await assert_counts(store)  # 载入各范围的计数，之后的写入走增量维护
+
+    await store.add_texts(['甲', '乙', '丙'], metas(['甲', '乙', '丙']))
+    await store.add_texts(['丁'], metas(['丁'], user='w'))
+    await assert_counts(store)
+
+    # 类别变化：点数不变，类别计数随之变化
+    await store.add_texts(['乙'], metas(['乙'], category='b'))
+    await assert_counts(store)
+
+    # 并发写入同一批新 chunk：只有一方计为新增
+    texts = [f'并发{i}' for i in range(5)]
+    await asyncio.gather(*(store.add_texts(texts, metas(texts)) for _ in range(3)))
+    await assert_counts(store)
+    assert await store.count(user='u', fresh=True) == 8
+
+    await store.add_texts(['库记录'], metas(['库记录'], source_id=7))
+    await assert_counts(store)
+    await store.delete_by_source_ids([7], user='u')
+    await assert_counts(store)
+    await store.delete_by_category('b', user='u')
+    await assert_counts(store)
+    await store.delete_by_title('t', user='u')
+    await assert_counts(store)
+    assert await store.count(user='u') == 0 and await store.count() == 1
+    await store.close()
+
+
+def test_counts_qdrant():
+    asyncio.run(check_counts(QdrantBackend(client=AsyncQdrantClient(":memory:"))))
+
+
+def test_counts_local():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_counts(LocalBackend(os.path.join(tmp, 'index.faiss'), os.path.join(tmp, 'meta.json'))))
+
+
+if __name__ == "__main__":
+    test_counts_qdrant()
+    test_counts_local()
+    print("OK")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据库连接池的借出：健康检查失败换连接重试、超时或取消时连接归还、超龄连接回收
+（aiomysql 连接池替换为内存中的假连接池，不依赖 MySQL）
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.db import BORN_ATTR, DBPool
+
+
+class FakeConn:
+    def __init__(self, n, ping=None):
+        self.n = n
+        self.closed = False
+        self._ping = ping
+
+    async def ping(self, reconnect=True):
+        if self._ping is not None:
+            await self._ping(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    """与 aiomysql.Pool 相同的借出/归还语义：已关闭的连接归还后丢弃，借出时按需新建"""
+
+    def __init__(self, ping=None):
+        self.free, self.used, self.created = [], set(), 0
+        self.ping = ping
+
+    async def acquire(self):
+        if self.free:
+            conn = self.free.pop()
+        else:
+            self.created += 1
+            conn = FakeConn(self.created, self.ping)
+        self.used.add(conn)
+        return conn
+
+    def release(self, conn):
+        self.used.remove(conn)
+        if not conn.closed:
+            self.free.append(conn)
+
+
+def make_pool(ping=None, **kwargs):
+    pool = DBPool(minsize=1, maxsize=3, max_age=kwargs.pop('max_age', 0), acquire_timeout=kwargs.pop('acquire_timeout', 1))
+    pool._pool = FakePool(ping)
+    return pool
+
+
+def test_unhealthy_connection_is_replaced():
+    async def ping(conn):
+        if conn.n == 1:
+            raise ConnectionError('gone')
+
+    async def main():
+        pool = make_pool(ping)
+        async with pool.acquire() as conn:
+            assert conn.n == 2
+        assert pool.health_failures == 1
+        assert pool._pool.used == set() and [c.n for c in pool._pool.free] == [2]
+
+    asyncio.run(main())
+
+
+def test_timeout_and_cancel_release_connection():
+    async def ping(conn):
+        await asyncio.sleep(10)
+
+    async def main():
+        pool = make_pool(ping, acquire_timeout=0.05)
+        try:
+            async with pool.acquire():
+                raise AssertionError('不应借出')
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0)
+        assert pool.timeouts == 1 and pool._pool.used == set()
+
+        async def use():
+            async with pool.acquire():
+                pass
+
+        task = asyncio.create_task(use())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert pool._pool.used == set()
+        # ping 被取消的连接已关闭，不会回到空闲列表
+        assert pool._pool.free == []
+
+    asyncio.run(main())
+
+
+def test_expired_connection_is_recycled():
+    async def main():
+        pool = make_pool(max_age=60)
+        async with pool.acquire() as conn:
+            setattr(conn, BORN_ATTR, getattr(conn, BORN_ATTR) - 120)
+        async with pool.acquire() as conn:
+            assert conn.n == 2
+        assert pool.recycled == 1 and pool._pool.used == set()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_unhealthy_connection_is_replaced()
+    test_timeout_and_cancel_release_connection()
+    test_expired_connection_is_recycled()
+    print("OK")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据库同步：删除向量后重新同步能恢复，更换向量空间后不会因哈希未变而跳过，
+软删除的记录即使不在同步状态中也删除其向量，删除回调中的状态清除不在事件循环线程执行
+（MySQL 读取替换为内存数据，向量库使用 Qdrant 本地内存模式，不依赖外部服务）
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import db_sync
+from services.db_sync import DBSync, SyncState
+from services.vector_backends import QdrantBackend
+from services.vector_store import VectorStore
+
+
+class HashEmbedder:
+    """按文本哈希生成确定性向量"""
+
+    def __init__(self, model_name: str = 'hash'):
+        self.model_name = model_name
+
+    def dimension(self) -> int:
+        return 16
+
+    async def aencode(self, texts):
+        return np.stack([
+            np.frombuffer(hashlib.sha256(t.encode('utf-8')).digest()[:16], dtype=np.uint8).astype('float32') + 1
+            for t in texts
+        ])
+
+
+ROWS = [
+    {'id': i, 'title': f'标题{i}', 'category': 'a' if i < 3 else 'b', 'keywords': '', 'source': 'db',
+     'content': f'第{i}条知识的内容', 'updated_at': f'2024-01-01 00:00:0{i}', 'is_deleted': 0}
+    for i in range(1, 6)
+]
+
+
+async def fake_fetch_page(user, category, after, limit):
+    rows = [r for r in ROWS if (r['updated_at'], r['id']) > tuple(after) and (not category or r['category'] == category)]
+    return [dict(r) for r in rows[:limit]]
+
+
+def make_sync(state_path: str, model_name: str = 'hash'):
+    store = VectorStore(HashEmbedder(model_name), backend=QdrantBackend(client=AsyncQdrantClient(":memory:")))
+    return store, DBSync(store, chunker=lambda text: [text], state=SyncState(state_path, space=store.space_key()))
+
+
+async def run(sync: DBSync, full: bool = False):
+    job = sync.start('u', full=full)
+    await job.task
+    assert job.status == 'done', job.error
+    return job
+
+
+def test_delete_then_resync():
+    db_sync.fetch_knowledge_page = fake_fetch_page
+
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            store, sync = make_sync(os.path.join(tmp, 'state.sqlite3'))
+            job = await run(sync)
+            assert job.rows_upserted == 5
+            assert await store.count(user='u', fresh=True) == 5
+
+            await store.delete_by_category('a', user='u')
+            assert await store.count(user='u', fresh=True) == 3
+            # 增量同步：被删除类别的记录哈希与水位已清除，重新写入，其余记录跳过
+            job = await run(sync)
+            assert (job.rows_upserted, job.rows_skipped) == (2, 3)
+            assert await store.count(user='u', fresh=True) == 5
+
+            await store.delete_by_title('标题4', user='u')
+            job = await run(sync, full=True)
+            assert job.rows_upserted == 5
+            assert await store.count(user='u', fresh=True) == 5
+
+            # 未删除任何向量时再次同步，水位之后回看的记录哈希未变，全部跳过
+            job = await run(sync)
+            assert job.rows_upserted == 0 and job.rows_skipped == job.rows_read
+
+    asyncio.run(main())
+
+
+def test_new_vector_space_resyncs():
+    db_sync.fetch_knowledge_page = fake_fetch_page
+
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'state.sqlite3')
+            _, sync = make_sync(path)
+            assert (await run(sync)).rows_upserted == 5
+            # 换模型（新的向量库）后同一状态文件不应跳过任何记录
+            store, sync = make_sync(path, model_name='hash-v2')
+            assert (await run(sync)).rows_upserted == 5
+            assert await store.count(user='u', fresh=True) == 5
+
+    asyncio.run(main())
+
+
+def test_soft_deleted_rows_always_removed():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            store, sync = make_sync(os.path.join(tmp, 'state.sqlite3'))
+            # 记录 2 由按 ID 入库写入（两个 chunk），同步状态中没有它的哈希
+            chunks = ['第2条知识', '的内容']
+            await store.add_texts(chunks, [{'id': 2, 'title': '标题2', 'category': 'a', 'content': c, 'user': 'u'} for c in chunks])
+            rows = [dict(r, is_deleted=1) if r['id'] == 2 else r for r in ROWS]
+
+            async def fetch(user, category, after, limit):
+                return [dict(r) for r in rows if (r['updated_at'], r['id']) > tuple(after)][:limit]
+
+            db_sync.fetch_knowledge_page = fetch
+            job = await run(sync)
+            assert job.rows_upserted == 4 and job.rows_deleted == 1
+            # 删除数按实际删除的点计
+            assert job.chunks_deleted == 2
+            assert await store.delete_by_source_ids([2, 3], user='u') == 1
+            assert await store.count(user='u', fresh=True) == 3
+
+    asyncio.run(main())
+
+
+def test_forget_runs_off_event_loop():
+    db_sync.fetch_knowledge_page = fake_fetch_page
+
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            store, sync = make_sync(os.path.join(tmp, 'state.sqlite3'))
+            await run(sync)
+            threads = []
+            forget = sync.state.forget
+            sync.state.forget = lambda *a, **kw: threads.append(threading.current_thread()) or forget(*a, **kw)
+            await store.delete_by_category('a', user='u')
+            # 下一次同步等待清除完成后再比对哈希，被删除的记录重新写入
+            job = await run(sync)
+            assert threads and threads[0] is not threading.main_thread()
+            assert job.rows_upserted == 2
+            assert await store.count(user='u', fresh=True) == 5
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_delete_then_resync()
+    test_new_vector_space_resyncs()
+    test_soft_deleted_rows_always_removed()
+    test_forget_runs_off_event_loop()
+    print("OK")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 DashScope 异步 embedding：结果按 text_index 还原输入顺序，错误响应（含非 JSON 的网关错误）抛出带状态码与响应内容的异常
+（HTTP 请求由 httpx.MockTransport 应答，不访问外部服务）
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import embedder as embedder_module
+from services.embedder import AsyncEmbedder
+
+
+def make_embedder(handler) -> AsyncEmbedder:
+    # 配置可能已在未设置 DASHSCOPE_API_KEY 的环境中加载
+    embedder_module.DASHSCOPE_API_KEY = 'test'
+    embedder = AsyncEmbedder()
+    embedder._client = httpx.AsyncClient(base_url='http://dashscope.test', transport=httpx.MockTransport(handler))
+    return embedder
+
+
+def test_order_restored():
+    def handler(request):
+        return httpx.Response(200, json={'output': {'embeddings': [
+            {'text_index': 1, 'embedding': [0.0, 1.0]},
+            {'text_index': 0, 'embedding': [1.0, 0.0]},
+        ]}})
+
+    vecs = asyncio.run(make_embedder(handler).aencode(['a', 'b']))
+    assert vecs.tolist() == [[1.0, 0.0], [0.0, 1.0]]
+
+
+def test_error_responses():
+    responses = [
+        (httpx.Response(400, json={'code': 'InvalidParameter', 'message': 'bad input'}), 'HTTP 400 - InvalidParameter - bad input'),
+        (httpx.Response(502, text='<html>Bad Gateway</html>'), 'HTTP 502 - <html>Bad Gateway</html>'),
+    ]
+    for response, message in responses:
+        with pytest.raises(Exception, match=message):
+            asyncio.run(make_embedder(lambda request, r=response: r).aencode(['a']))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
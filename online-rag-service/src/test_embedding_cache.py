@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 embedding 缓存：异步查询时磁盘层在线程中读取、磁盘层按最近访问时间清理到上限以内、旧版本缓存表自动升级
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.embedding_cache import CachedEmbedder, EmbeddingCache, cache_key
+
+
+class CountingEmbedder:
+    model_name = 'count'
+
+    def __init__(self):
+        self.calls = 0
+
+    def dimension(self) -> int:
+        return 4
+
+    async def aencode(self, texts):
+        self.calls += len(texts)
+        return np.ones((len(texts), 4), dtype='float32')
+
+
+def test_disk_reads_off_event_loop():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.sqlite3')
+            embedder = CountingEmbedder()
+            await CachedEmbedder(embedder, EmbeddingCache(memory_size=10, disk_path=path)).aencode(['a', 'b'])
+
+            # 新进程：内存层为空，磁盘命中
+            cache = EmbeddingCache(memory_size=10, disk_path=path)
+            threads = []
+            get_disk = cache.get_disk
+            cache.get_disk = lambda keys: threads.append(threading.current_thread()) or get_disk(keys)
+            cached = CachedEmbedder(embedder, cache)
+            await cached.aencode(['a', 'b'])
+            assert embedder.calls == 2 and cached.stats()['hits'] == 2
+            assert threads and threads[0] is not threading.main_thread()
+
+            # 内存命中不再查询磁盘
+            threads.clear()
+            await cached.aencode(['a'])
+            assert threads == []
+
+    asyncio.run(main())
+
+
+def test_disk_pruned_by_last_access():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(memory_size=0, disk_path=os.path.join(tmp, 'cache.sqlite3'), disk_max_rows=10)
+        vec = np.ones(4, dtype='float32')
+        cache.put_many('m', {f'k{i}': vec for i in range(10)})
+        time.sleep(0.01)
+        # k0 最近被访问过，清理时保留
+        assert 'k0' in cache.get_disk(['k0'])
+        cache.put_many('m', {'k10': vec})
+        assert cache.disk_items() == 9 and cache.pruned == 2
+        assert set(cache.get_disk([f'k{i}' for i in range(11)])) == {'k0', *(f'k{i}' for i in range(3, 11))}
+
+
+def test_legacy_table_upgraded():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite3')
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE embedding_cache (key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL)")
+        key = cache_key('m', 'x')
+        db.execute("INSERT INTO embedding_cache VALUES (?, 'm', 4, ?)", (key, np.ones(4, dtype='float32').tobytes()))
+        db.commit()
+        db.close()
+        cache = EmbeddingCache(memory_size=10, disk_path=path)
+        assert key in cache.get_many([key]) and cache.disk_items() == 1
+
+
+if __name__ == "__main__":
+    test_disk_reads_off_event_loop()
+    test_disk_pruned_by_last_access()
+    test_legacy_table_upgraded()
+    print("OK")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试混合检索融合：空输入与只有一路结果时各策略的分数有限且顺序正确、去重合并字段、limit 截断
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.fusion import STRATEGIES, content_key, fuse, minmax, zscore
+
+
+def vec(id_, score, **kw):
+    return {'id': id_, 'content': f'内容{id_}', 'score_vec': score, **kw}
+
+
+def kw(id_, score=None, **extra):
+    item = {'id': id_, 'content': f'内容{id_}', **extra}
+    if score is not None:
+        item['score_kw'] = score
+    return item
+
+
+def ids(res):
+    return [r['id'] for r in res]
+
+
+def finite(res):
+    return all(math.isfinite(r['score']) for r in res)
+
+
+def test_empty_input():
+    for strategy in STRATEGIES:
+        assert fuse([], [], strategy=strategy) == []
+        assert fuse([], [], strategy=strategy, limit=5) == []
+    assert len(minmax(np.array([]))) == 0 and len(zscore(np.array([]))) == 0
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_vector_leg_only(strategy):
+    res = fuse([vec(1, 0.2), vec(2, 0.9), vec(3, 0.5)], [], strategy=strategy)
+    assert ids(res) == [2, 3, 1] and finite(res)
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_keyword_leg_only(strategy):
+    res = fuse([], [kw(1, 1.0), kw(2, 3.0)], strategy=strategy)
+    assert ids(res) == [2, 1] and finite(res)
+    # LIKE 回退结果没有分数，命中即 1.0
+    res = fuse([], [kw(1), kw(2)], strategy=strategy)
+    assert sorted(ids(res)) == [1, 2] and finite(res)
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_single_result(strategy):
+    res = fuse([vec(1, 0.8)], [], strategy=strategy)
+    assert ids(res) == [1] and finite(res)
+    if strategy == 'minmax':
+        # 单条结果命中即满分，而不是被归一化为 0
+        assert res[0]['_norm_score_vec'] == 1.0
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_both_legs_reward_overlap(strategy):
+    res = fuse([vec(1, 0.9), vec(2, 0.88), vec(4, 0.1)], [kw(2, 5.0), kw(3, 4.0)], strategy=strategy)
+    assert ids(res)[0] == 2 and sorted(ids(res)) == [1, 2, 3, 4] and finite(res)
+
+
+def test_dedup_merges_fields_and_limit():
+    res = fuse([vec(1, 0.9, keywords=''), vec(1, 0.5), vec(2, 0.1)], [kw(1, 2.0, keywords='k')], limit=1)
+    assert len(res) == 1 and res[0]['id'] == 1
+    assert res[0]['keywords'] == 'k' and res[0]['score_vec'] == 0.9
+    # 没有数据库 id 时按点 ID、再按内容去重
+    assert content_key({'_point_id': 'p'}) == 'p'
+    assert content_key({'content': 'x'}) == content_key({'content': 'x', 'score_vec': 1})
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        fuse([vec(1, 0.1)], [], strategy='max')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
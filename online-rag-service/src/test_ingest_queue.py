@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试后台入库队列：执行中的任务在服务重启后重新执行，超过最大尝试次数的任务标记失败，
+处理函数上报的 chunk 进度可查询，处理异常时任务失败并记录错误
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.ingest_queue import IngestJobStore, IngestQueue
+
+
+async def wait_for(queue: IngestQueue, job_id: str, predicate, timeout: float = 5.0):
+    """轮询任务状态直到满足条件"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if predicate(job):
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f'等待超时: {job}'
+        await asyncio.sleep(0.01)
+
+
+def test_requeued_after_restart():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'jobs.sqlite3')
+
+            async def hang(kind, request, progress):
+                await asyncio.Event().wait()
+
+            queue = IngestQueue(hang, store=IngestJobStore(path), workers=1)
+            await queue.start()
+            job = await queue.submit('raw', {'user': 'u', 'title': 't'})
+            await wait_for(queue, job['job_id'], lambda j: j['status'] == 'running')
+            # 关闭时执行中的任务保持 running
+            await queue.close()
+            assert (await queue.get(job['job_id']))['status'] == 'running'
+
+            calls = []
+
+            async def handler(kind, request, progress):
+                calls.append((kind, request))
+                return {'ingested': 1}
+
+            queue = IngestQueue(handler, store=IngestJobStore(path), workers=1)
+            await queue.start()
+            done = await wait_for(queue, job['job_id'], lambda j: j['status'] == 'done')
+            await queue.close()
+            assert calls == [('raw', {'user': 'u', 'title': 't'})]
+            assert done['attempts'] == 2 and done['result'] == {'ingested': 1}
+
+    asyncio.run(main())
+
+
+def test_max_attempts_marks_failed():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            store = IngestJobStore(os.path.join(tmp, 'jobs.sqlite3'))
+            job_id = store.create('raw', {'user': 'u'})
+            # 模拟之前两次执行中途进程退出
+            store.start_attempt(job_id)
+            store.start_attempt(job_id)
+
+            calls = []
+
+            async def handler(kind, request, progress):
+                calls.append(kind)
+                return {}
+
+            queue = IngestQueue(handler, store=store, workers=1, max_attempts=2)
+            await queue.start()
+            job = await wait_for(queue, job_id, lambda j: j['status'] != 'running')
+            await queue.close()
+            assert job['status'] == 'failed' and job['error'] == '超过最大尝试次数'
+            assert calls == []
+
+    asyncio.run(main())
+
+
+def test_progress_and_handler_error():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            release = asyncio.Event()
+
+            async def handler(kind, request, progress):
+                await progress(0, 3)
+                await progress(2, 3)
+                await release.wait()
+                if request.get('fail'):
+                    raise RuntimeError('写入失败')
+                await progress(3, 3)
+                return {'ingested': 3}
+
+            queue = IngestQueue(handler, store=IngestJobStore(os.path.join(tmp, 'jobs.sqlite3')), workers=2)
+            await queue.start()
+            ok = await queue.submit('raw', {'user': 'u'})
+            bad = await queue.submit('raw', {'user': 'u', 'fail': True})
+            assert ok['status'] == 'queued'
+            job = await wait_for(queue, ok['job_id'], lambda j: j['done'] == 2)
+            assert (job['status'], job['total']) == ('running', 3)
+
+            release.set()
+            job = await wait_for(queue, ok['job_id'], lambda j: j['status'] == 'done')
+            assert (job['done'], job['total'], job['result']) == (3, 3, {'ingested': 3})
+            job = await wait_for(queue, bad['job_id'], lambda j: j['status'] == 'failed')
+            assert job['error'] == '写入失败' and job['attempts'] == 1
+            await queue.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_requeued_after_restart()
+    test_max_attempts_marks_failed()
+    test_progress_and_handler_error()
+    print("OK")
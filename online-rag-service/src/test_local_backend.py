@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地向量后端：重新打开后数据完整、已删除槽位压缩后检索结果不变、旧版本 JSON 旁路文件自动导入
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_backends import LocalBackend
+
+DIM = 8
+
+
+def make_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"p{i}" for i in range(n)]
+    payloads = [{'user': 'u', 'category': 'a' if i % 2 else 'b', 'title': f't{i // 10}', 'content': f'c{i}'} for i in range(n)]
+    return ids, rng.standard_normal((n, DIM)).astype('float32'), payloads
+
+
+def open_backend(tmp, **kwargs):
+    return LocalBackend(os.path.join(tmp, 'index.faiss'), os.path.join(tmp, 'meta.sqlite3'), **kwargs)
+
+
+def test_reopen_keeps_points():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = open_backend(tmp)
+            await backend.ensure(DIM)
+            ids, vecs, payloads = make_points(50)
+            for i in range(0, 50, 10):
+                await backend.upsert(ids[i:i + 10], vecs[i:i + 10], payloads[i:i + 10])
+            await backend.delete({'title': 't0'})
+            await backend.upsert(['p15'], vecs[:1], [{**payloads[15], 'content': 'new'}])
+            await backend.close()
+
+            backend = open_backend(tmp)
+            await backend.ensure(DIM)
+            assert await backend.count({'user': 'u'}) == 40
+            assert (await backend.retrieve(['p15']))['p15']['content'] == 'new'
+            hits = await backend.query(vecs[0], {'user': 'u'}, 1)
+            assert hits[0][0] == 'p15'
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def test_compaction_keeps_results():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = open_backend(tmp, compact_ratio=0.3, compact_min=10)
+            await backend.ensure(DIM)
+            ids, vecs, payloads = make_points(100)
+            await backend.upsert(ids, vecs, payloads)
+            q = vecs[7]
+            before = await backend.query(q, {'category': 'a'}, 5)
+            # 删除 b 类别的一半点后达到阈值触发压缩，槽位只剩存活的点
+            await backend.delete({'category': 'b'})
+            assert backend.size == 50 and backend.n_dead == 0
+            assert await backend.query(q, {'category': 'a'}, 5) == before
+            assert await backend.point_ids({'category': 'b'}) == []
+            await backend.close()
+
+            backend = open_backend(tmp)
+            await backend.ensure(DIM)
+            assert await backend.query(q, {'category': 'a'}, 5) == before
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def test_import_legacy_json():
+    async def main():
+        with tempfile.TemporaryDirectory() as tmp:
+            ids, vecs, payloads = make_points(3)
+            vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+            np.concatenate([vecs, np.zeros((1021, DIM), dtype='float32')]).tofile(os.path.join(tmp, 'index.f32'))
+            with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'dim': DIM, 'space': None, 'ids': ids, 'payloads': [payloads[0], None, payloads[2]]}, f)
+
+            backend = open_backend(tmp)
+            await backend.ensure(DIM)
+            assert sorted(await backend.point_ids({'user': 'u'})) == ['p0', 'p2']
+            assert (await backend.query(vecs[2], {}, 1))[0][0] == 'p2'
+            assert os.path.exists(os.path.join(tmp, 'meta.json.bak'))
+            await backend.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_reopen_keeps_points()
+    test_compaction_keeps_results()
+    test_import_legacy_json()
+    print("OK")
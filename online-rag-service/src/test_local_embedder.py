@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地 embedding 的批处理：按长度分批、每批只填充到本批最长序列，mean/cls 池化与归一化，
+结果按输入顺序返回（分词器与 ONNX 会话替换为桩对象，不依赖 onnxruntime/tokenizers 与模型文件）
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import local_embedder
+from services.local_embedder import LocalEmbedder
+
+
+class StubTokenizer:
+    """每个字符一个 token，token ID 为文本长度"""
+
+    def encode_batch(self, texts):
+        return [SimpleNamespace(ids=[len(t)] * len(t)) for t in texts]
+
+
+class StubSession:
+    """token 级输出 (batch, seq, 2)：第一维为 token ID（padding 为 0），记录每次推理的输入"""
+
+    def __init__(self):
+        self.feeds = []
+        self._lock = threading.Lock()
+
+    def run(self, outputs, feeds):
+        with self._lock:
+            self.feeds.append(feeds)
+        ids = feeds['input_ids'].astype('float32')
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def make_embedder(pooling: str = 'mean', batch_size: int = 2) -> LocalEmbedder:
+    # 不经过 __init__（不加载模型），只设置推理用到的属性
+    embedder = object.__new__(LocalEmbedder)
+    embedder.model_name = 'stub'
+    embedder.dimensions = None
+    embedder.batch_size = batch_size
+    embedder.pooling = pooling
+    embedder.pad_id = 0
+    embedder.tokenizer = StubTokenizer()
+    embedder.session = StubSession()
+    embedder.input_names = {'input_ids', 'attention_mask'}
+    embedder._pool = ThreadPoolExecutor(max_workers=2)
+    embedder._dim = 2
+    return embedder
+
+
+def expected(length: int) -> list:
+    v = np.array([length, 1.0], dtype='float32')
+    return (v / np.linalg.norm(v)).tolist()
+
+
+TEXTS = ['aaaaa', 'b', 'ccc', 'dd']
+
+
+def test_dynamic_padding_and_order():
+    embedder = make_embedder()
+    vecs = embedder.encode(TEXTS)
+    # 结果与输入顺序一致；mean 池化只统计非 padding 的 token
+    assert np.allclose(vecs, [expected(len(t)) for t in TEXTS])
+    # 按长度排序后分批：[1, 2] 与 [3, 5]，每批只填充到本批最长
+    shapes = sorted(f['input_ids'].shape for f in embedder.session.feeds)
+    assert shapes == [(2, 2), (2, 5)]
+    # 模型没有的输入不传入
+    assert all(set(f) == {'input_ids', 'attention_mask'} for f in embedder.session.feeds)
+    short = next(f for f in embedder.session.feeds if f['input_ids'].shape == (2, 2))
+    assert short['attention_mask'].tolist() == [[1, 0], [1, 1]]
+    embedder.close()
+
+
+def test_async_matches_sync_and_cls_pooling():
+    embedder = make_embedder(batch_size=3)
+    vecs = asyncio.run(embedder.aencode(TEXTS))
+    assert np.allclose(vecs, embedder.encode(TEXTS))
+    assert embedder.encode([]).shape == (0, 2)
+    embedder.close()
+
+    # cls 池化取首个 token，与 padding 无关
+    embedder = make_embedder(pooling='cls', batch_size=4)
+    assert np.allclose(embedder.encode(TEXTS), [expected(len(t)) for t in TEXTS])
+    embedder.close()
+
+
+def test_requires_optional_dependencies():
+    if local_embedder.ort is not None and local_embedder.Tokenizer is not None:
+        pytest.skip('已安装 onnxruntime 与 tokenizers')
+    with pytest.raises(RuntimeError, match='onnxruntime'):
+        LocalEmbedder('stub')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 PCA 降维投影：拟合、保存/加载后变换结果与指纹一致，投影后的向量归一化且保留主要方差；
+维度不匹配时拒绝构造，向量库中已有集合的投影指纹与当前配置不一致时拒绝使用
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.projection import PCAProjection, ProjectedEmbedder, vector_space
+from services.vector_backends import LocalBackend, QdrantBackend
+from services.vector_store import VectorStore
+
+DIM = 16
+
+
+class HashEmbedder:
+    """按文本哈希生成确定性的 16 维向量"""
+
+    model_name = 'hash'
+
+    def dimension(self) -> int:
+        return DIM
+
+    def encode(self, texts):
+        return np.stack([
+            np.frombuffer(hashlib.sha256(t.encode('utf-8')).digest()[:DIM], dtype=np.uint8).astype('float32')
+            for t in texts
+        ])
+
+    async def aencode(self, texts):
+        return self.encode(texts)
+
+
+def low_rank(n: int = 200, rank: int = 4, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(n, rank)) @ rng.normal(size=(rank, DIM)) + 3.0).astype('float32')
+
+
+def test_fit_transform_round_trip():
+    x = low_rank()
+    proj = PCAProjection.fit(x, 4)
+    assert (proj.input_dim, proj.dim) == (DIM, 4)
+    # 秩为 4 的数据，前 4 个主成分保留几乎全部方差
+    assert proj.explained.sum() > 0.99
+    out = proj.transform(x)
+    assert out.shape == (200, 4) and np.allclose(np.linalg.norm(out, axis=1), 1.0, atol=1e-5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'proj', 'pca.npz')
+        proj.save(path)
+        loaded = PCAProjection.load(path)
+    assert loaded.fingerprint() == proj.fingerprint()
+    assert np.allclose(loaded.transform(x), out)
+    assert PCAProjection.fit(low_rank(seed=1), 4).fingerprint() != proj.fingerprint()
+
+    with pytest.raises(ValueError):
+        PCAProjection.fit(x[:3], 4)
+
+
+def test_projected_embedder():
+    proj = PCAProjection.fit(low_rank(), 4)
+    embedder = ProjectedEmbedder(HashEmbedder(), proj)
+    assert embedder.dimension() == 4
+    vecs = asyncio.run(embedder.aencode(['a', 'b']))
+    assert np.allclose(vecs, proj.transform(HashEmbedder().encode(['a', 'b'])))
+    space = vector_space(embedder)
+    assert space['model'] == 'hash' and space['dim'] == 4
+    assert space['projection'] == f'pca:{DIM}->4:{proj.fingerprint()}'
+
+    # 投影输入维度与 embedding 维度不一致
+    with pytest.raises(ValueError):
+        ProjectedEmbedder(HashEmbedder(), PCAProjection.fit(low_rank()[:, :8], 4))
+
+
+async def check_space_mismatch(make_backend, reopen: bool):
+    """reopen 为 True 时关闭后重新打开同一存储（本地后端）；Qdrant 内存模式共用一个客户端，不能关闭"""
+    first = ProjectedEmbedder(HashEmbedder(), PCAProjection.fit(low_rank(seed=0), 4))
+    store = VectorStore(first, backend=make_backend())
+    await store.add_texts(['甲'], [{'title': 't', 'category': 'c', 'content': '甲', 'user': 'u'}])
+    if reopen:
+        await store.close()
+
+    # 同维度但指纹不同的投影（或未投影的原始向量）不能写入已有集合
+    for embedder in (ProjectedEmbedder(HashEmbedder(), PCAProjection.fit(low_rank(seed=1), 4)), HashEmbedder()):
+        store = VectorStore(embedder, backend=make_backend())
+        with pytest.raises(RuntimeError, match='不一致'):
+            await store.add_texts(['乙'], [{'title': 't', 'category': 'c', 'content': '乙', 'user': 'u'}])
+
+    # 相同投影可以继续使用
+    store = VectorStore(ProjectedEmbedder(HashEmbedder(), PCAProjection.fit(low_rank(seed=0), 4)), backend=make_backend())
+    assert await store.count(user='u', fresh=True) == 1
+    await store.close()
+
+
+def test_space_mismatch_rejected_local():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_space_mismatch(
+            lambda: LocalBackend(os.path.join(tmp, 'index.faiss'), os.path.join(tmp, 'meta.json')), reopen=True
+        ))
+
+
+def test_space_mismatch_rejected_qdrant():
+    async def main():
+        client = AsyncQdrantClient(":memory:")
+        await check_space_mismatch(lambda: QdrantBackend(client=client), reopen=False)
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_fit_transform_round_trip()
+    test_projected_embedder()
+    test_space_mismatch_rejected_local()
+    test_space_mismatch_rejected_qdrant()
+    print("OK")
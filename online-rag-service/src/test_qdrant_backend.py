@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 Qdrant 分组集合模式：其他实例在启动后新建的分组集合能被发现并检索到
+（两个后端实例共享同一个 Qdrant 本地内存客户端，不依赖外部服务）
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vector_backends import QdrantBackend
+
+DIM = 4
+
+
+def test_group_collection_created_by_other_instance():
+    async def main():
+        client = AsyncQdrantClient(":memory:")
+        reader = QdrantBackend(client=client, collection_name='kb', shard_mode='collection', shard_groups=4)
+        writer = QdrantBackend(client=client, collection_name='kb', shard_mode='collection', shard_groups=4)
+        await reader.ensure(DIM)
+        await writer.ensure(DIM)
+        reader.refresh_seconds = 0
+
+        vec = np.ones((1, DIM), dtype='float32')
+        await writer.upsert(['00000000-0000-0000-0000-000000000001'], vec, [{'user': 'alice', 'content': 'a'}])
+        # reader 启动时该分组集合还不存在
+        assert await reader.count({'user': 'alice'}) == 1
+        assert len(await reader.query(vec[0], {'user': 'alice'}, 5)) == 1
+
+        await writer.upsert(['00000000-0000-0000-0000-000000000002'], vec, [{'user': 'bob', 'content': 'b'}])
+        assert await reader.count({}) == 2
+        await client.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_group_collection_created_by_other_instance()
+    print("OK")
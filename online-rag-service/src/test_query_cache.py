@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试检索结果缓存：规范化查询命中、TTL 与 LRU 淘汰，以及入库/删除后按 (user, category) 失效的范围
+"""
+
+import os
+import sys
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.query_cache import QueryCache
+
+
+def cached(cache, user='u', category=None, q='向量 检索', value='v'):
+    """按接口的用法：检索前取代数快照，检索后写入"""
+    key = QueryCache.key('search', user, category, q, 5)
+    cache.put(key, value, cache.token(user, category), 0.01)
+    return key
+
+
+def test_normalized_key_hits():
+    cache = QueryCache(max_items=10, ttl_seconds=60)
+    cached(cache, q='  Ｒag   检索 ')
+    assert cache.get(QueryCache.key('search', 'u', '', 'rag 检索', 5)) == 'v'
+    assert cache.get(QueryCache.key('search', 'u', None, 'rag 检索', 10)) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_ttl_and_lru():
+    cache = QueryCache(max_items=2, ttl_seconds=0.05)
+    k1, k2 = cached(cache, q='a'), cached(cache, q='b')
+    cache.get(k1)
+    k3 = cached(cache, q='c')
+    # k2 最久未使用被淘汰
+    assert cache.get(k2) is None and cache.get(k1) == 'v' and cache.get(k3) == 'v'
+    time.sleep(0.06)
+    assert cache.get(k1) is None and cache.stats()['stale'] == 1
+    disabled = QueryCache(max_items=0)
+    cached(disabled)
+    assert disabled.stats()['items'] == 0
+
+
+def test_add_invalidates_only_affected_scopes():
+    cache = QueryCache(max_items=10, ttl_seconds=60)
+    a, b, all_u, other = cached(cache, category='a'), cached(cache, category='b'), cached(cache), cached(cache, user='w')
+    cache.on_add([('p1', {'user': 'u', 'category': 'a'})])
+    assert cache.get(a) is None and cache.get(all_u) is None
+    assert cache.get(b) == 'v' and cache.get(other) == 'v'
+
+
+def test_delete_scopes():
+    cache = QueryCache(max_items=10, ttl_seconds=60)
+    a, b = cached(cache, category='a'), cached(cache, category='b')
+    cache.on_delete('u', category='a')
+    assert cache.get(a) is None and cache.get(b) == 'v'
+
+    # 按标题/来源/点 ID 删除或 payload 变更时影响的类别未知，该用户全部失效
+    for event in ({'title': 't'}, {'source_ids': [1]}, {'point_ids': ['p1']}):
+        b, other = cached(cache, category='b'), cached(cache, user='w', category='b')
+        cache.on_delete('u', **event)
+        assert cache.get(b) is None and cache.get(other) == 'v'
+    b = cached(cache, category='b')
+    cache.on_update([('p1', {'user': 'u', 'category': 'a'})])
+    assert cache.get(b) is None
+
+    # 不限用户的删除使全部缓存失效
+    other = cached(cache, user='w')
+    cache.on_delete(None, title='t')
+    assert cache.get(other) is None
+
+
+def test_write_during_search_is_not_reused():
+    cache = QueryCache(max_items=10, ttl_seconds=60)
+    token = cache.token('u', 'a')
+    cache.on_add([('p1', {'user': 'u', 'category': 'a'})])
+    key = QueryCache.key('search', 'u', 'a', 'q', 5)
+    cache.put(key, 'old', token, 0.01)
+    assert cache.get(key) is None
+
+
+if __name__ == "__main__":
+    test_normalized_key_hits()
+    test_ttl_and_lru()
+    test_add_invalidates_only_affected_scopes()
+    test_delete_scopes()
+    test_write_during_search_is_not_reused()
+    print("OK")
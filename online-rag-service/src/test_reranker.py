@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试重排模型的占用：超时的请求返回后推理线程仍占用模型，期间的请求直接使用词项重叠打分，
+推理结束后模型重新可用（模型替换为可控制耗时的假模型，不依赖 sentence-transformers）
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.reranker import Reranker
+
+
+class SlowModel:
+    name = 'cross'
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.running = 0
+
+    def score(self, query, items):
+        self.running += 1
+        self.gate.wait(5)
+        self.running -= 1
+        return [float(i) for i in range(len(items))]
+
+
+ITEMS = [{'title': f'标题{i}', 'content': f'知识库内容{i}', 'score': 1.0 / (i + 1)} for i in range(5)]
+
+
+def make_reranker():
+    reranker = Reranker(backend='lexical', timeout_ms=50)
+    model = SlowModel()
+    reranker.model = model
+    reranker.backend = model.name
+    reranker._pool = ThreadPoolExecutor(max_workers=1)
+    return reranker, model
+
+
+def test_slot_held_until_inference_finishes():
+    async def main():
+        reranker, model = make_reranker()
+        _, meta = await reranker.rerank('知识库', ITEMS, 3)
+        assert meta['status'] == 'timeout' and meta['backend'] == 'lexical'
+        # 超时后推理仍在运行：新请求不排队，直接词项重叠打分
+        _, meta = await reranker.rerank('知识库', ITEMS, 3)
+        assert meta['status'] == 'busy' and meta['backend'] == 'lexical'
+        assert model.running == 1 and reranker.stats()['busy_fallbacks'] == 1
+
+        model.gate.set()
+        for _ in range(100):
+            if not reranker.stats()['busy']:
+                break
+            await asyncio.sleep(0.01)
+        res, meta = await reranker.rerank('知识库', ITEMS, 3)
+        assert meta['status'] == 'ok' and meta['backend'] == 'cross'
+        assert all('score_rerank' in r for r in res)
+        reranker.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_slot_held_until_inference_finishes()
+    print("OK")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试重新入库：编辑后的文档只为新增/变化的 chunk 做 embedding，旧 chunk 被清理，
+其他文档（不同 doc_id 或数据库记录）即使同名也不受影响，并发入库同一文档不丢 chunk；Qdrant 本地内存模式与本地后端各跑一遍
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.bm25_index import BM25Index
+from services.vector_backends import LocalBackend, QdrantBackend
+from services.vector_store import VectorStore, point_id
+
+
+class HashEmbedder:
+    """按文本哈希生成确定性向量，并记录 embedding 过的文本"""
+
+    def __init__(self):
+        self.model_name = 'hash'
+        self.encoded = []
+
+    def dimension(self) -> int:
+        return 16
+
+    async def aencode(self, texts):
+        self.encoded.extend(texts)
+        # 让出事件循环，使并发的入库任务交错执行
+        await asyncio.sleep(0.001)
+        return np.stack([
+            np.frombuffer(hashlib.sha256(t.encode('utf-8')).digest()[:16], dtype=np.uint8).astype('float32') + 1
+            for t in texts
+        ])
+
+
+async def ingest_raw(store: VectorStore, title: str, chunks, user: str = 'u', doc_id: str = 'doc-1', batch: int = 100):
+    """与 /rag/ingest 的 raw 入库相同：按批写入后清理该 doc_id 文档的旧 chunk（未给 doc_id 时不清理），整体持有文档锁"""
+    metas = [{'title': title, 'category': 'c', 'keywords': '', 'content': c, 'user': user} for c in chunks]
+    if doc_id:
+        for meta in metas:
+            meta['doc_id'] = doc_id
+    written = 0
+    async with store.lock_documents(user, doc_ids=[doc_id] if doc_id else ()):
+        for i in range(0, len(metas), batch):
+            written += await store.add_texts(list(chunks[i:i + batch]), metas[i:i + batch])
+        removed = await store.delete_stale([point_id(m, t) for t, m in zip(chunks, metas)], user=user, doc_id=doc_id)
+    return written, removed
+
+
+async def contents(store: VectorStore, user: str = 'u'):
+    res = []
+    async for batch in store.iter_points():
+        res.extend(p['content'] for _, p in batch if p.get('user') == user)
+    return sorted(res)
+
+
+async def check_reingest(backend):
+    embedder = HashEmbedder()
+    store = VectorStore(embedder, backend=backend)
+    bm25 = BM25Index()
+    store.add_listener(bm25)
+
+    assert await ingest_raw(store, '文档', ['甲段落', '乙段落', '丙段落']) == (3, 0)
+    # 同名的数据库记录 chunk 不属于 raw 文档，清理时不受影响
+    await store.add_texts(['库记录'], [{'id': 7, 'title': '文档', 'category': 'c', 'content': '库记录', 'user': 'u'}])
+
+    # 中间插入一个 chunk：其余 chunk 的点 ID 不变，只 embedding 新增的一条
+    embedder.encoded.clear()
+    assert await ingest_raw(store, '文档', ['甲段落', '新段落', '乙段落', '丙段落']) == (1, 0)
+    assert embedder.encoded == ['新段落']
+
+    # 删除段落后重新入库：不再出现的旧 chunk 被清理，关键词索引同步移除
+    assert await ingest_raw(store, '文档', ['甲段落', '丙段落']) == (0, 2)
+    assert await contents(store) == sorted(['甲段落', '丙段落', '库记录'])
+    assert await store.count(user='u') == 3
+    assert all(r['content'] != '乙段落' for r in bm25.search('乙段落', 5, user='u'))
+
+    # 按来源记录清理：同一记录的新内容写入后删除旧 chunk
+    meta = {'id': 7, 'title': '文档', 'category': 'c', 'content': '库记录新版', 'user': 'u'}
+    await store.add_texts(['库记录新版'], [meta])
+    assert await store.delete_stale([point_id(meta, '库记录新版')], user='u', source_ids=[7]) == 1
+    assert await contents(store) == sorted(['甲段落', '丙段落', '库记录新版'])
+    await store.close()
+
+
+async def check_same_title(backend):
+    store = VectorStore(HashEmbedder(), backend=backend)
+    # 标题相同的两个不同文档互不清理
+    assert await ingest_raw(store, 'README', ['doc1-a', 'doc1-b'], doc_id='doc-1') == (2, 0)
+    assert await ingest_raw(store, 'README', ['doc2-a'], doc_id='doc-2') == (1, 0)
+    # 未给 doc_id 的文档只追加，不清理任何 chunk
+    assert await ingest_raw(store, 'README', ['doc3-a'], doc_id=None) == (1, 0)
+    assert await contents(store) == ['doc1-a', 'doc1-b', 'doc2-a', 'doc3-a']
+    # 只有同一 doc_id 的重新入库会清理旧 chunk
+    assert await ingest_raw(store, 'README', ['doc1-b'], doc_id='doc-1') == (0, 1)
+    assert await contents(store) == ['doc1-b', 'doc2-a', 'doc3-a']
+    await store.close()
+
+
+async def check_concurrent_ingest(backend):
+    store = VectorStore(HashEmbedder(), backend=backend)
+    v1 = [f'v1-{i}' for i in range(6)]
+    v2 = [f'v1-{i}' for i in range(3)] + [f'v2-{i}' for i in range(6)]
+    # 两个 worker 同时入库同一文档的两个版本：按文档串行，最终完整保留后完成的版本
+    await asyncio.gather(ingest_raw(store, '文档', v1, batch=2), ingest_raw(store, '文档', v2, batch=2))
+    assert await contents(store) == sorted(v2)
+    await asyncio.gather(ingest_raw(store, '文档', v2, batch=2), ingest_raw(store, '文档', v1, batch=2))
+    assert await contents(store) == sorted(v1)
+    assert await store.count(user='u', fresh=True) == len(v1)
+    await store.close()
+
+
+def test_reingest_qdrant():
+    asyncio.run(check_reingest(QdrantBackend(client=AsyncQdrantClient(":memory:"))))
+
+
+def test_reingest_local():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_reingest(LocalBackend(os.path.join(tmp, 'index.faiss'), os.path.join(tmp, 'meta.json'))))
+
+
+def test_same_title_documents_coexist():
+    asyncio.run(check_same_title(QdrantBackend(client=AsyncQdrantClient(":memory:"))))
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_same_title(LocalBackend(os.path.join(tmp, 'index.faiss'), os.path.join(tmp, 'meta.json'))))
+
+
+def test_concurrent_ingest_same_document():
+    asyncio.run(check_concurrent_ingest(QdrantBackend(client=AsyncQdrantClient(":memory:"))))
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check_concurrent_ingest(LocalBackend(os.path.join(tmp, 'index.faiss'), os.path.join(tmp, 'meta.json'))))
+
+
+def test_point_id_ignores_position():
+    meta = {'user': 'u', 'title': 't'}
+    assert point_id(meta, 'a') == point_id(dict(meta), 'a')
+    assert point_id(meta, 'a') != point_id(meta, 'b')
+    assert point_id(meta, 'a') != point_id({**meta, 'id': 1}, 'a')
+    assert point_id(meta, 'a') != point_id({**meta, 'doc_id': 'd'}, 'a')
+
+
+if __name__ == "__main__":
+    test_reingest_qdrant()
+    test_reingest_local()
+    test_same_title_documents_coexist()
+    test_concurrent_ingest_same_document()
+    test_point_id_ignores_position()
+    print("OK")
@@ -2,6 +2,7 @@
 """
 测试向量存储修复：验证数据插入和查询功能
 """
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
@@ -9,7 +10,7 @@ sys.path.append(os.path.dirname(__file__))
 from services.embedder import Embedder
 from services.vector_store import VectorStore
 
-def test_vector_store_fix():
+async def test_vector_store_fix():
     """测试向量存储修复"""
     
     # 初始化嵌入器和向量存储
@@ -37,7 +38,7 @@ def test_vector_store_fix():
     
     # 1. 插入测试数据
     print("\n1. 插入测试数据...")
-    vector_store.add_texts(test_texts, test_metas)
+    await vector_store.add_texts(test_texts, test_metas)
     
     # 2. 测试搜索功能
     print("\n=== 测试搜索功能 ===")
@@ -45,7 +46,7 @@ def test_vector_store_fix():
 
     for query in queries:
         print(f"\n搜索查询: '{query}'")
-        results = vector_store.search(query, topK=3, user="test_user")
+        results = await vector_store.search(query, topK=3, user="test_user")
         
         if results:
             print(f"返回 {len(results)} 条结果:")
@@ -56,8 +57,8 @@ def test_vector_store_fix():
 
     # 验证不同查询返回不同结果
     print("\n=== 验证不同查询返回不同结果 ===")
-    query1_results = vector_store.search("人工智能技术", topK=5, user="test_user")
-    query2_results = vector_store.search("机器学习算法", topK=5, user="test_user")
+    query1_results = await vector_store.search("人工智能技术", topK=5, user="test_user")
+    query2_results = await vector_store.search("机器学习算法", topK=5, user="test_user")
 
     # 检查两个查询的结果是否不同
     if query1_results and query2_results:
@@ -77,7 +78,7 @@ def test_vector_store_fix():
     # 验证按相似度排序
     print("\n=== 验证按相似度排序 ===")
     test_query = "人工智能"
-    results = vector_store.search(test_query, topK=5, user="test_user")
+    results = await vector_store.search(test_query, topK=5, user="test_user")
 
     if results:
         sorted_correctly = True
@@ -100,10 +101,10 @@ def test_vector_store_fix():
     print("\n清理测试数据...")
     test_titles = ["AI定义", "机器学习", "深度学习", "自然语言处理", "计算机视觉"]
     for title in test_titles:
-        vector_store.delete_by_title(title, user="test_user")
+        await vector_store.delete_by_title(title, user="test_user")
     print("测试数据清理完成")
     
     return True
 
 if __name__ == "__main__":
-    test_vector_store_fix()
\ No newline at end of file
+    asyncio.run(test_vector_store_fix())
\ No newline at end of file